@@ -0,0 +1,157 @@
+# See NOTICE.md for license and attribution details.
+
+"""Spherical harmonics, sound field rotation and binaural filters for rendering ambisonics.
+
+Signals use SN3D normalized real spherical harmonics. First order signals are ordered W, X, Y, Z like the
+ambisonics layout of ``SPEAKER_NAMES``, higher orders follow the ambisonic channel number (ACN) order. Directions
+are ``(azimuth, elevation)`` in degrees, azimuth counterclockwise from the front and elevation up, and Cartesian
+coordinates have x to the front, y to the left and z up.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import scipy.special
+
+from constants import SPEAKER_DIRECTIONS
+
+FIRST_ORDER_CHANNELS = ["W", "X", "Y", "Z"]
+
+
+def n_channels(order: int) -> int:
+    """Return the number of ambisonic signals of ``order``."""
+    return (order + 1) ** 2
+
+
+def channel_names(order: int) -> list[str]:
+    """Return the names of the input channels of ``order``, ``W X Y Z`` for first order and ``ACN<n>`` above."""
+    if order == 1:
+        return list(FIRST_ORDER_CHANNELS)
+    return [f"ACN{n}" for n in range(n_channels(order))]
+
+
+def channel_acn(order: int) -> list[int]:
+    """Return the ambisonic channel number of every input channel of ``order``."""
+    if order == 1:
+        return [0, 3, 1, 2]
+    return list(range(n_channels(order)))
+
+
+def spherical_harmonics(order: int, azimuth, elevation) -> np.ndarray:
+    """Return SN3D real spherical harmonics up to ``order`` in ACN order.
+
+    Args:
+        order: Ambisonics order.
+        azimuth: Azimuth angles in degrees.
+        elevation: Elevation angles in degrees, broadcast against ``azimuth``.
+
+    Returns:
+        Array ``(..., (order + 1) ** 2)``.
+    """
+    azimuth, elevation = np.broadcast_arrays(np.radians(azimuth), np.radians(elevation))
+    sin_el = np.sin(elevation)
+    out = np.empty(azimuth.shape + (n_channels(order),))
+    for degree in range(order + 1):
+        for m in range(-degree, degree + 1):
+            am = abs(m)
+            norm = math.sqrt((1.0 if m == 0 else 2.0) * math.factorial(degree - am) / math.factorial(degree + am))
+            # scipy includes the Condon-Shortley phase, ambisonics does not
+            legendre = (-1) ** am * scipy.special.lpmv(am, degree, sin_el)
+            trig = np.cos(am * azimuth) if m >= 0 else np.sin(am * azimuth)
+            out[..., degree * (degree + 1) + m] = norm * legendre * trig
+    return out
+
+
+def head_rotation(yaw: float, pitch: float = 0.0, roll: float = 0.0) -> np.ndarray:
+    """Return the rotation matrix of a head orientation in degrees.
+
+    Yaw turns the head to the left, pitch raises the nose and roll lowers the right ear. The matrix maps
+    head coordinates to world coordinates, its transpose maps world directions to directions relative to the head.
+    """
+    y, p, r = np.radians([yaw, pitch, roll])
+    rz = np.array([[np.cos(y), -np.sin(y), 0.0], [np.sin(y), np.cos(y), 0.0], [0.0, 0.0, 1.0]])
+    ry = np.array([[np.cos(p), 0.0, -np.sin(p)], [0.0, 1.0, 0.0], [np.sin(p), 0.0, np.cos(p)]])
+    rx = np.array([[1.0, 0.0, 0.0], [0.0, np.cos(r), -np.sin(r)], [0.0, np.sin(r), np.cos(r)]])
+    return rz @ ry @ rx
+
+
+def _sphere_points(n: int) -> np.ndarray:
+    """Return ``n`` nearly uniformly spread unit vectors ``(n, 3)`` on a Fibonacci spiral."""
+    i = np.arange(n) + 0.5
+    z = 1.0 - 2.0 * i / n
+    azimuth = np.pi * (1.0 + 5**0.5) * i
+    radius = np.sqrt(1.0 - z**2)
+    return np.stack([radius * np.cos(azimuth), radius * np.sin(azimuth), z], axis=-1)
+
+
+def _directions(points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return ``(azimuth, elevation)`` in degrees of unit vectors ``(..., 3)``."""
+    azimuth = np.degrees(np.arctan2(points[..., 1], points[..., 0]))
+    elevation = np.degrees(np.arcsin(np.clip(points[..., 2], -1.0, 1.0)))
+    return azimuth, elevation
+
+
+class SoundFieldRotator:
+    """Rotation matrices of ambisonic signals compensating head orientations.
+
+    The matrix of an orientation is fitted in the least squares sense between the spherical harmonics of a fixed
+    set of directions and of the same directions relative to the head. With more directions than signals the fit
+    is exact for every order.
+
+    Args:
+        order: Ambisonics order.
+    """
+
+    def __init__(self, order: int) -> None:
+        self.order = order
+        self._acn = channel_acn(order)
+        self._points = _sphere_points(4 * n_channels(order))
+        sh = spherical_harmonics(order, *_directions(self._points))[:, self._acn]
+        self._pinv = np.linalg.pinv(sh)
+
+    def matrix(self, yaw: float, pitch: float = 0.0, roll: float = 0.0) -> np.ndarray:
+        """Return the matrix ``(channels, channels)`` turning signals of the scene into signals relative to a head
+        with the given orientation in degrees."""
+        relative = self._points @ head_rotation(yaw, pitch, roll)
+        sh = spherical_harmonics(self.order, *_directions(relative))[:, self._acn]
+        return (self._pinv @ sh).T
+
+
+def binaural_filters(
+    irs: np.ndarray,
+    speakers: list[str],
+    order: int,
+    directions: Optional[Dict[str, Tuple[float, float]]] = None,
+) -> np.ndarray:
+    """Return binaural filters of ambisonic signals derived from speaker impulse responses.
+
+    The filters are the least squares fit of spherical harmonics to the speakers' impulse responses at their
+    directions, which is the same as decoding the signals to the speakers with a mode matching decoder and
+    convolving every speaker feed with its impulse responses. Speakers without a direction, such as the LFE, are
+    left out. Components the layout cannot resolve, for example height with speakers on the horizontal plane only,
+    get silent filters.
+
+    Args:
+        irs: Impulse responses ``(ears, speakers, samples)``.
+        speakers: Speaker name of every row of ``irs``.
+        order: Ambisonics order.
+        directions: Speaker directions as ``(azimuth, elevation)`` in degrees, defaults to ``SPEAKER_DIRECTIONS``.
+
+    Returns:
+        Filters ``(ears, channels, samples)`` in the input channel order of ``order``.
+    """
+    if directions is None:
+        directions = SPEAKER_DIRECTIONS
+    rows = [i for i, name in enumerate(speakers) if name in directions and np.any(irs[:, i])]
+    if len(rows) < n_channels(order):
+        raise ValueError(
+            f"Ambisonics order {order} needs impulse responses of at least {n_channels(order)} speakers with known "
+            f"directions, got {len(rows)}"
+        )
+    azimuth, elevation = np.array([directions[speakers[i]] for i in rows], dtype=float).T
+    sh = spherical_harmonics(order, azimuth, elevation)[:, channel_acn(order)]
+    decoder = np.linalg.pinv(sh, rcond=1e-6).T
+    return np.einsum("est,sc->ect", np.asarray(irs, dtype=float)[:, rows], decoder)
@@ -0,0 +1,217 @@
+# See NOTICE.md for license and attribution details.
+
+"""Render many multichannel programmes through many personal HRIR sets in one run."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from realtime_convolution import ENGINES, RealTimeConvolver, hrir_from_wav
+
+# Convolver of the HRIR set rendered last by a worker process, reused while tasks for the same set keep coming
+_convolvers: Dict[tuple, RealTimeConvolver] = {}
+
+
+def load_manifest(file_path: str) -> dict:
+    """Load a batch manifest.
+
+    The manifest is a JSON object with ``inputs``, a list of multichannel input files, ``brirs``, a list of
+    ``hrir.wav`` files or ``{"path": ..., "name": ...}`` objects, and an optional ``output_dir``. Relative paths
+    are resolved against the manifest's directory.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, dict) or not manifest.get("inputs") or not manifest.get("brirs"):
+        raise ValueError("Manifest must list 'inputs' and 'brirs'")
+    base = os.path.dirname(os.path.abspath(file_path))
+
+    def resolve(path: str) -> str:
+        return path if os.path.isabs(path) else os.path.join(base, path)
+
+    brirs = []
+    for entry in manifest["brirs"]:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        brirs.append({"path": resolve(entry["path"]), "name": entry.get("name")})
+    return {
+        "inputs": [resolve(path) for path in manifest["inputs"]],
+        "brirs": brirs,
+        "output_dir": resolve(manifest.get("output_dir", "renders")),
+    }
+
+
+def brir_name(path: str) -> str:
+    """Return a label for an HRIR set, the directory name for files called ``hrir.wav`` and the file name otherwise."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem == "hrir":
+        return os.path.basename(os.path.dirname(os.path.abspath(path))) or stem
+    return stem
+
+
+def _render_pairs(
+    brir_path: str,
+    pairs: List[Tuple[str, str]],
+    block_size: int,
+    engine: str,
+) -> List[dict]:
+    """Render ``(input, output)`` pairs through one HRIR set in a worker process.
+
+    The HRIR set is loaded and transformed only when it differs from the one of the worker's previous task. An HRIR
+    set which cannot be loaded fails all its pairs.
+    """
+    key = (brir_path, block_size, engine)
+    prepared = key not in _convolvers
+    if prepared:
+        for convolver in _convolvers.values():
+            convolver.close()
+        _convolvers.clear()
+        try:
+            _convolvers[key] = RealTimeConvolver(hrir_from_wav(brir_path), block_size=block_size, engine=engine)
+        except Exception as e:
+            return [
+                {
+                    "input": input_wav,
+                    "brir": brir_path,
+                    "output": output_wav,
+                    "prepared": False,
+                    "status": "error",
+                    "error": str(e),
+                    "render_time": 0.0,
+                }
+                for input_wav, output_wav in pairs
+            ]
+    convolver = _convolvers[key]
+
+    results = []
+    for input_wav, output_wav in pairs:
+        result = {"input": input_wav, "brir": brir_path, "output": output_wav, "prepared": prepared}
+        prepared = False
+        start = time.perf_counter()
+        try:
+            frames = convolver.render_file(input_wav, output_wav)
+        except Exception as e:
+            result.update(status="error", error=str(e))
+        else:
+            result.update(status="ok", duration=frames / convolver.fs)
+        result["render_time"] = time.perf_counter() - start
+        results.append(result)
+    return results
+
+
+def render_batch(
+    inputs: List[str],
+    brirs: List[dict],
+    output_dir: str,
+    processes: Optional[int] = None,
+    block_size: int = 4096,
+    engine: str = "partitioned",
+) -> dict:
+    """Render every input through every HRIR set on a process pool and return a summary report.
+
+    Each HRIR set's inputs are split into about as many tasks as there are processes, so a worker renders several
+    inputs with the same prepared impulse response spectra. Failed pairs are listed in the report instead of
+    stopping the batch.
+
+    Args:
+        inputs: Multichannel input files.
+        brirs: HRIR sets as ``{"path": ..., "name": ...}``, the name defaults to ``brir_name(path)``.
+        output_dir: Directory receiving ``<input>__<name>.wav`` files.
+        processes: Number of worker processes, defaults to the number of CPUs.
+        block_size: Block size of the convolvers.
+        engine: Convolution engine, one of ``ENGINES``.
+
+    Returns:
+        Report with one entry per pair and the total audio duration, wall time and throughput.
+
+    Raises:
+        ValueError: When two pairs would write the same output file, for example inputs with the same file name in
+            different directories or HRIR sets with the same name.
+    """
+    jobs = []
+    outputs: Dict[str, Tuple[str, str]] = {}
+    for brir in brirs:
+        name = brir.get("name") or brir_name(brir["path"])
+        pairs = []
+        for path in inputs:
+            output = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(path))[0]}__{name}.wav")
+            if output in outputs:
+                raise ValueError(
+                    f"{path} through {brir['path']} and {outputs[output][0]} through {outputs[output][1]} would both "
+                    f"be written to {output}, give the HRIR sets distinct names or rename the inputs"
+                )
+            outputs[output] = (path, brir["path"])
+            pairs.append((path, output))
+        jobs.append((brir["path"], pairs))
+
+    os.makedirs(output_dir, exist_ok=True)
+    processes = processes or os.cpu_count() or 1
+    chunks = max(1, math.ceil(processes / len(brirs)))
+    chunk_size = max(1, math.ceil(len(inputs) / chunks))
+
+    start = time.perf_counter()
+    results: List[dict] = []
+    with ProcessPoolExecutor(processes) as pool:
+        futures = []
+        for brir_path, pairs in jobs:
+            for i in range(0, len(pairs), chunk_size):
+                futures.append(pool.submit(_render_pairs, brir_path, pairs[i : i + chunk_size], block_size, engine))
+        for future in futures:
+            results.extend(future.result())
+    wall_time = time.perf_counter() - start
+
+    duration = sum(r.get("duration", 0.0) for r in results)
+    return {
+        "renders": results,
+        "succeeded": sum(r["status"] == "ok" for r in results),
+        "failed": sum(r["status"] != "ok" for r in results),
+        "ir_preparations": sum(r["prepared"] for r in results),
+        "audio_seconds": duration,
+        "wall_seconds": wall_time,
+        "throughput": duration / wall_time if wall_time > 0 else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render multichannel programmes through many HRIR sets")
+    parser.add_argument("manifest", help="JSON manifest listing inputs, brirs and output_dir")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes, defaults to all CPUs")
+    parser.add_argument("--block_size", type=int, default=4096, help="Convolution block size")
+    parser.add_argument("--engine", choices=ENGINES, default="partitioned", help="Convolution engine")
+    parser.add_argument(
+        "--report", default=None, help="Summary report file, defaults to batch_report.json in the output directory"
+    )
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest)
+    try:
+        report = render_batch(
+            manifest["inputs"],
+            manifest["brirs"],
+            manifest["output_dir"],
+            processes=args.processes,
+            block_size=args.block_size,
+            engine=args.engine,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    report_path = args.report or os.path.join(manifest["output_dir"], "batch_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for r in report["renders"]:
+        status = f"{r['duration']:.1f}s in {r['render_time']:.1f}s" if r["status"] == "ok" else r["error"]
+        print(f"{os.path.basename(r['output'])}: {status}")
+    print(
+        f"Rendered {report['succeeded']} of {len(report['renders'])} pairs, {report['audio_seconds']:.1f}s of audio "
+        f"in {report['wall_seconds']:.1f}s ({report['throughput']:.1f}x real time). Report: {report_path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
+from __future__ import annotations
+
 import argparse
+import json
+import sys
 import numpy as np
 import time
 from typing import Optional
 
-from realtime_convolution import RealTimeConvolver  # type: ignore
+from realtime_convolution import ENGINES, RealTimeConvolver  # type: ignore
+from constants import SPEAKER_NAMES
+from hrir import HRIR
+from impulse_response import ImpulseResponse
 
 
 def run_benchmark(
@@ -41,6 +48,218 @@ def run_benchmark(
     print(f"Average latency per block: {elapsed/blocks*1000:.3f} ms")
 
 
+def _synthetic_hrir(n_speakers: int, ir_length: int, samplerate: int) -> HRIR:
+    """Return an HRIR with random impulse responses for the first ``n_speakers`` speakers."""
+    hrir = HRIR(type("_e", (), {"fs": samplerate})())
+    for name in SPEAKER_NAMES[:n_speakers]:
+        hrir.irs[name] = {
+            "left": ImpulseResponse(np.random.randn(ir_length), samplerate),
+            "right": ImpulseResponse(np.random.randn(ir_length), samplerate),
+        }
+    return hrir
+
+
+def run_speaker_benchmark(
+    speaker_counts: list[int],
+    block_size: int = 1024,
+    ir_length: int = 256,
+    blocks: int = 1000,
+    samplerate: int = 48000,
+    seed: Optional[int] = None,
+    engine: str = "fft",
+    workers: int = 1,
+) -> None:
+    """Time the HRIR rendering path for different numbers of virtual speakers.
+
+    With more than one worker the average time each worker spent per block is listed as well, the first one being
+    the calling thread.
+    """
+
+    if seed is not None:
+        np.random.seed(seed)
+    print(
+        f"Running HRIR benchmark with block_size={block_size}, ir_length={ir_length}, "
+        f"blocks={blocks}, samplerate={samplerate}, engine={engine}, workers={workers}"
+        + (f", seed={seed}" if seed is not None else "")
+    )
+    print(f"{'speakers':>8}  {'ms/block':>9}  {'real-time factor':>16}" + ("  worker ms/block" if workers > 1 else ""))
+    for n_speakers in speaker_counts:
+        hrir = _synthetic_hrir(n_speakers, ir_length, samplerate)
+        convolver = RealTimeConvolver(hrir, block_size=block_size, engine=engine, workers=workers)
+        input_block = np.random.randn(n_speakers, block_size)
+        out = np.empty((2, block_size))
+        start = time.perf_counter()
+        for _ in range(blocks):
+            convolver.process_block(input_block, out=out)
+        per_block = (time.perf_counter() - start) / blocks
+        stats = convolver.worker_stats()
+        convolver.close()
+        line = f"{n_speakers:>8}  {per_block * 1000:>9.3f}  {per_block * samplerate / block_size:>16.4f}"
+        if stats is not None:
+            line += "  " + " ".join(f"{busy / blocks * 1000:.3f}" for busy in stats["busy"])
+        print(line)
+
+
+def suite_cases(suite: str = "quick") -> list[dict]:
+    """Return the benchmark cases of a suite.
+
+    ``quick`` runs in a few seconds and is meant for smoke tests, ``full`` covers the 16 speaker HRIR path with
+    impulse responses from 50 ms to 2 s, block sizes from 64 to 4096 samples, the partitioned and threaded engines
+    and BRIR sets of up to 360 orientations.
+    """
+    if suite == "quick":
+        return [
+            {"path": "hrir", "speakers": 16, "ir_ms": 50, "block_size": 256, "engine": "fft"},
+            {"path": "hrir", "speakers": 16, "ir_ms": 50, "block_size": 256, "engine": "partitioned"},
+            {"path": "brir", "angles": 8, "ir_ms": 50, "block_size": 256, "engine": "fft", "neighbours": 2},
+        ]
+    if suite != "full":
+        raise ValueError(f"Unknown suite '{suite}'. Accepted values are quick, full.")
+    cases = []
+    for ir_ms in (50, 500, 2000):
+        for block_size in (64, 256, 1024, 4096):
+            for engine in ("fft", "partitioned", "nonuniform"):
+                if engine == "fft" and ir_ms > 50 and block_size < 1024:
+                    # A single transform over the full response per small block is far from real time
+                    continue
+                cases.append(
+                    {"path": "hrir", "speakers": 16, "ir_ms": ir_ms, "block_size": block_size, "engine": engine}
+                )
+            cases.append(
+                {
+                    "path": "hrir",
+                    "speakers": 16,
+                    "ir_ms": ir_ms,
+                    "block_size": block_size,
+                    "engine": "partitioned",
+                    "workers": 4,
+                }
+            )
+    for angles in (4, 72, 360):
+        for interpolation, neighbours in (("blend", 3), ("switch", None)):
+            cases.append(
+                {
+                    "path": "brir",
+                    "angles": angles,
+                    "ir_ms": 500,
+                    "block_size": 256,
+                    "engine": "partitioned",
+                    "interpolation": interpolation,
+                    "neighbours": neighbours,
+                }
+            )
+    return cases
+
+
+def case_name(case: dict) -> str:
+    """Return a stable identifier of a benchmark case, used to match results against a baseline."""
+    source = f"hrir{case['speakers']}" if case["path"] == "hrir" else f"brir{case['angles']}"
+    name = f"{source}-{case['ir_ms']}ms-b{case['block_size']}-{case['engine']}"
+    if case.get("workers", 1) > 1:
+        name += f"-w{case['workers']}"
+    if case["path"] == "brir":
+        name += f"-{case.get('interpolation', 'blend')}"
+        if case.get("neighbours"):
+            name += f"{case['neighbours']}"
+    return name
+
+
+def benchmark_case(case: dict, blocks: int = 200, samplerate: int = 48000) -> dict:
+    """Time ``blocks`` calls of ``process_block`` for one case and return per block statistics in milliseconds.
+
+    ``rtf`` is the real-time factor, mean processing time divided by block duration.
+    """
+    block_size = case["block_size"]
+    ir_length = int(case["ir_ms"] * samplerate / 1000)
+    options = {"block_size": block_size, "engine": case["engine"], "workers": case.get("workers", 1)}
+    if case["path"] == "hrir":
+        n_inputs = case["speakers"]
+        convolver = RealTimeConvolver(_synthetic_hrir(n_inputs, ir_length, samplerate), **options)
+    else:
+        n_inputs = 2
+        brirs = {
+            float(a): (np.random.randn(ir_length), np.random.randn(ir_length))
+            for a in np.linspace(0, 360, case["angles"], endpoint=False)
+        }
+        convolver = RealTimeConvolver(
+            brirs,  # type: ignore[arg-type]
+            samplerate=samplerate,
+            neighbours=case.get("neighbours"),
+            interpolation=case.get("interpolation", "blend"),
+            **options,
+        )
+    input_block = np.random.randn(n_inputs, block_size)
+    out = np.empty((2, block_size))
+    times = np.empty(blocks)
+    try:
+        for i in range(blocks):
+            if case["path"] == "brir":
+                # Keep the head moving so that interpolation and switching are part of the measurement
+                convolver.set_orientation(i % 360)
+            start = time.perf_counter()
+            convolver.process_block(input_block, out=out)
+            times[i] = time.perf_counter() - start
+    finally:
+        convolver.close()
+    times *= 1000
+    mean = float(times.mean())
+    return {
+        "name": case_name(case),
+        "case": case,
+        "mean_ms": mean,
+        "p99_ms": float(np.percentile(times, 99)),
+        "max_ms": float(times.max()),
+        "rtf": mean / (block_size / samplerate * 1000),
+    }
+
+
+def run_suite(
+    cases: list[dict], blocks: int = 200, samplerate: int = 48000, seed: Optional[int] = None
+) -> dict:
+    """Run benchmark cases, print one line per case and return the results as a JSON-serializable dictionary."""
+    if seed is not None:
+        np.random.seed(seed)
+    results = []
+    print(f"{'case':<44}  {'mean ms':>8}  {'p99 ms':>8}  {'max ms':>8}  {'rtf':>7}")
+    for case in cases:
+        result = benchmark_case(case, blocks=blocks, samplerate=samplerate)
+        print(
+            f"{result['name']:<44}  {result['mean_ms']:>8.3f}  {result['p99_ms']:>8.3f}  "
+            f"{result['max_ms']:>8.3f}  {result['rtf']:>7.4f}"
+        )
+        results.append(result)
+    return {"samplerate": samplerate, "blocks": blocks, "results": results}
+
+
+def compare_results(current: dict, baseline: dict, tolerance: float = 0.1) -> list[str]:
+    """Return descriptions of cases whose mean or p99 time grew by more than ``tolerance`` over the baseline.
+
+    Raises:
+        ValueError: When a case is missing from either side, for example a baseline of another suite, or there is
+            nothing to compare.
+    """
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    names = [r["name"] for r in current["results"]]
+    if not names:
+        raise ValueError("No cases to compare")
+    missing = [name for name in names if name not in previous]
+    if missing:
+        raise ValueError(f"Cases missing from the baseline: {', '.join(missing)}")
+    extra = sorted(set(previous) - set(names))
+    if extra:
+        raise ValueError(f"Baseline cases missing from this run: {', '.join(extra)}")
+    regressions = []
+    for result in current["results"]:
+        reference = previous[result["name"]]
+        for key in ("mean_ms", "p99_ms"):
+            if result[key] > reference[key] * (1 + tolerance):
+                regressions.append(
+                    f"{result['name']}: {key} {result[key]:.3f} > {reference[key]:.3f} "
+                    f"(+{result[key] / reference[key] - 1:.0%})"
+                )
+    return regressions
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Benchmark RealTimeConvolver with synthetic data"
@@ -62,7 +281,82 @@ def main():
         default=None,
         help="Random seed for reproducible results",
     )
+    parser.add_argument(
+        "--speakers",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Benchmark the HRIR path for these virtual speaker counts instead of the BRIR path",
+    )
+    parser.add_argument(
+        "--suite",
+        choices=["quick", "full"],
+        default=None,
+        help="Run a predefined benchmark suite instead of a single configuration",
+    )
+    parser.add_argument("--json", default=None, help="Write suite results to this JSON file")
+    parser.add_argument(
+        "--compare", default=None, help="Baseline JSON file of an earlier suite run to check for regressions"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Relative slowdown of mean or p99 block time reported as regression",
+    )
+    parser.add_argument(
+        "--engine", choices=ENGINES, default="fft", help="Convolution engine used by the HRIR benchmark"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Worker threads used by the HRIR benchmark"
+    )
     args = parser.parse_args()
+    if not args.suite and (args.json or args.compare):
+        parser.error("--json and --compare need --suite")
+    if args.suite:
+        # Suite cases define their own configurations
+        ignored = [
+            f"--{name}"
+            for name in ("engine", "workers", "speakers", "block_size", "ir_length", "angles")
+            if getattr(args, name) != parser.get_default(name)
+        ]
+        if ignored:
+            parser.error(f"{', '.join(ignored)} cannot be combined with --suite")
+    if args.suite:
+        results = run_suite(
+            suite_cases(args.suite),
+            blocks=args.blocks,
+            samplerate=args.samplerate,
+            seed=args.seed,
+        )
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+        if args.compare:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+            try:
+                regressions = compare_results(results, baseline, args.tolerance)
+            except ValueError as e:
+                sys.exit(f"Cannot compare with {args.compare}: {e}")
+            for line in regressions:
+                print(f"REGRESSION {line}")
+            if regressions:
+                sys.exit(1)
+            print("No regressions")
+        return
+    if args.speakers:
+        run_speaker_benchmark(
+            args.speakers,
+            block_size=args.block_size,
+            ir_length=args.ir_length,
+            blocks=args.blocks,
+            samplerate=args.samplerate,
+            seed=args.seed,
+            engine=args.engine,
+            workers=args.workers,
+        )
+        return
     run_benchmark(
         block_size=args.block_size,
         ir_length=args.ir_length,
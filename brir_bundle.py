@@ -0,0 +1,246 @@
+# See NOTICE.md for license and attribution details.
+
+"""Single-file BRIR bundles with precomputed partition spectra.
+
+A bundle stores the impulse responses of an HRIR (one pair per speaker) or of a BRIR set (one pair per head
+orientation) together with the spectra used by the partitioned convolution engines. Arrays are stored raw after a
+JSON header, so they can be memory-mapped: opening a bundle does not transform or even read the responses, and the
+operating system shares the pages between processes and drops them under memory pressure.
+
+File layout::
+
+    b"EARPBRIR"  uint32 version  uint32 header length  JSON header  padding  arrays, each 64 byte aligned
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+MAGIC = b"EARPBRIR"
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sII")
+_ALIGN = 64
+
+
+def pairs_tensor(pairs: list) -> np.ndarray:
+    """Return ``(left, right)`` impulse response pairs zero padded to one array ``(pairs, ears, samples)``."""
+    max_len = max(max(len(left), len(right)) for left, right in pairs)
+    irs = np.zeros((len(pairs), 2, max_len))
+    for i, (left, right) in enumerate(pairs):
+        irs[i, 0, : len(left)] = left
+        irs[i, 1, : len(right)] = right
+    return irs
+
+
+def partition_spectra(
+    irs: np.ndarray, partition_size: int, offset: int = 0, n_partitions: Optional[int] = None
+) -> np.ndarray:
+    """Return spectra of consecutive zero padded partitions of ``irs`` ``(a, b, samples)``.
+
+    Args:
+        irs: Time-domain impulse responses.
+        partition_size: Samples per partition, every partition is transformed with twice this size.
+        offset: First sample of the first partition.
+        n_partitions: Number of partitions, defaults to as many as needed to cover the responses.
+
+    Returns:
+        Complex array ``(a, partitions, b, partition_size + 1)``, the memory layout of the partitioned engines.
+    """
+    if n_partitions is None:
+        n_partitions = max(1, -(-(irs.shape[-1] - offset) // partition_size))
+    section = irs[..., offset : offset + n_partitions * partition_size]
+    buf = np.zeros(irs.shape[:-1] + (n_partitions, 2 * partition_size))
+    for p in range(n_partitions):
+        part = section[..., p * partition_size : (p + 1) * partition_size]
+        buf[..., p, : part.shape[-1]] = part
+    return np.ascontiguousarray(np.moveaxis(np.fft.rfft(buf, axis=-1), -2, 1))
+
+
+class BRIRBundle:
+    """Impulse responses and partition spectra of an HRIR or a BRIR set.
+
+    Args:
+        fs: Sampling rate.
+        irs: Impulse responses ``(speakers or angles, 2, samples)``.
+        spectra: Partition spectra ``(2, partitions, speakers, bins)`` for HRIRs or ``(angles, partitions, 2, bins)``
+            for BRIR sets, as computed by ``partition_spectra``.
+        partition_size: Partition size of ``spectra`` in samples.
+        speakers: Speaker names of an HRIR.
+        angles: Head orientations of a BRIR set, yaw angles or ``(yaw, pitch, roll)`` tuples.
+        path: File the bundle was loaded from.
+    """
+
+    def __init__(
+        self,
+        fs: int,
+        irs: np.ndarray,
+        spectra: np.ndarray,
+        partition_size: int,
+        speakers: Optional[List[str]] = None,
+        angles: Optional[list] = None,
+        path: Optional[str] = None,
+    ) -> None:
+        if (speakers is None) == (angles is None):
+            raise ValueError("A bundle holds either speakers or angles")
+        self.fs = fs
+        self.irs = irs
+        self.spectra = spectra
+        self.partition_size = partition_size
+        self.speakers = speakers
+        self.angles = angles
+        self.path = path
+
+    @property
+    def kind(self) -> str:
+        """``"hrir"`` for speaker responses, ``"brir"`` for orientation dependent responses."""
+        return "hrir" if self.speakers is not None else "brir"
+
+    def brirs(self) -> Dict[Union[float, Tuple[float, float, float]], Tuple[np.ndarray, np.ndarray]]:
+        """Return the responses of a BRIR set as ``{angle: (left, right)}`` views into the bundle."""
+        if self.angles is None:
+            raise ValueError("Bundle holds HRIR speakers, not BRIR orientations")
+        return {angle: (self.irs[i, 0], self.irs[i, 1]) for i, angle in enumerate(self.angles)}
+
+
+def write_bundle(
+    file_path: str,
+    source,
+    fs: Optional[int] = None,
+    partition_size: int = 1024,
+) -> BRIRBundle:
+    """Write an HRIR or a BRIR set into a bundle file.
+
+    Args:
+        file_path: Output file.
+        source: ``HRIR`` object or dictionary mapping orientations to ``(left, right)`` BRIRs.
+        fs: Sampling rate, required for BRIR dictionaries.
+        partition_size: Partition size of the precomputed spectra, normally the playback block size.
+
+    Returns:
+        The bundle as written, without memory mapping.
+    """
+    header: dict = {"version": FORMAT_VERSION, "partition_size": partition_size}
+    if isinstance(source, dict):
+        if fs is None:
+            raise ValueError("fs must be given for BRIR dictionaries")
+        angles = list(source.keys())
+        irs = pairs_tensor([source[a] for a in angles])
+        spectra = partition_spectra(irs, partition_size)
+        header["angles"] = [list(a) if isinstance(a, tuple) else a for a in angles]
+        bundle = BRIRBundle(fs, irs, spectra, partition_size, angles=angles)
+    else:
+        fs = source.fs
+        speakers = list(source.irs.keys())
+        irs = pairs_tensor([(source.irs[s]["left"].data, source.irs[s]["right"].data) for s in speakers])
+        spectra = partition_spectra(np.transpose(irs, (1, 0, 2)), partition_size)
+        header["speakers"] = speakers
+        bundle = BRIRBundle(fs, irs, spectra, partition_size, speakers=speakers)
+    header["fs"] = int(fs)
+
+    arrays = {"irs": irs.astype(np.float32), "spectra": spectra.astype(np.complex64)}
+    header_size = 1024
+    while True:
+        # Place the arrays after a header area large enough for the header describing them
+        offset = _align(_PREFIX.size + header_size)
+        header["arrays"] = {}
+        for name, array in arrays.items():
+            header["arrays"][name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+            offset = _align(offset + array.nbytes)
+        encoded = json.dumps(header).encode("utf-8")
+        if len(encoded) <= header_size:
+            break
+        header_size = 2 * len(encoded)
+
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(encoded)))
+        f.write(encoded)
+        for name, array in arrays.items():
+            f.seek(header["arrays"][name]["offset"])
+            f.write(array.tobytes())
+    os.replace(tmp_path, file_path)
+    return bundle
+
+
+def load_bundle(file_path: str, mmap: bool = True) -> BRIRBundle:
+    """Load a bundle file.
+
+    Args:
+        file_path: Bundle file.
+        mmap: Memory-map the arrays read-only instead of reading them into memory.
+    """
+    with open(file_path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"'{file_path}' is not a BRIR bundle")
+        magic, version, header_len = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"'{file_path}' is not a BRIR bundle")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Unsupported BRIR bundle version {version}, newest supported is {FORMAT_VERSION}")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        if mmap:
+            arrays[name] = np.memmap(file_path, dtype=dtype, mode="r", offset=spec["offset"], shape=shape)
+        else:
+            count = int(np.prod(shape))
+            arrays[name] = np.fromfile(file_path, dtype=dtype, count=count, offset=spec["offset"]).reshape(shape)
+    angles = header.get("angles")
+    if angles is not None:
+        angles = [tuple(a) if isinstance(a, list) else a for a in angles]
+    return BRIRBundle(
+        header["fs"],
+        arrays["irs"],
+        arrays["spectra"],
+        header["partition_size"],
+        speakers=header.get("speakers"),
+        angles=angles,
+        path=file_path,
+    )
+
+
+def read_brir_dir(dir_path: str) -> Dict[float, Tuple[np.ndarray, np.ndarray]]:
+    """Read ``<yaw>.npz`` files holding ``left`` and ``right`` arrays into a BRIR dictionary."""
+    brirs = {}
+    for file in os.listdir(dir_path):
+        if file.endswith(".npz"):
+            data = np.load(os.path.join(dir_path, file))
+            brirs[float(os.path.splitext(file)[0])] = (data["left"], data["right"])
+    return brirs
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile an HRIR or a directory of BRIRs into a bundle file")
+    parser.add_argument("source", help="hrir.wav generated by Earprint or directory of <angle>.npz BRIRs")
+    parser.add_argument("output", help="Output bundle file")
+    parser.add_argument("--partition_size", type=int, default=1024, help="Playback block size")
+    parser.add_argument("--fs", type=int, default=None, help="Sampling rate of a BRIR directory")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        if args.fs is None:
+            parser.error("--fs is required for BRIR directories")
+        write_bundle(args.output, read_brir_dir(args.source), fs=args.fs, partition_size=args.partition_size)
+    else:
+        from realtime_convolution import hrir_from_wav
+
+        write_bundle(args.output, hrir_from_wav(args.source), partition_size=args.partition_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# See NOTICE.md for license and attribution details.
+
+"""Dense BRIR orientation grids interpolated offline with interaural delays kept intact.
+
+Blending the complex spectra of neighbouring measurements averages two copies of the sound arriving at different
+times, which comb-filters and smears the interaural time difference. Here every measured BRIR is split into its
+onset delay, the magnitude of its direct sound and the rest of the response. The parts are interpolated separately
+onto a dense grid of orientations: delays linearly, magnitudes in dB and rebuilt with minimum phase, the
+reflections and reverberation sample by sample. Playing the grid with ``interpolation="switch"`` then takes a
+nearest neighbour lookup and a one block crossfade per orientation change.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import scipy.fft
+
+from brir_bundle import load_bundle, read_brir_dir, write_bundle
+from orientation_index import OrientationIndex
+
+Angle = Union[float, Tuple[float, float, float]]
+# Level relative to the peak at which a response's onset is detected
+ONSET_THRESHOLD = -20.0
+
+
+def onset_delay(ir: np.ndarray, threshold: float = ONSET_THRESHOLD) -> int:
+    """Return the first sample of ``ir`` reaching ``threshold`` dB below its peak.
+
+    Whole samples keep the alignment of measured responses exact, delays interpolated between them are fractional.
+    """
+    level = np.abs(ir)
+    return int(np.argmax(level >= level.max() * 10 ** (threshold / 20)))
+
+
+def fractional_shift(ir: np.ndarray, delay: float, n: int) -> np.ndarray:
+    """Return ``ir`` delayed by ``delay`` samples, which may be negative or fractional, truncated to ``n`` samples.
+
+    The shift is applied as a linear phase in a transform long enough that samples moved out of the front do not
+    wrap into the kept part.
+    """
+    size = scipy.fft.next_fast_len(len(ir) + n + int(np.ceil(abs(delay))) + 1, real=True)
+    spectrum = scipy.fft.rfft(ir, size)
+    spectrum *= np.exp(-2j * np.pi * np.arange(len(spectrum)) * delay / size)
+    return scipy.fft.irfft(spectrum, size)[:n]
+
+
+def minimum_phase(log_magnitude: np.ndarray, n: int) -> np.ndarray:
+    """Return the minimum phase impulse response of a magnitude in natural log over ``n // 2 + 1`` bins."""
+    cepstrum = scipy.fft.irfft(log_magnitude, n)
+    folded = np.zeros(n)
+    folded[0] = cepstrum[0]
+    folded[1 : n // 2] = 2 * cepstrum[1 : n // 2]
+    folded[n // 2] = cepstrum[n // 2]
+    return scipy.fft.irfft(np.exp(scipy.fft.rfft(folded)), n)
+
+
+class _Decomposition:
+    """Onset delays, direct sound log magnitudes and remainders of BRIRs ``(angles, ears, samples)``."""
+
+    def __init__(self, irs: np.ndarray, direct: int, n_fft: int) -> None:
+        self.length = irs.shape[-1]
+        self.n_fft = n_fft
+        # Direct sound window with a raised cosine fade out over its last quarter, the remainder keeps the rest
+        fade = max(1, direct // 4)
+        window = np.ones(direct)
+        window[-fade:] = 0.5 + 0.5 * np.cos(np.pi * (np.arange(fade) + 0.5) / fade)
+        shape = irs.shape[:-1]
+        self.delays = np.zeros(shape)
+        self.log_magnitudes = np.zeros(shape + (n_fft // 2 + 1,))
+        self.remainders = np.array(irs, dtype=float)
+        for index in np.ndindex(shape):
+            onset = onset_delay(irs[index])
+            self.delays[index] = onset
+            head = irs[index][onset : onset + direct] * window[: self.length - onset]
+            magnitude = np.abs(scipy.fft.rfft(head, n_fft))
+            self.log_magnitudes[index] = np.log(np.maximum(magnitude, 1e-9 * max(magnitude.max(), 1e-30)))
+            self.remainders[index][onset : onset + len(head)] -= head
+
+    def interpolate(self, indices: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Return the BRIR ``(ears, samples)`` interpolated from the angles ``indices`` with ``weights``."""
+        delays = np.einsum("a,ae->e", weights, self.delays[indices])
+        log_magnitudes = np.einsum("a,aek->ek", weights, self.log_magnitudes[indices])
+        out = np.einsum("a,aet->et", weights, self.remainders[indices])
+        for ear in range(out.shape[0]):
+            head = minimum_phase(log_magnitudes[ear], self.n_fft)
+            out[ear] += fractional_shift(head, delays[ear], self.length)
+        return out
+
+
+def dense_grid(
+    brirs: Dict[Angle, Tuple[np.ndarray, np.ndarray]],
+    fs: int,
+    yaw_step: float = 1.0,
+    pitch_step: Optional[float] = None,
+    direct_time: float = 0.0025,
+    neighbours: Optional[int] = None,
+) -> Dict[Angle, Tuple[np.ndarray, np.ndarray]]:
+    """Interpolate measured BRIRs onto a dense grid of head orientations.
+
+    Args:
+        brirs: Measured BRIRs, yaw angles or ``(yaw, pitch, roll)`` tuples mapped to ``(left, right)``.
+        fs: Sampling rate.
+        yaw_step: Yaw spacing of the grid in degrees.
+        pitch_step: Pitch spacing in degrees for ``(yaw, pitch, roll)`` sets, defaults to ``yaw_step``. The grid
+            spans the measured pitch range with zero roll.
+        direct_time: Length in seconds of the direct sound after the onset, rebuilt with minimum phase.
+        neighbours: Number of nearest measurements interpolated, defaults to 2 for yaw angles and 4 otherwise.
+
+    Returns:
+        BRIRs of the grid with the angle type of ``brirs``, as accepted by ``RealTimeConvolver`` and
+        ``write_bundle``.
+    """
+    if yaw_step <= 0 or (pitch_step is not None and pitch_step <= 0):
+        raise ValueError("Grid steps must be positive")
+    angles = list(brirs.keys())
+    yaw_only = not isinstance(angles[0], tuple)
+    max_len = max(max(len(left), len(right)) for left, right in brirs.values())
+    irs = np.zeros((len(angles), 2, max_len))
+    for i, angle in enumerate(angles):
+        for ear, ir in enumerate(brirs[angle]):
+            irs[i, ear, : len(ir)] = ir
+    direct = max(4, int(round(direct_time * fs)))
+    parts = _Decomposition(irs, direct, 1 << (8 * direct - 1).bit_length())
+    index = OrientationIndex(angles, neighbours or (2 if yaw_only else 4))
+
+    yaws = np.arange(0.0, 360.0, yaw_step)
+    if yaw_only:
+        grid: list = [float(yaw) for yaw in yaws]
+    else:
+        pitches = np.array([a[1] for a in angles], dtype=float)
+        step = pitch_step or yaw_step
+        pitch_grid = np.arange(pitches.min(), pitches.max() + 0.5 * step, step)
+        grid = [(float(yaw), float(pitch), 0.0) for pitch in pitch_grid for yaw in yaws]
+
+    dense = {}
+    for angle in grid:
+        indices, weights = index.query(*(angle if isinstance(angle, tuple) else (angle,)))
+        if indices is None:
+            indices = np.arange(len(angles))
+        out = parts.interpolate(indices, weights)
+        dense[angle] = (out[0], out[1])
+    return dense
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Interpolate measured BRIRs onto a dense orientation grid bundle")
+    parser.add_argument("source", help="BRIR bundle or directory of <angle>.npz BRIRs")
+    parser.add_argument("output", help="Output bundle file")
+    parser.add_argument("--fs", type=int, default=None, help="Sampling rate of a BRIR directory")
+    parser.add_argument("--yaw_step", type=float, default=1.0, help="Yaw spacing in degrees")
+    parser.add_argument("--pitch_step", type=float, default=None, help="Pitch spacing in degrees")
+    parser.add_argument("--direct_time", type=float, default=0.0025, help="Direct sound length in seconds")
+    parser.add_argument("--partition_size", type=int, default=1024, help="Playback block size")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        if args.fs is None:
+            parser.error("--fs is required for BRIR directories")
+        fs, brirs = args.fs, read_brir_dir(args.source)
+    else:
+        bundle = load_bundle(args.source)
+        fs, brirs = bundle.fs, bundle.brirs()
+    grid = dense_grid(brirs, fs, args.yaw_step, args.pitch_step, args.direct_time)
+    write_bundle(args.output, grid, fs=fs, partition_size=args.partition_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -170,6 +170,26 @@ SPEAKER_LIST_PATTERN = r"{speaker_pattern}+(,{speaker_pattern})*".format(speaker
 
 SPEAKER_DELAYS = {_speaker: 0 for _speaker in SPEAKER_NAMES}
 
+# Nominal speaker directions as (azimuth, elevation) in degrees, azimuth counterclockwise from the front and
+# elevation up from the horizontal plane. LFE and the ambisonics channels have no direction.
+SPEAKER_DIRECTIONS: dict[str, tuple[float, float]] = {
+    "FL": (30.0, 0.0),
+    "FR": (-30.0, 0.0),
+    "FC": (0.0, 0.0),
+    "SL": (90.0, 0.0),
+    "SR": (-90.0, 0.0),
+    "BL": (135.0, 0.0),
+    "BR": (-135.0, 0.0),
+    "WL": (60.0, 0.0),
+    "WR": (-60.0, 0.0),
+    "TFL": (45.0, 45.0),
+    "TFR": (-45.0, 45.0),
+    "TSL": (90.0, 45.0),
+    "TSR": (-90.0, 45.0),
+    "TBL": (135.0, 45.0),
+    "TBR": (-135.0, 45.0),
+}
+
 
 # Available X-Curve profiles with reference frequency and slope in dB/octave
 X_CURVE_TYPES = {
@@ -56,6 +56,7 @@ def main(
     x_curve_type=X_CURVE_DEFAULT_TYPE,
     interactive_delays=False,
     delay_file=None,
+    brir_bundle=False,
 ):
     """Run the full earprint processing pipeline.
 
@@ -252,6 +253,11 @@ def main(
     # Write multi-channel WAV file with standard track order
     print("Writing BRIRs...")
     hrir.write_wav(os.path.join(dir_path, "hrir.wav"))
+    if brir_bundle:
+        from brir_bundle import write_bundle
+
+        # Precomputed spectra for fast real-time convolver start-up
+        write_bundle(os.path.join(dir_path, "hrir.brir"), hrir)
 
     # Write multi-channel WAV file with HeSuVi track order
     hrir.write_wav(
@@ -838,6 +844,11 @@ def create_cli():
     arg_parser.add_argument(
         "--interactive_delays", action="store_true", help="Prompt for speaker angles and distances to compute delays."
     )
+    arg_parser.add_argument(
+        "--brir_bundle",
+        action="store_true",
+        help="Also write hrir.brir, a bundle with precomputed spectra the real-time convolver loads instantly.",
+    )
     args = vars(arg_parser.parse_args())
     if "bass_boost" in args:
         bass_boost = args["bass_boost"].split(",")
@@ -0,0 +1,222 @@
+# See NOTICE.md for license and attribution details.
+
+"""FFT backends and transform size autotuning for the real-time convolution engine."""
+
+from __future__ import annotations
+
+import base64
+import inspect
+import json
+import os
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import scipy.fft
+
+try:
+    import pyfftw  # type: ignore
+except Exception:  # pragma: no cover - optional dependency may be missing
+    pyfftw = None
+
+BACKENDS = ("numpy", "scipy", "pyfftw")
+# Backend used when no tuning is requested, FFTW plans when pyFFTW is installed
+DEFAULT_BACKEND = "pyfftw" if pyfftw is not None else "numpy"
+TUNING_FILE = os.environ.get(
+    "EARPRINT_FFT_TUNING", os.path.join(os.path.expanduser("~"), ".earprint", "fft_tuning.json")
+)
+
+# True when numpy real FFTs can write into preallocated arrays, numpy >= 2.0 accepts an ``out`` argument
+NUMPY_OUT = "out" in inspect.signature(np.fft.rfft).parameters
+# True when the default backend transforms in place: FFTW plans bound to the workspace or numpy with ``out``
+INPLACE_FFT = pyfftw is not None or NUMPY_OUT
+
+
+def available_backends() -> list[str]:
+    """Return the FFT backends usable in this environment."""
+    return [b for b in BACKENDS if b != "pyfftw" or pyfftw is not None]
+
+
+def candidate_sizes(min_size: int) -> list[int]:
+    """Return transform sizes worth trying for at least ``min_size`` samples: the next power of two and the next
+    size with only small prime factors, which may be considerably smaller."""
+    pow2 = 1 << (min_size - 1).bit_length()
+    fast = scipy.fft.next_fast_len(min_size, real=True)
+    return sorted({pow2, fast})
+
+
+class RealFFT:
+    """Real FFT pair between preallocated time ``(rows, n)`` and frequency ``(rows, n // 2 + 1)`` arrays.
+
+    ``forward`` transforms ``time`` into ``freq`` and ``inverse`` transforms ``freq`` back into ``time``. The
+    inverse transform may overwrite ``freq``. Backends which cannot write into the workspace compute the result
+    into a temporary array which is copied into the workspace.
+
+    Args:
+        rows: Number of signals transformed together.
+        n: Transform size.
+        backend: One of ``BACKENDS``.
+        row_transforms: Also prepare ``forward_row`` for transforming single rows, which plans one FFTW transform
+            per row.
+    """
+
+    def __init__(self, rows: int, n: int, backend: str = DEFAULT_BACKEND, row_transforms: bool = False) -> None:
+        if backend not in available_backends():
+            raise ValueError(
+                f"Unknown FFT backend '{backend}'. Accepted values are {', '.join(available_backends())}."
+            )
+        self.n = n
+        self.backend = backend
+        if backend == "pyfftw":
+            self.time = pyfftw.empty_aligned((rows, n), dtype="float64")
+            self.freq = pyfftw.empty_aligned((rows, n // 2 + 1), dtype="complex128")
+            self._forward = pyfftw.FFTW(self.time, self.freq, axes=(-1,))
+            self._inverse = pyfftw.FFTW(self.freq, self.time, axes=(-1,), direction="FFTW_BACKWARD")
+            self._row_forward = None
+            if row_transforms:
+                self._row_forward = [pyfftw.FFTW(self.time[r], self.freq[r]) for r in range(rows)]
+            # Planning may scribble over the arrays
+            self.time.fill(0.0)
+            self.freq.fill(0.0)
+        else:
+            self.time = np.zeros((rows, n))
+            self.freq = np.zeros((rows, n // 2 + 1), dtype=complex)
+            self._forward = None
+            self._inverse = None
+            self._row_forward = None
+
+    def forward(self) -> None:
+        if self._forward is not None:
+            self._forward()
+        elif self.backend == "scipy":
+            self.freq[...] = scipy.fft.rfft(self.time, axis=-1)
+        elif NUMPY_OUT:
+            np.fft.rfft(self.time, axis=-1, out=self.freq)
+        else:
+            self.freq[...] = np.fft.rfft(self.time, axis=-1)
+
+    def forward_row(self, row: int) -> None:
+        """Transform only row ``row`` of ``time`` into the same row of ``freq``."""
+        if self._row_forward is not None:
+            self._row_forward[row]()
+        elif self.backend == "scipy":
+            self.freq[row] = scipy.fft.rfft(self.time[row])
+        elif NUMPY_OUT:
+            np.fft.rfft(self.time[row], out=self.freq[row])
+        else:
+            self.freq[row] = np.fft.rfft(self.time[row])
+
+    def inverse(self) -> None:
+        if self._inverse is not None:
+            self._inverse()
+        elif self.backend == "scipy":
+            self.time[...] = scipy.fft.irfft(self.freq, n=self.n, axis=-1, overwrite_x=True)
+        elif NUMPY_OUT:
+            np.fft.irfft(self.freq, n=self.n, axis=-1, out=self.time)
+        else:
+            self.time[...] = np.fft.irfft(self.freq, n=self.n, axis=-1)
+
+
+def time_transform(rows: int, n: int, backend: str, repeats: int = 20) -> float:
+    """Return the fastest time in seconds of one forward and inverse transform pair out of ``repeats`` runs."""
+    transform = RealFFT(rows, n, backend)
+    transform.time[...] = np.random.default_rng(0).standard_normal(transform.time.shape)
+    transform.forward()
+    transform.inverse()
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        transform.forward()
+        transform.inverse()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class FFTTuner:
+    """Pick the fastest backend and transform size and remember the decision across sessions.
+
+    Decisions are stored in a JSON file keyed by the number of rows and the smallest acceptable transform size,
+    together with the FFTW wisdom gathered while planning. Loading the file imports the wisdom, so FFTW plans of
+    later sessions are created without measuring again.
+
+    Args:
+        file_path: Cache file, ``None`` keeps the decisions in memory only.
+        backends: Backends to consider, defaults to all available ones.
+        repeats: Number of timed transform pairs per candidate.
+    """
+
+    def __init__(
+        self,
+        file_path: Optional[str] = TUNING_FILE,
+        backends: Optional[Iterable[str]] = None,
+        repeats: int = 20,
+    ) -> None:
+        self.file_path = file_path
+        self.backends = list(backends) if backends is not None else available_backends()
+        self.repeats = repeats
+        self.plans: Dict[str, dict] = {}
+        # Number of candidates timed by this tuner, stays zero when every decision came from the cache
+        self.measurements = 0
+        self._load()
+
+    def _load(self) -> None:
+        if self.file_path is None or not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if not isinstance(data, dict):
+            return
+        plans = data.get("plans", {})
+        if isinstance(plans, dict):
+            self.plans = {k: v for k, v in plans.items() if isinstance(v, dict)}
+        wisdom = data.get("wisdom")
+        if pyfftw is not None and isinstance(wisdom, list):
+            try:
+                pyfftw.import_wisdom(tuple(base64.b64decode(w) for w in wisdom))
+            except (TypeError, ValueError):  # pragma: no cover - wisdom of another FFTW build
+                pass
+
+    def save(self) -> None:
+        """Write the decisions and FFTW wisdom to the cache file."""
+        if self.file_path is None:
+            return
+        data: dict = {"plans": self.plans}
+        if pyfftw is not None:
+            data["wisdom"] = [base64.b64encode(w).decode("ascii") for w in pyfftw.export_wisdom()]
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.file_path)
+
+    def select(self, rows: int, min_size: int, sizes: Optional[Iterable[int]] = None) -> Tuple[str, int]:
+        """Return the fastest ``(backend, n)`` for transforming ``rows`` signals of at least ``min_size`` samples.
+
+        Args:
+            rows: Number of signals transformed together.
+            min_size: Smallest acceptable transform size.
+            sizes: Candidate transform sizes, defaults to ``candidate_sizes(min_size)``.
+        """
+        sizes = sorted(set(sizes)) if sizes is not None else candidate_sizes(min_size)
+        key = f"{rows}x{min_size}:{','.join(str(n) for n in sizes)}"
+        plan = self.plans.get(key)
+        if plan is not None and plan.get("backend") in self.backends and plan.get("n") in sizes:
+            return plan["backend"], plan["n"]
+
+        timings = {}
+        for backend in self.backends:
+            for n in sizes:
+                timings[(backend, n)] = time_transform(rows, n, backend, self.repeats)
+                self.measurements += 1
+        backend, n = min(timings, key=timings.get)
+        self.plans[key] = {"backend": backend, "n": int(n), "seconds": timings[(backend, n)]}
+        try:
+            self.save()
+        except OSError:  # pragma: no cover - read-only cache location, keep the decision for this session
+            pass
+        return backend, int(n)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -10,4 +11,6 @@ class PlaybackSettings:
     samplerate: int = 48000
     blocksize: int = 1024
     latency: float = 0.0
-    smoothing_ms: float = 50.0
\ No newline at end of file
+    smoothing_ms: float = 50.0
+    # Head tracker calibration offsets, ``None`` uses data/tracking_calibration.json
+    tracking_calibration: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,85 @@
+# See NOTICE.md for license and attribution details.
+
+"""Nearest neighbour lookup over the head orientations of measured BRIRs, shared by the real-time convolver and
+the offline BRIR grid interpolation."""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class OrientationIndex:
+    """Nearest neighbour lookup over measured BRIR orientations.
+
+    Yaw-only orientation sets are kept as a sorted ring, ``(yaw, pitch, roll)`` sets in a KD-tree with periodic yaw
+    and roll axes. Distances are Euclidean in degrees with yaw and roll wrapped around.
+
+    Args:
+        angles: Measured orientations, yaw angles or ``(yaw, pitch, roll)`` tuples in degrees.
+        k: Number of nearest neighbours used for interpolation, ``None`` uses all angles.
+    """
+
+    def __init__(self, angles: list, k: Optional[int] = None) -> None:
+        self.points = np.array(angles, dtype=float)
+        self.k = None if k is None or k >= len(angles) else max(1, k)
+        if self.points.ndim == 1:
+            yaw = self.points % 360.0
+            self._order = np.argsort(yaw)
+            self._ring = yaw[self._order]
+            self._tree = None
+        else:
+            wrapped = self.points.copy()
+            wrapped[:, 0] %= 360.0
+            wrapped[:, 2] %= 360.0
+            # Zero box size leaves pitch non-periodic
+            self._tree = cKDTree(wrapped, boxsize=[360.0, 0.0, 360.0])
+
+    def distances(self, yaw: float, pitch: float = 0.0, roll: float = 0.0) -> np.ndarray:
+        """Return distances from the orientation to every measured angle."""
+        if self.points.ndim == 1:
+            return circular_distance(self.points, yaw)
+        d_yaw = circular_distance(self.points[:, 0], yaw)
+        d_pitch = self.points[:, 1] - pitch
+        d_roll = circular_distance(self.points[:, 2], roll)
+        return np.sqrt(d_yaw**2 + d_pitch**2 + d_roll**2)
+
+    def query(self, yaw: float, pitch: float = 0.0, roll: float = 0.0) -> tuple[Optional[np.ndarray], np.ndarray]:
+        """Return ``(indices, weights)`` of the neighbours interpolated for the orientation.
+
+        ``indices`` is ``None`` when all angles are used, in which case ``weights`` has one entry per angle.
+        Weights are inverse distance weights normalized to one, an exact match gets all weight.
+        """
+        if self.k is None:
+            indices = None
+            dists = self.distances(yaw, pitch, roll)
+        elif self._tree is None:
+            n = len(self._ring)
+            pos = int(np.searchsorted(self._ring, yaw % 360.0))
+            if 2 * self.k >= n:
+                candidates = self._order
+            else:
+                # The k nearest angles lie within k positions on either side of the insertion point
+                candidates = self._order[np.arange(pos - self.k, pos + self.k) % n]
+            dists = circular_distance(self.points[candidates], yaw)
+            nearest = np.argsort(dists, kind="stable")[: self.k]
+            indices = candidates[nearest]
+            dists = dists[nearest]
+        else:
+            dists, indices = self._tree.query([yaw % 360.0, pitch, roll % 360.0], k=self.k)
+            dists = np.atleast_1d(dists)
+            indices = np.atleast_1d(indices)
+
+        if np.any(dists == 0):
+            weights = (dists == 0).astype(float)
+        else:
+            weights = 1.0 / dists
+        return indices, weights / weights.sum()
+
+
+def circular_distance(a: np.ndarray, b: float) -> np.ndarray:
+    """Return smallest distances between angles in degrees."""
+    diff = np.abs(np.asarray(a) - b) % 360.0
+    return np.minimum(diff, 360.0 - diff)
@@ -0,0 +1,400 @@
+# See NOTICE.md for license and attribution details.
+
+"""Long-running local playback service controlled over a socket.
+
+The daemon keeps one ``RealTimeConvolver`` and an optional ``HeadTracker`` alive, so front ends load BRIRs, start
+and stop playback, steer the head orientation and read statistics and level meters without paying the start up
+of a Python interpreter with numpy and scipy for every action.
+
+Clients connect to a TCP port on localhost or to a Unix socket and exchange JSON objects, one per line. A request
+names a ``command`` and carries its parameters and an optional ``id`` which is copied into the response::
+
+    {"id": 1, "command": "load", "path": "data/my_hrir/hrir.brir"}
+    {"id": 1, "result": {"speakers": 16, "samplerate": 48000, "block_size": 1024, "swapped": false}}
+
+Failed requests are answered with ``{"id": 1, "error": "message"}``. After ``subscribe`` the daemon also sends
+``{"event": "meters", "peak_db": [...], "rms_db": [...], "clips": 0}`` every ``interval`` seconds until
+``unsubscribe`` or the end of the connection. See ``PlaybackService`` for the commands.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from brir_bundle import load_bundle, read_brir_dir
+from realtime_convolution import OutputMeter, RealTimeConvolver, hrir_from_wav
+from tracking import CALIBRATION_FILE, HeadTracker
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9100
+# Seconds between meter events of a subscription unless the client asks otherwise
+METER_INTERVAL = 0.05
+
+
+def read_irs(path: str):
+    """Return the impulse responses stored at ``path`` and the engine suiting them.
+
+    ``path`` is a ``.brir`` bundle, played with the partitioned engine to use its precomputed spectra, an
+    ``hrir.wav`` file or a directory of ``<yaw>.npz`` BRIRs.
+    """
+    if os.path.isdir(path):
+        brirs = read_brir_dir(path)
+        if not brirs:
+            raise ValueError(f"No BRIRs found in {path}")
+        return brirs, "fft"
+    if path.lower().endswith(".wav"):
+        return hrir_from_wav(path), "fft"
+    return load_bundle(path), "partitioned"
+
+
+class NullAudioBackend:
+    """Audio backend without a device for tests and headless machines.
+
+    A thread feeds the convolver one block at a time, paced to the sampling rate, and discards the output after
+    the convolver's meter has seen it.
+
+    Args:
+        signal: Mono test signal played in a loop on every input channel, silence when not given.
+        realtime: Pace the blocks to the sampling rate, otherwise process them as fast as possible.
+    """
+
+    def __init__(self, signal: Optional[np.ndarray] = None, realtime: bool = True) -> None:
+        self.signal = None if signal is None else np.asarray(signal, dtype=float)
+        self.realtime = realtime
+        self.blocks = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self, convolver: RealTimeConvolver) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(convolver,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, convolver: RealTimeConvolver) -> None:
+        b = convolver.block_size
+        block = np.zeros((convolver.n_speakers, b))
+        out = np.empty((2, b))
+        position = 0
+        deadline = time.perf_counter()
+        while not self._stop.is_set():
+            if self.signal is not None and len(self.signal):
+                indices = (position + np.arange(b)) % len(self.signal)
+                block[:] = self.signal[indices]
+                position = (position + b) % len(self.signal)
+            convolver.process_block(block, out=out)
+            self.blocks += 1
+            if self.realtime:
+                deadline += b / convolver.fs
+                self._stop.wait(max(0.0, deadline - time.perf_counter()))
+
+
+class SoundDeviceBackend:
+    """Audio backend playing through the audio device with ``RealTimeConvolver.start``.
+
+    Args:
+        **options: Options of ``RealTimeConvolver.start`` such as ``latency``, ``input_device``,
+            ``output_device``, ``decoupled`` or ``host_block_size``.
+    """
+
+    def __init__(self, **options) -> None:
+        self.options = options
+        self._convolver: Optional[RealTimeConvolver] = None
+
+    def start(self, convolver: RealTimeConvolver) -> None:
+        self._convolver = convolver
+        convolver.start(**self.options)
+
+    def stop(self) -> None:
+        if self._convolver is not None:
+            self._convolver.stop()
+            self._convolver = None
+
+
+class PlaybackService:
+    """Playback state shared by all clients of the daemon and the commands they send.
+
+    Commands are the coroutine methods listed in ``COMMANDS``, request parameters are passed as keyword arguments
+    and the return value is sent back as the result. Work which takes longer than a moment, reading and preparing
+    impulse responses or starting and stopping streams, runs on worker threads so that other clients keep being
+    served.
+
+    Args:
+        backend: Audio backend, ``SoundDeviceBackend()`` by default.
+    """
+
+    COMMANDS = ("ping", "load", "start", "stop", "orientation", "tracking", "stats", "meters")
+
+    def __init__(self, backend=None) -> None:
+        self.backend = backend if backend is not None else SoundDeviceBackend()
+        self.convolver: Optional[RealTimeConvolver] = None
+        self.tracker: Optional[HeadTracker] = None
+        self.playing = False
+        self.path: Optional[str] = None
+
+    async def ping(self) -> dict:
+        return {"playing": self.playing, "path": self.path}
+
+    async def load(
+        self,
+        path: str,
+        engine: Optional[str] = None,
+        block_size: Optional[int] = None,
+        orientation_smoothing: float = 0.05,
+        crossfade: Optional[float] = None,
+        **options,
+    ) -> dict:
+        """Load impulse responses, see ``read_irs``.
+
+        While playing, the new impulse responses are crossfaded in with ``RealTimeConvolver.swap_irs`` and keep the
+        block size, otherwise a new convolver is created with the given options and a block size of 1024 samples
+        unless given.
+        """
+        irs, default_engine = await asyncio.to_thread(read_irs, path)
+        engine = engine or default_engine
+        if self.playing:
+            swap_options = {"engine": engine, **options}
+            if crossfade is not None:
+                swap_options["crossfade"] = crossfade
+            if block_size is not None and block_size != self.convolver.block_size:
+                swap_options["block_size"] = block_size
+            await asyncio.wrap_future(self.convolver.swap_irs(irs, **swap_options))
+        else:
+            convolver = await asyncio.to_thread(
+                RealTimeConvolver,
+                irs,
+                block_size=block_size or 1024,
+                engine=engine,
+                orientation_source=self.tracker,
+                orientation_smoothing=orientation_smoothing,
+                **options,
+            )
+            convolver.meter = OutputMeter(convolver.block_size / convolver.fs)
+            if self.convolver is not None:
+                self.convolver.close()
+            self.convolver = convolver
+        self.path = path
+        return {
+            "speakers": self.convolver.n_speakers,
+            "samplerate": self.convolver.fs,
+            "block_size": self.convolver.block_size,
+            "swapped": self.playing,
+        }
+
+    async def start(self) -> dict:
+        if self.convolver is None:
+            raise RuntimeError("Load impulse responses before starting playback")
+        if not self.playing:
+            self.convolver.reset()
+            await asyncio.to_thread(self.backend.start, self.convolver)
+            self.playing = True
+        return {"playing": True}
+
+    async def stop(self) -> dict:
+        if self.playing:
+            await asyncio.to_thread(self.backend.stop)
+            self.playing = False
+        return {"playing": False}
+
+    async def orientation(self, yaw: float, pitch: float = 0.0, roll: float = 0.0) -> dict:
+        """Set the head orientation in degrees, overridden by the head tracker while it is enabled."""
+        if self.convolver is None:
+            raise RuntimeError("No impulse responses loaded")
+        self.convolver.set_orientation(yaw, pitch, roll)
+        return {"orientation": [float(yaw), float(pitch), float(roll)]}
+
+    async def tracking(
+        self,
+        enabled: bool = True,
+        port: int = 9000,
+        calibration_file: Optional[str] = CALIBRATION_FILE,
+        prediction: float = 0.0,
+    ) -> dict:
+        """Enable or disable OSC head tracking, see ``HeadTracker``."""
+        if self.tracker is not None:
+            await asyncio.to_thread(self.tracker.stop)
+            self.tracker = None
+        if enabled:
+            self.tracker = HeadTracker(port=port, calibration_file=calibration_file, prediction=prediction)
+            self.tracker.start()
+        if self.convolver is not None:
+            self.convolver.orientation_source = self.tracker
+        return {"tracking": enabled}
+
+    async def stats(self) -> dict:
+        """Return the convolver's statistics with the head tracker's under ``"tracking"``."""
+        stats = self.convolver.stats() if self.convolver is not None else {}
+        stats["playing"] = self.playing
+        stats["path"] = self.path
+        stats["tracking"] = self.tracker.stats() if self.tracker is not None else None
+        return stats
+
+    async def meters(self) -> Optional[dict]:
+        """Return the output levels, see ``OutputMeter.levels``, ``None`` before impulse responses are loaded."""
+        if self.convolver is None or self.convolver.meter is None:
+            return None
+        return self.convolver.meter.levels()
+
+    async def close(self) -> None:
+        """Stop playback and head tracking and release the convolver."""
+        await self.stop()
+        await self.tracking(enabled=False)
+        if self.convolver is not None:
+            self.convolver.close()
+            self.convolver = None
+
+
+class PlaybackDaemon:
+    """Socket server passing client requests to a ``PlaybackService``.
+
+    Args:
+        service: Service executing the commands, ``PlaybackService()`` by default.
+        host: Address of the TCP server, localhost by default.
+        port: TCP port, ``0`` picks a free one.
+        socket_path: Listen on this Unix socket instead of TCP.
+    """
+
+    def __init__(
+        self,
+        service: Optional[PlaybackService] = None,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        socket_path: Optional[str] = None,
+    ) -> None:
+        self.service = service if service is not None else PlaybackService()
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._shutdown: Optional[asyncio.Event] = None
+        # Connections being served and their handler tasks
+        self._clients: dict = {}
+
+    async def start(self) -> None:
+        """Start listening, ``port`` is updated with the actual port."""
+        self._shutdown = asyncio.Event()
+        if self.socket_path is not None:
+            self.server = await asyncio.start_unix_server(self._client, path=self.socket_path)
+        else:
+            self.server = await asyncio.start_server(self._client, self.host, self.port)
+            self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve(self) -> None:
+        """Serve clients until one sends ``shutdown``, then stop playback and close the server."""
+        if self.server is None:
+            await self.start()
+        try:
+            await self._shutdown.wait()
+        finally:
+            self.server.close()
+            # Closing the connections ends their handlers, which otherwise wait for the next request
+            for writer in self._clients.values():
+                writer.close()
+            await asyncio.gather(*self._clients, return_exceptions=True)
+            await self.server.wait_closed()
+            await self.service.close()
+            if self.socket_path is not None and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._clients[asyncio.current_task()] = writer
+        lock = asyncio.Lock()
+        subscription: Optional[asyncio.Task] = None
+
+        async def send(message: dict) -> None:
+            async with lock:
+                writer.write(json.dumps(message).encode() + b"\n")
+                await writer.drain()
+
+        async def publish_meters(interval: float) -> None:
+            while True:
+                levels = await self.service.meters()
+                if levels is not None:
+                    await send({"event": "meters", **levels})
+                await asyncio.sleep(interval)
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Requests must be JSON objects")
+                    request_id = request.pop("id", None)
+                    command = request.pop("command", None)
+                    if command == "subscribe":
+                        interval = float(request.get("interval", METER_INTERVAL))
+                        if interval <= 0:
+                            raise ValueError("interval must be positive")
+                        if subscription is not None:
+                            subscription.cancel()
+                        subscription = asyncio.create_task(publish_meters(interval))
+                        result = {"subscribed": True}
+                    elif command == "unsubscribe":
+                        if subscription is not None:
+                            subscription.cancel()
+                            subscription = None
+                        result = {"subscribed": False}
+                    elif command == "shutdown":
+                        self._shutdown.set()
+                        result = {"shutdown": True}
+                    elif command in PlaybackService.COMMANDS:
+                        result = await getattr(self.service, command)(**request)
+                    else:
+                        raise ValueError(f"Unknown command '{command}'")
+                except (ValueError, TypeError, RuntimeError, OSError, KeyError) as e:
+                    await send({"id": request_id, "error": str(e)})
+                else:
+                    await send({"id": request_id, "result": result})
+        except ConnectionError:
+            pass
+        finally:
+            if subscription is not None:
+                subscription.cancel()
+            writer.close()
+            self._clients.pop(asyncio.current_task(), None)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local playback service controlled over a socket")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port to listen on")
+    parser.add_argument("--socket", default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--latency", type=float, default=None, help="Audio device latency in seconds")
+    parser.add_argument("--input_device", default=None, help="Input device index or name")
+    parser.add_argument("--output_device", default=None, help="Output device index or name")
+    parser.add_argument("--null_audio", action="store_true", help="Process silence without an audio device")
+    args = parser.parse_args()
+
+    if args.null_audio:
+        backend = NullAudioBackend()
+    else:
+        backend = SoundDeviceBackend(
+            latency=args.latency, input_device=args.input_device, output_device=args.output_device
+        )
+    daemon = PlaybackDaemon(PlaybackService(backend), args.host, args.port, args.socket)
+    asyncio.run(daemon.serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,18 @@
 
 from __future__ import annotations
 
+import bisect
+import heapq
+import json
+import math
+import os
+import queue
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 import numpy as np
+import scipy.fft
+import scipy.signal
 from typing import Dict, Optional, Tuple, Union
 
 try:
@@ -12,6 +23,7 @@ try:
     from pyfftw.interfaces import numpy_fft as fft
     pyfftw.interfaces.cache.enable()
 except Exception:  # pragma: no cover - optional dependency may be missing
+    pyfftw = None
     from numpy import fft  # type: ignore
 
 try:
@@ -23,23 +35,1241 @@ import threading
 from impulse_response import ImpulseResponse
 from hrir import HRIR
 from constants import HEXADECAGONAL_TRACK_ORDER
+from ambisonics import SoundFieldRotator, binaural_filters, channel_names
+from brir_bundle import BRIRBundle, pairs_tensor, partition_spectra
+from fft_backend import DEFAULT_BACKEND, TUNING_FILE, FFTTuner, RealFFT, available_backends
+from orientation_index import OrientationIndex
+
+
+def _blend(
+    spectra: np.ndarray, neighbours: tuple[Optional[np.ndarray], np.ndarray], out: np.ndarray, tmp: np.ndarray
+) -> np.ndarray:
+    """Write the weighted sum over the first axis of ``spectra`` into ``out``.
+
+    Args:
+        spectra: Spectra with angles on the first axis.
+        neighbours: ``(indices, weights)`` as returned by ``OrientationIndex.query``.
+        out: Output array.
+        tmp: Scratch array shaped like ``out``.
+    """
+    indices, weights = neighbours
+    if indices is None:
+        # Same kind casting lets float64 weights blend single precision bundle spectra
+        return np.einsum("a,a...->...", weights, spectra, out=out, casting="same_kind")
+    np.multiply(spectra[indices[0]], weights[0], out=out)
+    for j in range(1, len(indices)):
+        np.multiply(spectra[indices[j]], weights[j], out=tmp)
+        out += tmp
+    return out
+
+
+def _fade_in(n: int) -> np.ndarray:
+    """Return an equal-gain raised cosine fade-in curve of ``n`` samples."""
+    return np.sin(0.5 * np.pi * (np.arange(n) + 0.5) / n) ** 2
+
+
+def _crossfade(new: np.ndarray, old: np.ndarray, fade_in: np.ndarray) -> None:
+    """Crossfade rows of ``old`` into rows of ``new`` in place, ``new`` holds the result."""
+    for row in range(new.shape[0]):
+        new[row] -= old[row]
+        new[row] *= fade_in
+        new[row] += old[row]
+
+
+# Head orientation handling for BRIR dictionaries. ``"blend"`` interpolates the
+# spectra of the nearest orientations every block, ``"switch"`` convolves with
+# the single nearest orientation and crossfades to a new one in the time domain.
+INTERPOLATIONS = ("blend", "switch")
+# Angle in degrees below which a smoothed orientation jumps to its target, so
+# that a head at rest stops changing the interpolation weights
+ORIENTATION_RESOLUTION = 0.01
+
+# Available convolution engines. ``"fft"`` convolves each block with the full
+# impulse response in one FFT, ``"partitioned"`` splits the impulse responses
+# into block sized partitions and keeps a frequency-domain delay line and
+# ``"nonuniform"`` uses block sized partitions only for the head of the impulse
+# responses and geometrically growing partitions computed on a background
+# worker for the tail.
+ENGINES = ("fft", "partitioned", "nonuniform")
+
+# Decimation factors tried for multirate tails and the taps per phase on each
+# side of their low-pass filters, the filter length used by
+# ``scipy.signal.resample_poly``
+MULTIRATE_FACTORS = (2, 4, 8, 16, 32)
+MULTIRATE_TAPS = 10
+# Length in samples of the crossfade between the full rate head and a multirate
+# tail, long enough for the tail's onset to stay within the pass band of the
+# largest factor
+MULTIRATE_FADE = 2 * MULTIRATE_TAPS * max(MULTIRATE_FACTORS)
+
+# Default length in seconds of the crossfade to impulse responses swapped in
+# with ``RealTimeConvolver.swap_irs``, rounded up to whole blocks
+SWAP_CROSSFADE = 0.05
+# Seconds without processed blocks, at least four block periods, after which
+# a pending swap is applied directly by the thread which prepared it
+SWAP_IDLE = 0.1
+
+# Ballistics of ``OutputMeter``: fall of held peaks in dB per second, time
+# constant in seconds of the RMS average and the lowest level reported in dB
+METER_PEAK_DECAY = 20.0
+METER_RMS_TIME = 0.3
+METER_FLOOR = -120.0
+
+
+def nonuniform_layout(ir_length: int, block_size: int, max_partition: int = 8192) -> list[tuple[int, int, int]]:
+    """Return partition layout for the non-uniform engine.
+
+    The head of the impulse response is covered by four block sized partitions. Every following level doubles the
+    partition size and holds two partitions until ``max_partition`` is reached, the last level holds as many
+    partitions as needed to cover the rest of the impulse response. Each level starts at an offset of at least twice
+    its partition size, which leaves one full partition period for computing it in the background.
+
+    Args:
+        ir_length: Impulse response length in samples.
+        block_size: Block size in samples.
+        max_partition: Largest partition size in samples.
+
+    Returns:
+        List of ``(partition_size, offset, n_partitions)`` tuples ordered by offset.
+    """
+    size = block_size
+    offset = 0
+    count = 4
+    layout = []
+    while offset < ir_length:
+        if 2 * size > max_partition:
+            count = -(-(ir_length - offset) // size)
+        else:
+            count = min(count, -(-(ir_length - offset) // size))
+        layout.append((size, offset, count))
+        offset += size * count
+        if 2 * size <= max_partition:
+            size *= 2
+            count = 2
+    return layout or [(block_size, 0, 1)]
+
+
+class _WorkerPool:
+    """Persistent threads running one function over disjoint parts of a block's work.
+
+    The calling thread computes part 0 itself, so ``n_workers`` parts run in parallel on ``n_workers - 1`` extra
+    threads. numpy releases the GIL in its multiply-reduce loops, which lets the parts scale across cores.
+
+    Args:
+        n_workers: Number of parts computed in parallel, including the calling thread.
+        deadline: Time budget of one ``run`` call in seconds, usually the block period. Slower calls are counted
+            in ``late``.
+    """
+
+    def __init__(self, n_workers: int, deadline: Optional[float] = None) -> None:
+        self.n_workers = n_workers
+        self.deadline = deadline
+        self.calls = 0
+        self.late = 0
+        # Per worker time spent in the last call, in all calls and in the slowest call in seconds
+        self.last = [0.0] * n_workers
+        self.busy = [0.0] * n_workers
+        self.peak = [0.0] * n_workers
+        self._fn = None
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._start = [threading.Event() for _ in range(n_workers - 1)]
+        self._done = [threading.Event() for _ in range(n_workers - 1)]
+        self._threads = [threading.Thread(target=self._run, args=(i,), daemon=True) for i in range(1, n_workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def run(self, fn, count: int) -> None:
+        """Call ``fn(i)`` for every ``i`` in ``range(count)`` in parallel and return when all calls have finished.
+
+        Args:
+            fn: Function of the part index.
+            count: Number of parts, at most ``n_workers``.
+        """
+        start = time.perf_counter()
+        self._fn = fn
+        for i in range(1, count):
+            self._start[i - 1].set()
+        self._call(0)
+        for i in range(1, count):
+            self._done[i - 1].wait()
+            self._done[i - 1].clear()
+        self._fn = None
+        self.calls += 1
+        if self.deadline is not None and time.perf_counter() - start > self.deadline:
+            self.late += 1
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _call(self, i: int) -> None:
+        start = time.perf_counter()
+        try:
+            self._fn(i)
+        except BaseException as e:  # pragma: no cover - re-raised by run()
+            self._error = e
+        elapsed = time.perf_counter() - start
+        self.last[i] = elapsed
+        self.busy[i] += elapsed
+        if elapsed > self.peak[i]:
+            self.peak[i] = elapsed
+
+    def _run(self, i: int) -> None:
+        start = self._start[i - 1]
+        while True:
+            start.wait()
+            start.clear()
+            if self._closed:
+                return
+            self._call(i)
+            self._done[i - 1].set()
+
+    def stats(self) -> dict:
+        """Return call counts and per worker timing in seconds."""
+        return {
+            "workers": self.n_workers,
+            "calls": self.calls,
+            "late": self.late,
+            "last": list(self.last),
+            "busy": list(self.busy),
+            "peak": list(self.peak),
+        }
+
+    def close(self) -> None:
+        self._closed = True
+        for event in self._start:
+            event.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def _partition_lengths(irs: np.ndarray, partition_size: int, offset: int, n_partitions: int) -> list[int]:
+    """Return the number of partitions up to the last non-zero one for every speaker of ``irs``
+    ``(ears, speakers, samples)``."""
+    section = irs[..., offset : offset + n_partitions * partition_size]
+    lengths = []
+    for c in range(irs.shape[1]):
+        nonzero = np.flatnonzero(np.any(section[:, c] != 0, axis=0))
+        lengths.append(int(nonzero[-1]) // partition_size + 1 if nonzero.size else 0)
+    return lengths
+
+
+class _PartitionedSegment:
+    """Uniformly partitioned overlap-save convolver for one section of the impulse responses.
+
+    Args:
+        irs: Time-domain impulse responses ``(ears, speakers, samples)`` or, when ``diagonal`` is set,
+            ``(angles, ears, samples)``.
+        partition_size: Partition and hop size in samples.
+        offset: First impulse response sample covered by this segment.
+        n_partitions: Number of partitions in this segment.
+        diagonal: Each ear is fed by its own input channel and the impulse responses are interpolated between
+            angles, as with BRIR dictionaries.
+        shared: ``irs`` holds a single late tail shared by all angles, interpolation arguments of ``process`` are
+            ignored.
+        pool: Worker pool sharing the multiply-accumulate over partition ranges.
+        backend: FFT backend of the segment's transforms, one of ``BACKENDS``.
+        spectra: Precomputed partition spectra as returned by ``partition_spectra``, for example memory-mapped from
+            a BRIR bundle. ``irs`` is then only used for its shape. The delay line uses the precision of the spectra.
+
+    Speaker segments skip silent input channels. A channel whose last two partitions were silent has a zero input
+    spectrum and is not transformed, and once every spectrum of the channel in the delay line is zero it is left
+    out of the multiply-accumulate as well. Trailing all-zero partitions of a speaker's impulse responses, for
+    example where a multirate tail takes over, are left out the same way. ``skipped_transforms`` and
+    ``skipped_macs`` count the skipped channel transforms and multiply-accumulates out of ``channel_partitions``
+    processed.
+    """
+
+    def __init__(
+        self,
+        irs: np.ndarray,
+        partition_size: int,
+        offset: int,
+        n_partitions: int,
+        diagonal: bool,
+        shared: bool = False,
+        pool: Optional[_WorkerPool] = None,
+        backend: str = DEFAULT_BACKEND,
+        spectra: Optional[np.ndarray] = None,
+    ) -> None:
+        self.partition_size = partition_size
+        self.offset = offset
+        self.n_partitions = n_partitions
+        self.diagonal = diagonal
+        self.shared = shared
+        fft_size = 2 * partition_size
+        # Partition spectra as ``(ears, partitions, speakers, bins)`` or ``(angles, partitions, ears, bins)`` to
+        # match the memory layout of the delay line
+        precomputed = spectra is not None
+        if spectra is None:
+            spectra = partition_spectra(irs, partition_size, offset, n_partitions)
+        self.ir_parts = spectra
+        dtype = spectra.dtype
+        n_channels = irs.shape[1] if not diagonal else 2
+        # Input window of the last two partitions and its spectrum
+        self._in_fft = RealFFT(n_channels, fft_size, backend, row_transforms=not diagonal)
+        # Accumulated output spectrum and its time-domain signal
+        self._out_fft = RealFFT(2, fft_size, backend)
+        # Interpolated partition spectra of diagonal segments, the neighbours they were blended for and scratch
+        # space for blending
+        self._ir = np.zeros(self.ir_parts.shape[1:], dtype=dtype) if diagonal else None
+        self._blended: Optional[tuple] = None
+        self._tmp = np.zeros_like(self._ir) if diagonal else None
+        # Angle of the last partition when switching between single angles, output of the previous angle and the
+        # fade-in curve spanning one partition
+        self._angle: Optional[int] = None
+        self._fade_fft = RealFFT(2, fft_size, backend) if diagonal else None
+        self._fade_in = _fade_in(partition_size) if diagonal else None
+        # The delay line ``(2 * n_partitions, channels, bins)`` stores every input spectrum twice, ``n_partitions``
+        # apart, so that the newest ``n_partitions`` spectra are always available as one contiguous slice ordered
+        # from newest to oldest.
+        self._fdl = np.zeros((2 * n_partitions, n_channels, partition_size + 1), dtype=dtype)
+        self._pos = 0
+        # Output spectrum in the precision of the spectra, numpy would allocate for mixed precision operands
+        self._acc = np.zeros((2, partition_size + 1), dtype=dtype) if dtype != self._out_fft.freq.dtype else None
+        # Partitions since the last non-silent input of every speaker channel, whether a channel's input spectrum
+        # and its multiply-accumulate are computed for the current partition and the output spectrum of one channel
+        self._quiet = None if diagonal else [n_partitions + 1] * n_channels
+        # Partitions up to the last non-zero one of every speaker channel, unknown for precomputed spectra
+        self._lengths = None
+        if not diagonal:
+            self._lengths = [n_partitions] * n_channels
+            if not precomputed:
+                self._lengths = _partition_lengths(irs, partition_size, offset, n_partitions)
+        self._full_lengths = self._lengths is None or min(self._lengths) == n_partitions
+        self._transform = [True] * n_channels
+        self._active = [True] * n_channels
+        self._channel_acc = np.zeros((2, partition_size + 1), dtype=dtype)
+        self.channel_partitions = 0
+        self.skipped_transforms = 0
+        self.skipped_macs = 0
+        # Partition ranges of the pool workers, partial output spectra of all but the first and the operands of the
+        # running multiply-accumulate
+        self.pool = pool if pool is not None and n_partitions > 1 else None
+        if self.pool is not None:
+            bounds = np.linspace(0, n_partitions, min(pool.n_workers, n_partitions) + 1).astype(int)
+            self._ranges = list(zip(bounds[:-1], bounds[1:]))
+            self._partials = np.zeros((len(self._ranges) - 1, 2, partition_size + 1), dtype=dtype)
+            self._job: Optional[tuple] = None
+
+    def reset(self) -> None:
+        """Clear the input history so that the next partition starts from silence."""
+        self._in_fft.time.fill(0.0)
+        self._fdl.fill(0.0)
+        self._pos = 0
+        self._angle = None
+        if self._quiet is not None:
+            self._quiet[:] = [self.n_partitions + 1] * len(self._quiet)
+
+    def _mac(self, history: np.ndarray, ir: np.ndarray, out: np.ndarray) -> None:
+        """Multiply the delay line with the partition spectra ``ir`` and sum over partitions into ``out``."""
+        acc = out if self._acc is None else self._acc
+        if self.pool is None:
+            np.einsum("pek,pek->ek" if self.diagonal else "psk,epsk->ek", history, ir, out=acc)
+        else:
+            self._job = (history, ir, acc)
+            self.pool.run(self._mac_range, len(self._ranges))
+            self._job = None
+            for partial in self._partials:
+                acc += partial
+        if self._acc is not None:
+            out[...] = acc
+
+    def _mac_active(self, history: np.ndarray, out: np.ndarray) -> None:
+        """Multiply-accumulate only the speaker channels flagged in ``_active`` into ``out``, one channel at a time.
+
+        Contractions over a strided subset of channels would make numpy allocate buffers, single channels do not.
+        """
+        acc = out if self._acc is None else self._acc
+        acc.fill(0.0)
+        for c, active in enumerate(self._active):
+            if active:
+                length = self._lengths[c]
+                np.einsum("pk,epk->ek", history[:length, c], self.ir_parts[:, :length, c], out=self._channel_acc)
+                acc += self._channel_acc
+        if self._acc is not None:
+            out[...] = acc
+
+    def _update_activity(self, x: np.ndarray) -> int:
+        """Update the silence counters of the speaker channels with input ``x`` and return the number of channels
+        to transform."""
+        p = self.n_partitions
+        quiet = self._quiet
+        n_transform = 0
+        for c in range(len(quiet)):
+            quiet[c] = 0 if x[c].any() else min(quiet[c] + 1, p + 1)
+            # The input window spans two partitions, the channel's impulse responses the newest ``length`` windows
+            length = self._lengths[c]
+            self._transform[c] = length > 0 and quiet[c] < 2
+            self._active[c] = length > 0 and quiet[c] <= length
+            n_transform += self._transform[c]
+        return n_transform
+
+    def _mac_range(self, i: int) -> None:
+        history, ir, acc = self._job
+        p0, p1 = self._ranges[i]
+        target = acc if i == 0 else self._partials[i - 1]
+        if self.diagonal:
+            np.einsum("pek,pek->ek", history[p0:p1], ir[p0:p1], out=target)
+        else:
+            np.einsum("psk,epsk->ek", history[p0:p1], ir[:, p0:p1], out=target)
+
+    def process(
+        self,
+        x: np.ndarray,
+        neighbours: Optional[tuple] = None,
+        out: Optional[np.ndarray] = None,
+        angle: Optional[int] = None,
+    ) -> np.ndarray:
+        """Convolve one partition worth of input ``(channels, partition_size)`` and return ``(2, partition_size)``.
+
+        Args:
+            x: Input samples.
+            neighbours: Interpolation ``(indices, weights)`` over angles for diagonal segments, ``None`` uses the
+                first angle. Blended spectra are reused as long as the same tuple is passed.
+            out: Preallocated output array. A new array is returned when not given.
+            angle: Index of the single angle used by diagonal segments instead of ``neighbours``. When it differs
+                from the previous partition, the outputs of both angles are crossfaded over this partition.
+        """
+        n = self.partition_size
+        p = self.n_partitions
+        in_buf = self._in_fft.time
+        n_channels = in_buf.shape[0]
+        n_transform = n_channels if self._quiet is None else self._update_activity(x)
+        self.channel_partitions += n_channels
+        self._pos = (self._pos - 1) % p
+        if n_transform == n_channels:
+            # Slide input window by one partition and transform the last two partitions
+            for row in range(n_channels):
+                # Row by row, numpy copies overlapping 2-D views through a temporary
+                in_buf[row, :n] = in_buf[row, n:]
+            in_buf[:, n:] = x
+            self._in_fft.forward()
+            self._fdl[self._pos] = self._in_fft.freq
+            self._fdl[self._pos + p] = self._in_fft.freq
+        else:
+            # Windows of skipped channels are silent, their first half is overwritten before it is used again
+            for row in range(n_channels):
+                if self._transform[row]:
+                    in_buf[row, :n] = in_buf[row, n:]
+                    in_buf[row, n:] = x[row]
+                    self._in_fft.forward_row(row)
+                    self._fdl[self._pos, row] = self._in_fft.freq[row]
+                    self._fdl[self._pos + p, row] = self._in_fft.freq[row]
+                else:
+                    self._fdl[self._pos, row] = 0.0
+                    self._fdl[self._pos + p, row] = 0.0
+            self.skipped_transforms += n_channels - n_transform
+        history = self._fdl[self._pos : self._pos + p]
+
+        acc = self._out_fft.freq
+        previous = None
+        if self.diagonal:
+            if self.shared:
+                ir = self.ir_parts[0]
+            elif angle is not None:
+                if self._angle is not None and angle != self._angle:
+                    previous = self._angle
+                self._angle = angle
+                ir = self.ir_parts[angle]
+            elif neighbours is None:
+                ir = self.ir_parts[0]
+            else:
+                if neighbours is not self._blended:
+                    _blend(self.ir_parts, neighbours, self._ir, self._tmp)
+                    self._blended = neighbours
+                ir = self._ir
+            self._mac(history, ir, acc)
+        else:
+            n_active = sum(self._active)
+            if n_active == n_channels and self._full_lengths:
+                self._mac(history, self.ir_parts, acc)
+            else:
+                self._mac_active(history, acc)
+                self.skipped_macs += n_channels - n_active
+        self._out_fft.inverse()
+        y = self._out_fft.time[:, n:]
+        if previous is not None:
+            # The delay line holds the full input history, so the previous angle's output is exact as well
+            self._mac(history, self.ir_parts[previous], self._fade_fft.freq)
+            self._fade_fft.inverse()
+            _crossfade(y, self._fade_fft.time[:, n:], self._fade_in)
+        if out is None:
+            out = np.empty((2, n))
+        out[...] = y
+        return out
+
+
+def _multirate_lowpass(factor: int) -> np.ndarray:
+    """Return the linear-phase anti-aliasing and interpolation filter of decimation by ``factor``."""
+    return scipy.signal.firwin(2 * MULTIRATE_TAPS * factor + 1, 1.0 / factor, window=("kaiser", 5.0))
+
+
+def _decimate_ir(section: np.ndarray, factor: int) -> np.ndarray:
+    """Return impulse responses for convolving signals decimated by ``factor`` with ``section``.
+
+    The responses are low-pass filtered without delay and scaled by ``factor``, the low rate convolution of
+    decimated signals then matches the full rate one within the pass band.
+    """
+    if factor == 1:
+        return section
+    return factor * scipy.signal.resample_poly(section, 1, factor, axis=-1, window=_multirate_lowpass(factor))
+
+
+def multirate_factor(section: np.ndarray, energy: float, accuracy: float, factors=MULTIRATE_FACTORS) -> int:
+    """Return the largest decimation factor of ``factors`` at which ``section`` can be convolved.
+
+    The error of a factor is the energy ``section`` loses in a decimation and interpolation round trip with the
+    multirate filters. Factors are accepted while the error stays ``accuracy`` dB below ``energy``.
+
+    Args:
+        section: Impulse responses ``(..., samples)``.
+        energy: Reference energy, normally the energy of the complete impulse responses.
+        accuracy: Allowed error in dB relative to ``energy``, for example ``-60``.
+        factors: Candidate factors in increasing order.
+
+    Returns:
+        Chosen factor, 1 when even the smallest one is too inaccurate.
+    """
+    budget = energy * 10 ** (accuracy / 10)
+    best = 1
+    for factor in factors:
+        lowpass = _multirate_lowpass(factor)
+        down = scipy.signal.resample_poly(section, 1, factor, axis=-1, window=lowpass)
+        up = scipy.signal.resample_poly(down, factor, 1, axis=-1, window=lowpass)[..., : section.shape[-1]]
+        if np.sum((section - up) ** 2) > budget:
+            break
+        best = factor
+    return best
+
+
+class _MultirateTail:
+    """Late part of the impulse responses of some speakers, convolved at a reduced sampling rate.
+
+    Every block of input is decimated by a polyphase FIR filter, convolved by a uniformly partitioned segment with
+    partitions of ``block_size // factor`` samples and interpolated back to the full rate by the same filter. The
+    filters delay the signal by ``2 * MULTIRATE_TAPS * factor`` samples, an output ring buffer adds the rest of
+    ``start``, so the tail is added at the right time. Transforms and multiply-accumulates shrink by ``factor``.
+
+    Args:
+        irs: Tail impulse responses ``(ears, speakers, samples)``, starting ``start`` samples into the full ones.
+        channels: Rows of the input block feeding ``irs``' speakers.
+        start: Offset of the tail in the full impulse responses, at least the filter delay.
+        factor: Decimation factor, a divisor of ``block_size``. 1 convolves at the full rate without filters.
+        block_size: Samples per block.
+        backend: FFT backend of the segment's transforms, one of ``BACKENDS``.
+    """
+
+    def __init__(
+        self,
+        irs: np.ndarray,
+        channels: list[int],
+        start: int,
+        factor: int,
+        block_size: int,
+        backend: str = DEFAULT_BACKEND,
+    ) -> None:
+        delay = 2 * MULTIRATE_TAPS * factor if factor > 1 else 0
+        if block_size % factor or start < delay:
+            raise ValueError("Multirate tail needs a block size divisible by its factor and a start after its delay")
+        self.channels = channels
+        self.start = start
+        self.factor = factor
+        self.block_size = block_size
+        n = block_size // factor
+        ir = _decimate_ir(np.asarray(irs, dtype=float), factor)
+        self.segment = _PartitionedSegment(ir, n, 0, max(1, -(-ir.shape[-1] // n)), False, backend=backend)
+        # Decimated input and low rate output of one block
+        self._low_in = np.zeros((len(channels), n))
+        self._low_out = np.zeros((2, n))
+        if factor > 1:
+            lowpass = _multirate_lowpass(factor)
+            taps = len(lowpass)
+            # Full rate input history and the filter windows of the decimated samples, views into the history
+            self._history = np.zeros((len(channels), taps - 1 + block_size))
+            self._windows = np.lib.stride_tricks.sliding_window_view(self._history, taps, axis=-1)[:, ::factor]
+            self._lowpass = lowpass[::-1].copy()
+            # Low rate output history, its filter windows and the polyphase interpolation filter ``(phases, taps)``
+            phase_taps = -(-taps // factor)
+            padded = np.zeros(phase_taps * factor)
+            padded[:taps] = lowpass * factor
+            self._low_history = np.zeros((2, phase_taps - 1 + n))
+            self._low_windows = np.lib.stride_tricks.sliding_window_view(self._low_history, phase_taps, axis=-1)
+            self._phases = np.ascontiguousarray(padded.reshape(phase_taps, factor).T[:, ::-1])
+        self._full = np.zeros((2, block_size))
+        # Delay of the rest of ``start``
+        self._delay = _RingBuffer(2, start - delay + block_size)
+        self.reset()
+
+    def reset(self) -> None:
+        self.segment.reset()
+        if self.factor > 1:
+            self._history.fill(0.0)
+            self._low_history.fill(0.0)
+        self._delay.clear()
+        self._delay.write(np.zeros((2, self._delay.capacity - self.block_size)))
+
+    def process(self, block: np.ndarray, out: np.ndarray) -> None:
+        """Add the tail's output for input ``block`` ``(channels, block_size)`` to ``out`` ``(2, block_size)``."""
+        b = self.block_size
+        if self.factor == 1:
+            for row, channel in enumerate(self.channels):
+                self._low_in[row] = block[channel]
+            self.segment.process(self._low_in, out=self._full)
+        else:
+            history = self._history
+            keep = history.shape[1] - b
+            for row, channel in enumerate(self.channels):
+                # Row by row, numpy copies overlapping 2-D views through a temporary
+                history[row, :keep] = history[row, b:]
+                history[row, keep:] = block[channel]
+            np.einsum("cmt,t->cm", self._windows, self._lowpass, out=self._low_in)
+            self.segment.process(self._low_in, out=self._low_out)
+            low = self._low_history
+            n = self._low_out.shape[1]
+            keep = low.shape[1] - n
+            for ear in range(2):
+                low[ear, :keep] = low[ear, n:]
+                low[ear, keep:] = self._low_out[ear]
+            np.einsum("emt,pt->emp", self._low_windows, self._phases, out=self._full.reshape(2, n, self.factor))
+        self._delay.write(self._full)
+        self._delay.read(self._full)
+        out += self._full
+
+
+class _TailJob:
+    """Preallocated computation of one partition of a tail segment.
+
+    The audio thread collects the partition's input in ``input`` and submits the job, the worker convolves it into
+    ``output``. Every segment cycles through enough jobs that a job is only refilled after its output was consumed,
+    so submitting does not allocate arrays.
+
+    Args:
+        segment: Tail segment convolving the input.
+        channels: Number of input channels.
+    """
+
+    def __init__(self, segment: _PartitionedSegment, channels: int) -> None:
+        self.segment = segment
+        self.input = np.zeros((channels, segment.partition_size))
+        self.output = np.zeros((2, segment.partition_size))
+        self.neighbours: Optional[tuple] = None
+        self.angle: Optional[int] = None
+        # First output sample of the partition in the output stream
+        self.out_start = 0
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+        self.done.set()
+
+    def run(self) -> None:
+        try:
+            self.segment.process(self.input, self.neighbours, self.output, self.angle)
+        except BaseException as e:  # pragma: no cover - surfaced to the audio thread by wait()
+            self.error = e
+        self.done.set()
+
+    def wait(self) -> np.ndarray:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.output
+
+
+class _TailWorker:
+    """Background thread running tail segment jobs in earliest-deadline-first order."""
+
+    def __init__(self) -> None:
+        self._queue: list[tuple[int, int, _TailJob]] = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, deadline: int, job: _TailJob) -> None:
+        """Queue ``job`` to be finished before block ``deadline``."""
+        job.error = None
+        job.done.clear()
+        with self._cond:
+            heapq.heappush(self._queue, (deadline, self._seq, job))
+            self._seq += 1
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                _, _, job = heapq.heappop(self._queue)
+            job.run()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+
+class _RingBuffer:
+    """Single-producer single-consumer ring buffer of multichannel samples.
+
+    The producer only advances the write counter and the consumer only the read counter, so the audio callback and
+    the DSP thread exchange samples without taking a lock.
+
+    Args:
+        channels: Number of channels.
+        capacity: Number of samples per channel the buffer can hold.
+    """
+
+    def __init__(self, channels: int, capacity: int) -> None:
+        self.capacity = capacity
+        self._buf = np.zeros((channels, capacity))
+        # Total number of samples written and read, their difference is the fill level
+        self._written = 0
+        self._read = 0
+
+    def available(self) -> int:
+        """Return the number of samples ready to be read."""
+        return self._written - self._read
+
+    def space(self) -> int:
+        """Return the number of samples which can be written."""
+        return self.capacity - self.available()
+
+    def write(self, data: np.ndarray) -> bool:
+        """Append ``(channels, samples)`` and return ``False`` without writing anything when it does not fit."""
+        n = data.shape[1]
+        if n > self.space():
+            return False
+        start = self._written % self.capacity
+        first = min(n, self.capacity - start)
+        self._buf[:, start : start + first] = data[:, :first]
+        self._buf[:, : n - first] = data[:, first:]
+        self._written += n
+        return True
+
+    def read(self, out: np.ndarray) -> bool:
+        """Fill ``out`` ``(channels, samples)`` and return ``False`` without reading anything when too few samples
+        are available."""
+        n = out.shape[1]
+        if n > self.available():
+            return False
+        start = self._read % self.capacity
+        first = min(n, self.capacity - start)
+        out[:, :first] = self._buf[:, start : start + first]
+        out[:, first:] = self._buf[:, : n - first]
+        self._read += n
+        return True
+
+    def clear(self) -> None:
+        """Drop all buffered samples, only while neither side is in use."""
+        self._written = 0
+        self._read = 0
+
+
+class _SoundFieldRotation:
+    """Rotation of ambisonic input blocks compensating the head orientation.
+
+    The rotation matrix is computed only when the orientation changes. The block after a change is crossfaded from
+    the previous matrix to the new one, so head movements do not step.
+
+    Args:
+        order: Ambisonics order of the input.
+        block_size: Samples per block.
+    """
+
+    def __init__(self, order: int, block_size: int) -> None:
+        self.rotator = SoundFieldRotator(order)
+        channels = (order + 1) ** 2
+        self._orientation: Optional[tuple] = None
+        self._matrix = np.eye(channels)
+        self._previous = np.eye(channels)
+        self._block = np.zeros((channels, block_size))
+        self._old = np.zeros((channels, block_size))
+        self._fade_in = _fade_in(block_size)
+
+    def reset(self) -> None:
+        """Forget the orientation, the next block is rotated without crossfade."""
+        self._orientation = None
+
+    def rotate(self, block: np.ndarray, orientation: tuple) -> np.ndarray:
+        """Return ``block`` ``(channels, block_size)`` rotated for ``(yaw, pitch, roll)`` in a reused array."""
+        if orientation == self._orientation:
+            np.matmul(self._matrix, block, out=self._block)
+            return self._block
+        fade = self._orientation is not None
+        self._matrix, self._previous = self._previous, self._matrix
+        self._matrix[...] = self.rotator.matrix(*orientation)
+        self._orientation = orientation
+        np.matmul(self._matrix, block, out=self._block)
+        if fade:
+            np.matmul(self._previous, block, out=self._old)
+            _crossfade(self._block, self._old, self._fade_in)
+        return self._block
+
+
+class _Reblocker:
+    """Adapter between audio callbacks of any size and the fixed block size of a convolver.
+
+    Input samples are collected in one ring buffer and convolved as soon as a full block is available, output
+    samples are taken from a second ring buffer which starts with ``latency`` samples of silence. Callbacks are
+    split at block boundaries, so the buffers never hold more than a block of input and ``latency`` plus a block of
+    output. ``latency`` is the smallest constant delay which never runs out of output: ``block_size - 1`` samples
+    for callbacks of varying size, ``block_size - gcd(block_size, frames)`` for a fixed size and zero when it equals
+    the block size. When a callback of another size finds too few output samples, the missing ones are played as
+    silence, counted as a reblocking underrun in the convolver's ``stats`` and the latency falls back to
+    ``block_size - 1`` samples.
+
+    Args:
+        convolver: Convolver processing the audio.
+        frames: Frames per callback, ``0`` when the host delivers a varying number.
+    """
+
+    def __init__(self, convolver: RealTimeConvolver, frames: int = 0) -> None:
+        if frames < 0:
+            raise ValueError("frames must not be negative")
+        b = convolver.block_size
+        self.convolver = convolver
+        self.frames = frames
+        self.latency = b - math.gcd(b, frames) if frames else b - 1
+        self.input = _RingBuffer(convolver.n_speakers, b)
+        # Room for the latency of varying callback sizes, the fallback after an underrun
+        self.output = _RingBuffer(2, 2 * b - 1)
+        self._block = np.zeros((convolver.n_speakers, b))
+        self._out = np.zeros((2, b))
+        self._silence = np.zeros((2, b))
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop buffered samples and restore the initial silence."""
+        self.input.clear()
+        self.output.clear()
+        self.output.write(self._silence[:, : self.latency])
+
+    def process(self, block: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Feed ``(channels, frames)`` input and fill ``out`` ``(2, frames)`` with output ``latency`` samples late."""
+        b = self.convolver.block_size
+        n = block.shape[1]
+        if n == b and self.latency == 0:
+            return self.convolver.process_block(block, out=out)
+        pos = 0
+        while pos < n:
+            m = min(b - self.input.available(), n - pos)
+            self.input.write(block[:, pos : pos + m])
+            if self.input.available() == b:
+                self.input.read(self._block)
+                self.convolver.process_block(self._block, out=self._out)
+                self.output.write(self._out)
+            if not self.output.read(out[:, pos : pos + m]):
+                out[:, pos : pos + m] = 0.0
+                self.convolver._telemetry.record_underrun()
+                # Buffered output plus input always add up to the latency, restart from silence at the latency of
+                # varying callback sizes
+                self.latency = b - 1
+                self.output.clear()
+                self.output.write(self._silence[:, : self.latency - self.input.available()])
+            pos += m
+        return out
+
+
+class _DecoupledStream:
+    """Audio callback exchanging samples with a DSP thread through ring buffers.
+
+    The callback only copies input into one ring buffer and output from another, the convolution runs on a separate
+    thread. The output buffer starts with ``safety_blocks`` blocks of silence, which is the extra latency traded for
+    headroom against processing jitter.
+
+    Args:
+        convolver: Convolver processing the audio.
+        safety_blocks: Number of blocks buffered ahead of the audio device.
+        frames: Largest number of frames per callback when it differs from the block size. Callbacks may be of any
+            size, ``safety_blocks`` should then cover the largest one.
+    """
+
+    def __init__(self, convolver: RealTimeConvolver, safety_blocks: int = 2, frames: int = 0) -> None:
+        if safety_blocks < 0:
+            raise ValueError("safety_blocks must not be negative")
+        b = convolver.block_size
+        self.convolver = convolver
+        self.safety_blocks = safety_blocks
+        capacity = (safety_blocks + 4) * b + frames
+        self.input = _RingBuffer(convolver.n_speakers, capacity)
+        self.output = _RingBuffer(2, capacity)
+        self.output.write(np.zeros((2, safety_blocks * b)))
+        # Callbacks which found too few output samples, input blocks dropped because the DSP thread fell behind and
+        # callbacks reporting a stream status
+        self.underruns = 0
+        self.overruns = 0
+        self.status_errors = 0
+        # Fewest output blocks queued ahead of a callback so far
+        self.min_queue_depth = safety_blocks
+        self._block = np.zeros((convolver.n_speakers, b))
+        self._out = np.zeros((2, b))
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def queue_depth(self) -> float:
+        """Return the number of output blocks currently queued ahead of the audio device."""
+        return self.output.available() / self.convolver.block_size
+
+    def callback(self, indata: np.ndarray, outdata: np.ndarray, status=None) -> None:
+        """Exchange one callback worth of ``(frames, channels)`` audio with the DSP thread."""
+        if status:
+            self.status_errors += 1
+        if not self.input.write(indata.T):
+            self.overruns += 1
+        self._wake.set()
+        depth = self.output.available() // self.convolver.block_size
+        if depth < self.min_queue_depth:
+            self.min_queue_depth = depth
+        if not self.output.read(outdata.T):
+            self.underruns += 1
+            outdata.fill(0)
+
+    def _run(self) -> None:
+        b = self.convolver.block_size
+        while not self._closed:
+            self._wake.wait(0.1)
+            self._wake.clear()
+            while self.input.available() >= b and self.output.space() >= b:
+                self.input.read(self._block)
+                self.convolver.process_block(self._block, out=self._out)
+                self.output.write(self._out)
+
+    def stats(self) -> dict:
+        return {
+            "underruns": self.underruns,
+            "overruns": self.overruns,
+            "status_errors": self.status_errors,
+            "queue_depth": self.queue_depth(),
+            "min_queue_depth": self.min_queue_depth,
+        }
+
+    def close(self) -> None:
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+
+
+class _IRSwap:
+    """Engine prepared by ``RealTimeConvolver.swap_irs`` and the progress of the crossfade to it.
+
+    Args:
+        convolver: Convolver with the new impulse responses.
+        fade: Length of the crossfade in samples, a multiple of the block size.
+    """
+
+    def __init__(self, convolver: RealTimeConvolver, fade: int) -> None:
+        self.convolver = convolver
+        self.fade_in = _fade_in(fade)
+        self.position = 0
+        self.out = np.zeros((2, convolver.block_size))
+        # Taken without blocking by whichever thread applies the swap, the audio thread or the preparing thread
+        self.claim = threading.Lock()
+        self.started = False
+        # Set once the new engine has replaced the old one
+        self.done = threading.Event()
+
+
+class _Telemetry:
+    """Processing time and stream health counters of a convolver.
+
+    Recording a block only updates a few numbers and one histogram bin, so it is cheap enough for the audio thread.
+
+    Args:
+        block_duration: Length of one block in seconds, the deadline of ``process_block``.
+    """
+
+    # Upper edges of the deadline utilisation histogram bins, the last bin collects everything slower
+    EDGES = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.5, 2.0)
+    # ``sounddevice.CallbackFlags`` attributes counted separately
+    FLAGS = ("input_underflow", "input_overflow", "output_underflow", "output_overflow", "priming_output")
+
+    def __init__(self, block_duration: float) -> None:
+        self.block_duration = block_duration
+        self.reset()
+
+    def reset(self) -> None:
+        self.blocks = 0
+        self.histogram = [0] * (len(self.EDGES) + 1)
+        self.total = 0.0
+        self.last = 0.0
+        self.peak = 0.0
+        self.late = 0
+        self.underruns = 0
+        self.status_errors = 0
+        self.flags = dict.fromkeys(self.FLAGS, 0)
+        self.orientation_updates = 0
+        self._orientation_times: deque = deque(maxlen=64)
+
+    def record_block(self, seconds: float) -> None:
+        self.blocks += 1
+        self.last = seconds
+        self.total += seconds
+        if seconds > self.peak:
+            self.peak = seconds
+        utilisation = seconds / self.block_duration
+        self.histogram[bisect.bisect_left(self.EDGES, utilisation)] += 1
+        if utilisation > 1.0:
+            self.late += 1
+
+    def record_underrun(self) -> None:
+        self.underruns += 1
+
+    def record_status(self, status) -> None:
+        self.status_errors += 1
+        for flag in self.FLAGS:
+            if getattr(status, flag, False):
+                self.flags[flag] += 1
+
+    def record_orientation(self) -> None:
+        self.orientation_updates += 1
+        self._orientation_times.append(time.monotonic())
+
+    def orientation_rate(self) -> float:
+        """Return orientation updates per second over the most recent updates, zero after a second without any."""
+        times = self._orientation_times
+        if len(times) < 2 or time.monotonic() - times[-1] > 1.0 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def stats(self) -> dict:
+        mean = self.total / self.blocks if self.blocks else 0.0
+        return {
+            "blocks": self.blocks,
+            "block_ms": self.block_duration * 1000,
+            "processing_ms": {"last": self.last * 1000, "mean": mean * 1000, "max": self.peak * 1000},
+            "utilisation": {
+                "last": self.last / self.block_duration,
+                "mean": mean / self.block_duration,
+                "max": self.peak / self.block_duration,
+            },
+            "histogram": {"edges": list(self.EDGES), "counts": list(self.histogram)},
+            "late_blocks": self.late,
+            "reblock_underruns": self.underruns,
+            "status_errors": self.status_errors,
+            "flags": dict(self.flags),
+            "orientation_updates": self.orientation_updates,
+            "orientation_rate": self.orientation_rate(),
+        }
+
+
+class OutputMeter:
+    """Peak and RMS levels of a convolver's output for level meters.
+
+    The audio thread records every output block, ``levels`` can be read from any other thread since the levels of
+    both ears are published as one tuple. Peaks are held and fall by ``METER_PEAK_DECAY`` dB per second, RMS levels
+    are averaged over ``METER_RMS_TIME`` seconds.
+
+    Args:
+        block_duration: Duration of one block in seconds.
+    """
+
+    def __init__(self, block_duration: float) -> None:
+        self.block_duration = block_duration
+        self._decay = 10 ** (-METER_PEAK_DECAY * block_duration / 20)
+        self._alpha = 1.0 - math.exp(-block_duration / METER_RMS_TIME)
+        self.reset()
+
+    def reset(self) -> None:
+        # Held peaks, mean squares and the number of blocks reaching full scale
+        self._levels: tuple = ((0.0, 0.0), (0.0, 0.0), 0)
+
+    def record(self, out: np.ndarray) -> None:
+        """Update the levels with an output block ``(2, block_size)``."""
+        peaks, squares, clips = self._levels
+        n = out.shape[1]
+        block_peaks = tuple(max(float(row.max()), -float(row.min())) for row in out)
+        peaks = tuple(max(p, held * self._decay) for p, held in zip(block_peaks, peaks))
+        squares = tuple(m + self._alpha * (float(np.dot(row, row)) / n - m) for row, m in zip(out, squares))
+        if max(block_peaks) >= 1.0:
+            clips += 1
+        self._levels = (peaks, squares, clips)
+
+    def levels(self) -> dict:
+        """Return ``peak_db`` and ``rms_db`` of both ears, at least ``METER_FLOOR``, and the ``clips`` count."""
+        peaks, squares, clips = self._levels
+        return {
+            "peak_db": [_level_db(p) for p in peaks],
+            "rms_db": [_level_db(math.sqrt(m)) for m in squares],
+            "clips": clips,
+        }
+
+
+def _level_db(amplitude: float) -> float:
+    return max(METER_FLOOR, 20 * math.log10(amplitude)) if amplitude > 0 else METER_FLOOR
+
+
+def _hrir_tensor(hrir) -> np.ndarray:
+    """Return the impulse responses of an ``HRIR`` as ``(ears, speakers, samples)`` in speaker order."""
+    pairs = [(ir["left"].data, ir["right"].data) for ir in hrir.irs.values()]
+    return np.ascontiguousarray(np.transpose(pairs_tensor(pairs), (1, 0, 2)))
 
 
 class RealTimeConvolver:
-    """Low-latency convolution engine for binaural rendering."""
+    """Low-latency convolution engine for binaural rendering.
+
+    Args:
+        irs: ``HRIR`` object, dictionary mapping orientations to ``(left, right)`` BRIRs or a ``BRIRBundle``.
+            Bundle spectra are used as they are, usually memory-mapped, by partitioned engines whose partition
+            size matches the bundle's.
+        samplerate: Sampling rate, required for BRIR dictionaries.
+        block_size: Number of samples processed per block.
+        engine: Convolution engine, one of ``ENGINES``. The partitioned engine keeps the FFT size at twice the
+            block size regardless of the impulse response length.
+        max_partition: Largest partition size in samples used by the non-uniform engine.
+        neighbours: Number of nearest BRIR orientations interpolated for the current head orientation. ``None``
+            interpolates between all orientations, which gets expensive for dense orientation sets.
+        interpolation: Head orientation handling for BRIR dictionaries, one of ``INTERPOLATIONS``. Switching
+            convolves with the nearest orientation only and crossfades over one block when it changes, so the cost
+            stays at two convolutions regardless of the number of orientations.
+        mixing_time: Split BRIR dictionaries at this time in seconds. Partitions before it are rendered per
+            orientation, partitions after it use the average late tail of all orientations, which is convolved only
+            once. The split is rounded up to the next partition boundary. Requires a partitioned engine.
+        multirate_time: Convolve HRIR tails after this time in seconds at reduced sampling rates. Each speaker's
+            tail is decimated by the largest factor of ``MULTIRATE_FACTORS`` meeting ``multirate_accuracy``, which
+            is large for band limited channels such as the LFE and for late reverb without much high frequency
+            energy. Head and tails are crossfaded over ``MULTIRATE_FADE`` samples. Requires a partitioned engine.
+        multirate_accuracy: Allowed error of a decimated tail in dB relative to the energy of the speaker's
+            impulse responses. Higher values decimate more and save more processing time.
+        ambisonics_order: Render ambisonic input of this order instead of speaker channels. Binaural filters of
+            the ``(order + 1) ** 2`` signals are derived once from the HRIR speakers, see
+            ``ambisonics.binaural_filters``, and the input is rotated against the head orientation every block.
+            Inputs are ``channel_names(order)``, W X Y Z for first order. Requires an HRIR.
+        speaker_directions: Speaker directions used for ``ambisonics_order`` as ``{name: (azimuth, elevation)}``
+            in degrees, defaults to ``SPEAKER_DIRECTIONS``.
+        orientation_source: Object whose ``orientation()`` method returns ``(yaw, pitch, roll)``, such as a
+            ``tracking.HeadTracker``. It is read once at the start of every block instead of waiting for
+            ``set_orientation`` calls.
+        orientation_smoothing: Time constant in seconds of a one-pole low-pass applied to the orientation at block
+            rate, zero follows it immediately.
+        workers: Number of threads sharing the work of each block. The FFT engine splits HRIR speakers into
+            groups, the partitioned engines split the partitions of the first segment into ranges. The threads are
+            started once and joined before ``process_block`` returns, see ``worker_stats`` for their timing.
+        fft_backend: Backend of the block transforms, one of ``fft_backend.BACKENDS``. ``"auto"`` times every
+            available backend and, for the FFT engine, the next power of two against the next size with small prime
+            factors, then keeps the fastest. ``None`` uses pyFFTW when installed and numpy otherwise.
+        tuning_file: Cache of ``"auto"`` decisions and FFTW wisdom, reused by later sessions instead of timing and
+            planning again. ``None`` keeps them in memory only.
+
+    HRIR speakers whose impulse responses are all zero, such as the tracks ``HRIR.write_wav`` pads in for speakers
+    which were not measured, are pruned when the engine is created. Their input channels are still accepted but
+    ignored. Silent input channels are detected per block and their transforms and multiply-accumulates are
+    skipped for as long as they cannot contribute to the output, see ``channel_stats``.
+
+    ``swap_irs`` replaces the impulse responses of a running convolver without restarting the audio stream.
+    """
+
+    # Attributes belonging to the audio session rather than to the impulse responses, kept by ``swap_irs``
+    _SESSION = (
+        "_thread",
+        "_stop",
+        "_stream",
+        "_stats_log",
+        "_stats_log_stop",
+        "_reblocker",
+        "_telemetry",
+        "_incoming",
+        "_swap_lock",
+        "_swap_queue",
+        "_swap_worker",
+        "_swaps_closed",
+        "meter",
+        "orientation_source",
+        "orientation_smoothing",
+        "_orientation_target",
+        "_orientation",
+        "switches",
+        "swaps",
+        "_skipped_transforms",
+        "_skipped_macs",
+        "_channel_blocks",
+    )
 
     def __init__(
         self,
-        irs: Union[HRIR, Dict[Union[float, Tuple[float, float, float]], Tuple[np.ndarray, np.ndarray]]],
+        irs: Union[HRIR, BRIRBundle, Dict[Union[float, Tuple[float, float, float]], Tuple[np.ndarray, np.ndarray]]],
         samplerate: Optional[int] = None,
         block_size: int = 1024,
+        engine: str = "fft",
+        max_partition: int = 8192,
+        neighbours: Optional[int] = None,
+        interpolation: str = "blend",
+        mixing_time: Optional[float] = None,
+        multirate_time: Optional[float] = None,
+        multirate_accuracy: float = -60.0,
+        ambisonics_order: Optional[int] = None,
+        speaker_directions: Optional[Dict[str, Tuple[float, float]]] = None,
+        orientation_source=None,
+        orientation_smoothing: float = 0.0,
+        workers: int = 1,
+        fft_backend: Optional[str] = None,
+        tuning_file: Optional[str] = TUNING_FILE,
     ) -> None:
+        self._bundle: Optional[BRIRBundle] = None
+        if isinstance(irs, BRIRBundle):
+            self._bundle = irs
+            samplerate = irs.fs
+            if irs.kind == "brir":
+                irs = irs.brirs()
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'. Accepted values are {', '.join(ENGINES)}.")
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(
+                f"Unknown interpolation '{interpolation}'. Accepted values are {', '.join(INTERPOLATIONS)}."
+            )
+        if mixing_time is not None and (engine == "fft" or not isinstance(irs, dict)):
+            raise ValueError("mixing_time requires a BRIR dictionary and a partitioned engine")
+        if multirate_time is not None and (engine == "fft" or isinstance(irs, dict)):
+            raise ValueError("multirate_time requires an HRIR and a partitioned engine")
+        if ambisonics_order is not None and (ambisonics_order < 1 or isinstance(irs, dict)):
+            raise ValueError("ambisonics_order must be at least 1 and requires an HRIR")
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if fft_backend not in (None, "auto", *available_backends()):
+            raise ValueError(
+                f"Unknown FFT backend '{fft_backend}'. Accepted values are "
+                f"{', '.join(['auto', *available_backends()])}."
+            )
+        self.engine = engine
+        self.interpolation = interpolation
+        self.mixing_time = mixing_time
+        self.multirate_time = multirate_time
+        self.multirate_accuracy = multirate_accuracy
+        # Decimation factor of every speaker's multirate tail
+        self.multirate_factors: Dict[str, int] = {}
+        self._multirate: list[_MultirateTail] = []
+        # Number of times the convolver switched to a different BRIR orientation and swapped impulse responses
+        self.switches = 0
+        self.swaps = 0
+        # Impulse responses prepared by ``swap_irs`` waiting for the audio thread, published in one assignment
+        self._incoming: Optional[_IRSwap] = None
+        # Swap requests in order, prepared by one worker thread started with the first request
+        self._swap_queue: queue.Queue = queue.Queue()
+        self._swap_worker: Optional[threading.Thread] = None
+        self._swap_lock = threading.Lock()
+        self._swaps_closed = False
+        # Level meter fed with every output block when set
+        self.meter: Optional[OutputMeter] = None
         self.block_size = block_size
         self._thread: Optional[threading.Thread] = None
         self._stop = threading.Event()
-        self._yaw = 0.0
-        self._pitch = 0.0
-        self._roll = 0.0
+        self._stream: Optional[_DecoupledStream] = None
+        self._stats_log: Optional[threading.Thread] = None
+        self._stats_log_stop = threading.Event()
+        self.orientation_source = orientation_source
+        self.orientation_smoothing = orientation_smoothing
+        # Orientation published by ``set_orientation`` or read from the source, a tuple replaced as a whole so the
+        # audio thread never sees angles of two different updates, and the orientation rendered in the current block
+        self._orientation_target = (0.0, 0.0, 0.0)
+        self._orientation = (0.0, 0.0, 0.0)
+        # Binaural filters of ambisonic signals ``(ears, channels, samples)`` and the rotation of the input
+        self._sh_irs: Optional[np.ndarray] = None
+        self._ambisonics: Optional[_SoundFieldRotation] = None
 
         if isinstance(irs, dict):
             if samplerate is None:
@@ -49,127 +1279,828 @@ class RealTimeConvolver:
                 a: (np.asarray(l), np.asarray(r)) for a, (l, r) in irs.items()
             }
             self.angles = list(self.brirs.keys())
-            self._prepare_ir_fft_brirs()
             self.n_speakers = 2
+            self._index = OrientationIndex(self.angles, 1 if interpolation == "switch" else neighbours)
+            self._angle: Optional[int] = None
+            self._neighbours_key: Optional[tuple] = None
+            self._neighbours_cache: Optional[tuple] = None
         else:
             self.fs = irs.fs
-            self.speakers = list(irs.irs.keys())
+            self.speakers = list(irs.speakers if self._bundle is not None else irs.irs.keys())
             self.n_speakers = len(self.speakers)
-            self._prepare_ir_fft_hrir(irs)
+            if ambisonics_order is not None:
+                tensor = self._ir_tensor(irs)
+                self._sh_irs = binaural_filters(tensor, self.speakers, ambisonics_order, speaker_directions)
+                # The bundle's spectra belong to the speakers, not to the ambisonic signals
+                self._bundle = None
+                self._ambisonics = _SoundFieldRotation(ambisonics_order, block_size)
+                self.speakers = channel_names(ambisonics_order)
+                self.n_speakers = len(self.speakers)
+        # Input channels with non-zero impulse responses and the names of pruned speakers, set for HRIRs
+        self._channels: Optional[list[int]] = None
+        self.pruned_speakers: list[str] = []
+        self._skipped_transforms = 0
+        self._skipped_macs = 0
+        self._channel_blocks = 0
+        self._telemetry = _Telemetry(block_size / self.fs)
+        self._pool = _WorkerPool(workers, block_size / self.fs) if workers > 1 else None
+        self._tuner = FFTTuner(tuning_file) if fft_backend == "auto" else None
+        # Backend of the block transforms, the one of the first segment for partitioned engines
+        self.fft_backend = fft_backend or DEFAULT_BACKEND
+        if engine != "fft":
+            self._prepare_partitions(irs, max_partition)
+        else:
+            self._prepare_ir_fft(irs)
+            self._init_workspace()
 
         self.overlap = np.zeros((2, self.fft_size - self.block_size))
+        # Re-blocking of ``process`` calls and callbacks which do not match the block size
+        self._reblocker = _Reblocker(self)
+        # Options of the engines prepared by ``swap_irs``
+        self._options = {
+            "samplerate": self.fs,
+            "block_size": block_size,
+            "engine": engine,
+            "max_partition": max_partition,
+            "neighbours": neighbours,
+            "interpolation": interpolation,
+            "mixing_time": mixing_time,
+            "multirate_time": multirate_time,
+            "multirate_accuracy": multirate_accuracy,
+            "ambisonics_order": ambisonics_order,
+            "speaker_directions": speaker_directions,
+            "workers": workers,
+            "fft_backend": fft_backend,
+            "tuning_file": tuning_file,
+        }
 
+    def _init_workspace(self) -> None:
+        """Allocate the buffers reused by every ``process_block`` call of the FFT engine."""
+        bins = self.fft_size // 2 + 1
+        rows = self.ir_fft.shape[1]
+        # Zero padded input block and its spectrum
+        self._in_fft = RealFFT(rows, self.fft_size, self.fft_backend, row_transforms=self._channels is not None)
+        # Output spectrum and its time-domain signal
+        self._out_fft = RealFFT(2, self.fft_size, self.fft_backend)
+        # Interpolated BRIR spectra, the neighbours they were blended for and scratch space for blending
+        self._ir = np.zeros((2, bins), dtype=complex)
+        self._blended: Optional[tuple] = None
+        self._tmp = np.zeros_like(self._ir)
+        # Output of the previous orientation while switching and the fade-in curve spanning one block
+        self._fade_fft = RealFFT(2, self.fft_size, self.fft_backend)
+        self._fade_in = _fade_in(self.block_size)
+        # Speakers with input in the current block and the output spectrum of one speaker
+        self._active = [True] * rows
+        self._channel_acc = np.zeros((2, bins), dtype=complex)
+        # Speaker groups of the pool workers and partial output spectra of all but the first
+        if self._pool is not None and not hasattr(self, "brirs") and rows > 1:
+            bounds = np.linspace(0, rows, min(self._pool.n_workers, rows) + 1).astype(int)
+            self._groups = list(zip(bounds[:-1], bounds[1:]))
+            self._partials = np.zeros((len(self._groups) - 1, 2, bins), dtype=complex)
+        else:
+            self._groups = None
 
     def _next_pow2(self, x: int) -> int:
         return 1 << (x - 1).bit_length()
 
-    def _prepare_ir_fft_hrir(self, hrir) -> None:
-        max_len = 0
-        for pair in hrir.irs.values():
-            max_len = max(max_len, len(pair["left"].data), len(pair["right"].data))
-        self.fft_size = self._next_pow2(self.block_size + max_len - 1)
-        self.ir_fft = {}
-        for name, pair in hrir.irs.items():
-            self.ir_fft[name] = {}
-            for ear in ("left", "right"):
-                buf = np.zeros(self.fft_size)
-                data = pair[ear].data
-                buf[: len(data)] = data
-                self.ir_fft[name][ear] = fft.rfft(buf)
-
-    def _prepare_ir_fft_brirs(self) -> None:
-        max_len = 0
-        for left, right in self.brirs.values():
-            max_len = max(max_len, len(left), len(right))
-        self.fft_size = self._next_pow2(self.block_size + max_len - 1)
-        self.ir_fft = {}
-        for angle, (left, right) in self.brirs.items():
-            buf_l = np.zeros(self.fft_size)
-            buf_l[: len(left)] = left
-            buf_r = np.zeros(self.fft_size)
-            buf_r[: len(right)] = right
-            self.ir_fft[angle] = {
-                "left": fft.rfft(buf_l),
-                "right": fft.rfft(buf_r),
-            }
+    def _select_fft(self, rows: int, min_size: int, sizes: Optional[list[int]] = None) -> tuple[str, int]:
+        """Return ``(backend, n)`` for transforming ``rows`` signals of at least ``min_size`` samples.
+
+        Without tuning the configured backend and the next power of two (or the only size in ``sizes``) are used.
+        """
+        if self._tuner is not None:
+            return self._tuner.select(rows, min_size, sizes)
+        return self.fft_backend, sizes[0] if sizes else self._next_pow2(min_size)
+
+    def _prepare_ir_fft(self, hrir) -> None:
+        irs = np.asarray(self._prune(self._ir_tensor(hrir)), dtype=float)
+        self.ir_length = irs.shape[-1]
+        self.fft_backend, self.fft_size = self._select_fft(irs.shape[1], self.block_size + irs.shape[-1] - 1)
+        # Spectra as ``(ears, speakers, bins)`` or, for BRIR dictionaries, ``(angles, ears, bins)``
+        self.ir_fft = fft.rfft(irs, n=self.fft_size, axis=-1)
+
+    def _ir_tensor(self, hrir) -> np.ndarray:
+        """Return zero padded time-domain impulse responses ``(ears, speakers, samples)`` or, for BRIR
+        dictionaries, ``(angles, ears, samples)``. Responses of a bundle are returned as views into the bundle."""
+        if self._sh_irs is not None:
+            return self._sh_irs
+        if self._bundle is not None:
+            irs = self._bundle.irs
+            return irs if hasattr(self, "brirs") else np.transpose(irs, (1, 0, 2))
+        if hasattr(self, "brirs"):
+            return pairs_tensor([self.brirs[a] for a in self.angles])
+        return _hrir_tensor(hrir)
+
+    def _prune(self, irs: np.ndarray) -> np.ndarray:
+        """Drop HRIR speakers with all-zero impulse responses from ``irs`` ``(ears, speakers, samples)`` and remember
+        the input channels of the remaining ones. BRIR tensors are returned unchanged."""
+        if hasattr(self, "brirs"):
+            return irs
+        live = [s for s in range(irs.shape[1]) if np.any(irs[:, s])]
+        # Keep one channel of an all-zero HRIR so that the engine still produces (silent) output
+        self._channels = live or [0]
+        self.pruned_speakers = [self.speakers[s] for s in range(self.n_speakers) if s not in self._channels]
+        return irs if len(self._channels) == irs.shape[1] else irs[:, self._channels]
+
+    def _prepare_multirate(self, irs: np.ndarray) -> np.ndarray:
+        """Move speaker tails after ``multirate_time`` which can be decimated into multirate tails and return the
+        impulse responses left for the full rate segments."""
+        b = self.block_size
+        start = int(round(self.multirate_time * self.fs))
+        end = start + MULTIRATE_FADE
+        if end >= irs.shape[-1]:
+            return irs
+        # Complementary fades, head and tail add up to the original impulse responses
+        ramp = 0.5 - 0.5 * np.cos(np.pi * (np.arange(MULTIRATE_FADE) + 0.5) / MULTIRATE_FADE)
+        tail = np.array(irs[..., start:], dtype=float)
+        tail[..., :MULTIRATE_FADE] *= ramp
+
+        factors = [f for f in MULTIRATE_FACTORS if b % f == 0 and 2 * MULTIRATE_TAPS * f <= start]
+        groups: Dict[int, list[int]] = {}
+        for row in range(irs.shape[1]):
+            energy = float(np.sum(np.square(irs[:, row], dtype=float)))
+            factor = multirate_factor(tail[:, row], energy, self.multirate_accuracy, factors)
+            self.multirate_factors[self.speakers[self._channels[row]]] = factor
+            groups.setdefault(factor, []).append(row)
+        decimated = [row for factor, rows in groups.items() if factor > 1 for row in rows]
+        if not decimated:
+            return irs
+        backend = self._select_fft(irs.shape[1], 2 * b, [2 * b])[0]
+        self._multirate = [
+            _MultirateTail(tail[:, rows], rows, start, factor, b, backend)
+            for factor, rows in sorted(groups.items())
+            if factor > 1
+        ]
+        # Speakers kept at the full rate keep their complete impulse responses, the segments skip the all-zero
+        # partitions left behind by the others
+        head = np.array(irs[..., : irs.shape[-1] if 1 in groups else end], dtype=float)
+        head[:, decimated, start:end] *= 1.0 - ramp
+        head[:, decimated, end:] = 0.0
+        return head
+
+    def _prepare_partitions(self, hrir, max_partition: int) -> None:
+        irs = self._prune(self._ir_tensor(hrir))
+        self.ir_length = irs.shape[-1]
+        if self.multirate_time is not None:
+            irs = self._prepare_multirate(irs)
+        diagonal = hasattr(self, "brirs")
+        self.fft_size = 2 * self.block_size
+        if self.engine == "partitioned":
+            layout = [(self.block_size, 0, max(1, -(-irs.shape[-1] // self.block_size)))]
+        else:
+            layout = nonuniform_layout(irs.shape[-1], self.block_size, max_partition)
+
+        # FFT backend per partition size
+        backends = {}
+        for size, _, _ in layout:
+            if size not in backends:
+                backends[size] = self._select_fft(irs.shape[1], 2 * size, [2 * size])[0]
+        self.fft_backend = backends[layout[0][0]]
+
+        # Tail segments run on the background worker, only the first segment on the audio thread uses the pool
+        segments = []
+        if self.mixing_time is None:
+            segments = [
+                _PartitionedSegment(
+                    irs,
+                    *level,
+                    diagonal,
+                    pool=None if i else self._pool,
+                    backend=backends[level[0]],
+                    spectra=self._bundle_spectra(*level),
+                )
+                for i, level in enumerate(layout)
+            ]
+        else:
+            # Late tail shared by all orientations ``(1, ears, samples)``
+            late = irs.mean(axis=0, keepdims=True)
+            mixing = int(round(self.mixing_time * self.fs))
+            for size, offset, count in layout:
+                # Partitions starting before the mixing time stay orientation dependent
+                early = min(count, max(0, -(-(mixing - offset) // size)))
+                if early > 0:
+                    pool = None if segments else self._pool
+                    segments.append(
+                        _PartitionedSegment(
+                            irs,
+                            size,
+                            offset,
+                            early,
+                            diagonal,
+                            pool=pool,
+                            backend=backends[size],
+                            spectra=self._bundle_spectra(size, offset, early),
+                        )
+                    )
+                if early < count:
+                    pool = None if segments else self._pool
+                    segments.append(
+                        _PartitionedSegment(
+                            late,
+                            size,
+                            offset + early * size,
+                            count - early,
+                            diagonal,
+                            shared=True,
+                            pool=pool,
+                            backend=backends[size],
+                        )
+                    )
+            # Effective split after rounding to partition boundaries
+            self.mixing_samples = min((seg.offset for seg in segments if seg.shared), default=irs.shape[-1])
+        self._head = segments[0]
+        self._tail = segments[1:]
+        self.n_partitions = sum(level[2] for level in layout)
+        self._block_index = 0
+        # Jobs of every tail segment, used in turn. A job's input is refilled ``(slots - 1) * size`` samples after
+        # its submission and its output is read until ``offset`` samples after it, one more job than fits in between
+        # keeps the worker and the audio thread on separate buffers.
+        self._tail_jobs = []
+        for seg in self._tail:
+            slots = max(2, (seg.offset - self.block_size) // seg.partition_size + 2)
+            self._tail_jobs.append([_TailJob(seg, irs.shape[1]) for _ in range(slots)])
+        self._tail_slots = [0] * len(self._tail)
+        # Input channels of the remaining speakers when some were pruned
+        self._live_block = None
+        if self._channels is not None and len(self._channels) < self.n_speakers:
+            self._live_block = np.zeros((len(self._channels), self.block_size))
+        self._tail_pending: list[_TailJob] = []
+        self._tail_worker = _TailWorker() if self._tail else None
 
-    def _angular_distance(self, a: float, b: float) -> float:
-        """Return smallest distance between two angles in degrees."""
-        diff = abs(a - b) % 360.0
-        return min(diff, 360.0 - diff)
+    def _bundle_spectra(self, size: int, offset: int, count: int) -> Optional[np.ndarray]:
+        """Return precomputed spectra of ``count`` partitions of ``size`` samples starting at ``offset`` from the
+        bundle, or ``None`` when the bundle does not have them."""
+        bundle = self._bundle
+        if bundle is None or self._multirate or size != bundle.partition_size or offset % size:
+            return None
+        first = offset // size
+        if first + count > bundle.spectra.shape[1]:
+            return None
+        spectra = bundle.spectra[:, first : first + count]
+        if self._channels is not None and len(self._channels) < self.n_speakers:
+            spectra = spectra[:, :, self._channels]
+        return spectra
 
-    def process_block(self, block: np.ndarray) -> np.ndarray:
+    def _neighbours(self) -> tuple[Optional[np.ndarray], np.ndarray]:
+        """Return interpolation ``(indices, weights)`` over ``self.angles`` for the current orientation.
+
+        The lookup is cached and the same tuple is returned for as long as the orientation does not change.
+        """
+        key = self._orientation
+        if key != self._neighbours_key:
+            self._neighbours_cache = self._index.query(*key)
+            self._neighbours_key = key
+        return self._neighbours_cache
+
+    def _nearest_angle(self) -> int:
+        """Return index of the orientation nearest to the current one and count switches between orientations."""
+        indices, _ = self._neighbours()
+        angle = 0 if indices is None else int(indices[0])
+        if self._angle is not None and angle != self._angle:
+            self.switches += 1
+        self._angle = angle
+        return angle
+
+    def process_block(self, block: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
         """Process single audio block.
 
+        All intermediate buffers are allocated once, so passing a preallocated ``out`` array (for example a
+        transposed view of the ``sounddevice`` output buffer) keeps the call free of array allocations.
+
         Args:
             block: Array ``(n_speakers, block_size)``.
+            out: Array ``(2, block_size)`` receiving the output. A new array is returned when not given.
 
         Returns:
             Stereo output block ``(2, block_size)``.
         """
-        if hasattr(self, "brirs"):
-            if block.shape != (2, self.block_size):
-                raise ValueError("Invalid input block shape")
-            buf = np.zeros((2, self.fft_size))
-            buf[:, : self.block_size] = block
-            buf_fft = fft.rfft(buf, axis=1)
+        if block.shape != (self.n_speakers, self.block_size):
+            raise ValueError("Invalid input block shape")
+        if out is None:
+            out = np.empty((2, self.block_size))
+        start = time.perf_counter()
+        self._sample_orientation()
+        swap = self._incoming
+        if swap is not None and not swap.started:
+            # A swap retracted by the preparing thread is applied there
+            if swap.claim.acquire(blocking=False):
+                swap.started = True
+            else:
+                swap = None
+        if swap is not None:
+            # The new engine rotates ambisonic input itself
+            swap.convolver._orientation_target = swap.convolver._orientation = self._orientation
+            swap.convolver.process_block(block, out=swap.out)
+        if self._ambisonics is not None:
+            block = self._ambisonics.rotate(block, self._orientation)
+        if self.engine != "fft":
+            self._process_block_partitioned(block, out)
+        else:
+            self._process_block_fft(block, out)
+        if swap is not None:
+            self._crossfade_swap(swap, out)
+        if self.meter is not None:
+            self.meter.record(out)
+        self._telemetry.record_block(time.perf_counter() - start)
+        return out
 
-            if len(self.angles) == 1:
-                ir = self.ir_fft[self.angles[0]]
-                out_l = buf_fft[0] * ir["left"]
-                out_r = buf_fft[1] * ir["right"]
+    def _crossfade_swap(self, swap: _IRSwap, out: np.ndarray) -> None:
+        """Fade ``out`` into the output of the swapped in engine and adopt the engine once the fade is complete."""
+        b = self.block_size
+        _crossfade(swap.out, out, swap.fade_in[swap.position : swap.position + b])
+        out[:] = swap.out
+        swap.position += b
+        if swap.position < len(swap.fade_in):
+            return
+        self._adopt(swap)
+
+    def _adopt(self, swap: _IRSwap) -> None:
+        """Exchange the engines' state, the old engine's workers are released by the thread which prepared the swap."""
+        replacement = swap.convolver
+        retired = self.__dict__
+        self.__dict__ = {**replacement.__dict__, **{name: retired[name] for name in self._SESSION}}
+        replacement.__dict__ = retired
+        self._incoming = None
+        self.swaps += 1
+        swap.done.set()
+
+    def swap_irs(self, irs, crossfade: float = SWAP_CROSSFADE, **options) -> Future:
+        """Replace the impulse responses without interrupting playback.
+
+        The new engine is prepared on a background thread with the options of this one, which ``options`` may
+        override. The audio thread picks it up at the next block boundary, runs both engines on the same input and
+        crossfades from the old output to the new one over ``crossfade`` seconds, after which the old engine is
+        released. The reverberation of the new impulse responses builds up from the swap on. While no blocks are
+        processed, for example before ``start`` or after ``stop``, the new engine replaces the old one directly
+        after ``SWAP_IDLE`` seconds, and ``reset`` applies a pending swap right away. Swaps are applied in the order
+        they were requested.
+
+        Args:
+            irs: New ``HRIR``, BRIR dictionary or ``BRIRBundle`` with the sampling rate and input channels of the
+                current ones.
+            crossfade: Length of the crossfade in seconds, rounded up to whole blocks.
+            **options: Constructor options of the new engine except ``block_size``.
+
+        Returns:
+            Future which completes once the new impulse responses are playing. It holds the preparation error if
+            they could not be used and a ``RuntimeError`` if the convolver was closed first.
+        """
+        if "block_size" in options:
+            raise ValueError("The block size of a running convolver cannot be changed")
+        future: Future = Future()
+        with self._swap_lock:
+            if self._swaps_closed:
+                raise RuntimeError("The convolver is closed")
+            self._swap_queue.put((irs, crossfade, options, future))
+            if self._swap_worker is None:
+                self._swap_worker = threading.Thread(target=self._run_swaps, daemon=True)
+                self._swap_worker.start()
+        return future
+
+    def _run_swaps(self) -> None:
+        """Prepare and apply the requests of ``swap_irs`` one after the other until ``close``."""
+        while True:
+            request = self._swap_queue.get()
+            if request is None:
+                return
+            irs, crossfade, options, future = request
+            if self._swaps_closed:
+                future.set_exception(RuntimeError("The convolver was closed before the swap was applied"))
+                continue
+            try:
+                replacement = RealTimeConvolver(irs, **{**self._options, **options})
+                if replacement.fs != self.fs or replacement.n_speakers != self.n_speakers:
+                    replacement.close()
+                    raise ValueError("Swapped impulse responses must keep the sampling rate and input channels")
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            blocks = max(1, math.ceil(crossfade * self.fs / self.block_size))
+            swap = _IRSwap(replacement, blocks * self.block_size)
+            if self._apply_swap(swap):
+                # The replacement object now holds the old engine
+                replacement._release_workers()
+                future.set_result(None)
             else:
-                if isinstance(self.angles[0], (tuple, list)):
-                    orient = np.array([self._yaw, self._pitch, self._roll])
-                    dists = np.array([np.linalg.norm(orient - np.array(a)) for a in self.angles], dtype=float)
-                else:
-                    dists = np.array([self._angular_distance(a, self._yaw) for a in self.angles], dtype=float)
+                replacement.close()
+                future.set_exception(RuntimeError("The convolver was closed before the swap was applied"))
 
-                if np.any(dists == 0):
-                    weights = (dists == 0).astype(float)
-                else:
-                    inv = 1.0 / dists
-                    weights = inv / inv.sum()
+    def _apply_swap(self, swap: _IRSwap) -> bool:
+        """Hand ``swap`` to the audio thread and wait until it is applied, return ``False`` if it was cancelled.
+
+        Without blocks being processed the swap is taken back and applied here, or cancelled when closing. A
+        crossfade interrupted by the end of processing is completed here.
+        """
+        idle = max(SWAP_IDLE, 4 * self.block_size / self.fs)
+        blocks = self._telemetry.blocks
+        self._incoming = swap
+        while not swap.done.wait(idle):
+            stopped = self._thread is None and self._telemetry.blocks == blocks
+            blocks = self._telemetry.blocks
+            if swap.started:
+                if stopped:
+                    self._adopt(swap)
+                    return True
+            elif (stopped or self._swaps_closed) and swap.claim.acquire(blocking=False):
+                if self._swaps_closed:
+                    self._incoming = None
+                    return False
+                self._adopt(swap)
+                return True
+        return True
 
-                ir_l = np.zeros_like(self.ir_fft[self.angles[0]]["left"], dtype=complex)
-                ir_r = np.zeros_like(ir_l)
-                for w, a in zip(weights, self.angles):
-                    ir_l += w * self.ir_fft[a]["left"]
-                    ir_r += w * self.ir_fft[a]["right"]
+    def _close_swaps(self) -> None:
+        """Fail queued swaps and stop the swap worker, a swap being crossfaded is completed first."""
+        with self._swap_lock:
+            self._swaps_closed = True
+            worker, self._swap_worker = self._swap_worker, None
+        if worker is None:
+            return
+        self._swap_queue.put(None)
+        worker.join()
+
+    def _process_block_fft(self, block: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Convolve a single block with the full impulse responses in one transform."""
+        b = self.block_size
+        buf_fft = self._in_fft.freq
+        acc = self._out_fft.freq
 
-                out_l = buf_fft[0] * ir_l
-                out_r = buf_fft[1] * ir_r
+        previous = None
+        if hasattr(self, "brirs"):
+            # Samples beyond the block stay zero
+            self._in_fft.time[:, :b] = block
+            self._in_fft.forward()
+            if len(self.angles) == 1:
+                ir = self.ir_fft[0]
+            elif self.interpolation == "switch":
+                last = self._angle
+                ir = self.ir_fft[self._nearest_angle()]
+                if last is not None and last != self._angle:
+                    previous = last
+            else:
+                neighbours = self._neighbours()
+                if neighbours is not self._blended:
+                    _blend(self.ir_fft, neighbours, self._ir, self._tmp)
+                    self._blended = neighbours
+                ir = self._ir
+            np.multiply(buf_fft, ir, out=acc)
         else:
-            if block.shape != (self.n_speakers, self.block_size):
-                raise ValueError("Invalid input block shape")
-            buf = np.zeros((self.n_speakers, self.fft_size))
-            buf[:, : self.block_size] = block
-            buf_fft = fft.rfft(buf, axis=1)
-            out_l = np.zeros(self.fft_size // 2 + 1, dtype=complex)
-            out_r = np.zeros_like(out_l)
-            for i, name in enumerate(self.speakers):
-                out_l += buf_fft[i] * self.ir_fft[name]["left"]
-                out_r += buf_fft[i] * self.ir_fft[name]["right"]
+            self._mix_speakers(block, acc)
 
-        y_l = fft.irfft(out_l)
-        y_r = fft.irfft(out_r)
+        self._out_fft.inverse()
+        y = self._out_fft.time
+        if previous is not None:
+            # Fade the current block from the previous orientation into the new one, tails of earlier blocks in
+            # the overlap keep the orientation they were convolved with
+            np.multiply(buf_fft, self.ir_fft[previous], out=self._fade_fft.freq)
+            self._fade_fft.inverse()
+            _crossfade(y[:, :b], self._fade_fft.time[:, :b], self._fade_in)
+        # Row by row, numpy copies strided 2-D operands of in-place additions
+        for ear in range(2):
+            y[ear, : self.overlap.shape[1]] += self.overlap[ear]
+        self.overlap[:] = y[:, b:]
+        out[...] = y[:, :b]
+        return out
+
+    def _mix_speakers(self, block: np.ndarray, acc: np.ndarray) -> None:
+        """Transform the speaker channels of ``block`` and mix them into the output spectrum ``acc``.
+
+        Silent channels are neither transformed nor mixed. The overlap carries the tails of earlier blocks, so a
+        block without input does not contribute to the output at all.
+        """
+        b = self.block_size
+        buf = self._in_fft.time
+        rows = len(self._channels)
+        n_active = 0
+        for row, channel in enumerate(self._channels):
+            active = bool(block[channel].any())
+            self._active[row] = active
+            if active:
+                # Samples beyond the block stay zero, rows of silent channels are overwritten before they are used
+                buf[row, :b] = block[channel]
+                n_active += 1
+        self._channel_blocks += rows
+        if n_active == rows:
+            self._in_fft.forward()
+            if self._groups is not None:
+                self._pool.run(self._mix_group, len(self._groups))
+                for partial in self._partials:
+                    acc += partial
+            else:
+                # Mix all speakers into both ears in one multiply-reduce
+                np.einsum("sk,esk->ek", self._in_fft.freq, self.ir_fft, out=acc)
+            return
+        self._skipped_transforms += rows - n_active
+        self._skipped_macs += rows - n_active
+        acc.fill(0.0)
+        for row, active in enumerate(self._active):
+            if active:
+                self._in_fft.forward_row(row)
+                # A broadcast multiply would make numpy buffer the strided spectra
+                np.einsum("k,ek->ek", self._in_fft.freq[row], self.ir_fft[:, row], out=self._channel_acc)
+                acc += self._channel_acc
 
-        y_l[: self.overlap.shape[1]] += self.overlap[0]
-        y_r[: self.overlap.shape[1]] += self.overlap[1]
+    def _mix_group(self, i: int) -> None:
+        """Mix one speaker group of the FFT engine's input spectrum into a partial output spectrum."""
+        s0, s1 = self._groups[i]
+        target = self._out_fft.freq if i == 0 else self._partials[i - 1]
+        np.einsum("sk,esk->ek", self._in_fft.freq[s0:s1], self.ir_fft[:, s0:s1], out=target)
 
-        self.overlap[0] = y_l[self.block_size :]
-        self.overlap[1] = y_r[self.block_size :]
+    def _process_block_partitioned(self, block: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Partitioned overlap-save convolution of a single block.
 
-        out = np.stack([y_l[: self.block_size], y_r[: self.block_size]])
+        The head segment is convolved immediately. Tail segments collect input until one of their partitions is
+        complete and are then handed to the background worker, their output is needed ``offset`` samples later.
+        """
+        b = self.block_size
+        if self._live_block is not None:
+            for row, channel in enumerate(self._channels):
+                self._live_block[row] = block[channel]
+            block = self._live_block
+        neighbours = None
+        angle = None
+        if hasattr(self, "brirs") and len(self.angles) > 1:
+            if self.interpolation == "switch":
+                angle = self._nearest_angle()
+            else:
+                neighbours = self._neighbours()
+        self._head.process(block, neighbours, out, angle)
+        for tail in self._multirate:
+            tail.process(block, out)
 
+        start = self._block_index * b
+        for i, seg in enumerate(self._tail):
+            n = seg.partition_size
+            pos = start % n
+            jobs = self._tail_jobs[i]
+            job = jobs[self._tail_slots[i]]
+            job.input[:, pos : pos + b] = block
+            if pos + b == n:
+                # Output of this partition starts ``offset`` samples after the partition's first input sample
+                job.out_start = start + b - n + seg.offset
+                job.neighbours = neighbours
+                job.angle = angle
+                self._tail_worker.submit(job.out_start // b, job)
+                self._tail_pending.append(job)
+                self._tail_slots[i] = (self._tail_slots[i] + 1) % len(jobs)
 
+        pending = self._tail_pending
+        i = 0
+        while i < len(pending):
+            job = pending[i]
+            offset = start - job.out_start
+            if offset >= 0:
+                out += job.wait()[:, offset : offset + b]
+            if offset + b >= job.output.shape[1]:
+                del pending[i]
+            else:
+                i += 1
+        self._block_index += 1
         return out
 
+    def process(self, block: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Process any number of frames, independently of the block size.
+
+        Input is collected into blocks of ``block_size`` samples and the output is delayed by a constant
+        ``reblock_latency`` samples, ``block_size - 1`` unless ``run`` was given a fixed ``host_block_size``. Like
+        ``process_block``, the call does not allocate arrays when ``out`` is given.
+
+        Args:
+            block: Array ``(n_speakers, frames)``.
+            out: Array ``(2, frames)`` receiving the output. A new array is returned when not given.
+        """
+        if block.shape[0] != self.n_speakers:
+            raise ValueError("Invalid input block shape")
+        if out is None:
+            out = np.empty((2, block.shape[1]))
+        return self._reblocker.process(block, out)
+
+    @property
+    def reblock_latency(self) -> int:
+        """Samples by which ``process`` delays the output."""
+        return self._reblocker.latency
+
+    def reset(self) -> None:
+        """Clear all signal history so that the next block starts from silence.
+
+        Prepared impulse response spectra are kept, which makes rendering several files with one convolver cheaper
+        than creating a new one per file. A pending ``swap_irs`` is applied first, without a crossfade.
+        """
+        swap = self._incoming
+        if swap is not None and (swap.started or swap.claim.acquire(blocking=False)):
+            self._adopt(swap)
+        self.overlap.fill(0.0)
+        self._reblocker.reset()
+        if self.engine == "fft":
+            self._in_fft.time.fill(0.0)
+            self._blended = None
+        else:
+            for job in self._tail_pending:
+                job.wait()
+            self._tail_pending.clear()
+            for seg in [self._head, *self._tail]:
+                seg.reset()
+            for tail in self._multirate:
+                tail.reset()
+            for jobs in self._tail_jobs:
+                for job in jobs:
+                    job.input.fill(0.0)
+            self._tail_slots = [0] * len(self._tail)
+            self._block_index = 0
+        if hasattr(self, "brirs"):
+            self._angle = None
+        if self._ambisonics is not None:
+            self._ambisonics.reset()
+
+    def render_file(self, input_wav: str, output_wav: str) -> int:
+        """Convolve a multichannel file into a stereo file, starting from silence.
+
+        The input is read and the output written one block at a time, so memory use does not depend on the file
+        length. The output is ``ir_length - 1`` samples longer than the input and ends with the complete convolution
+        tail.
+
+        Args:
+            input_wav: Input file with one channel per input of the convolver and the convolver's sampling rate.
+            output_wav: Stereo output file.
+
+        Returns:
+            Number of input samples per channel.
+        """
+
+        import soundfile as sf
+
+        b = self.block_size
+        with sf.SoundFile(input_wav) as src:
+            if src.samplerate != self.fs:
+                raise ValueError("Sampling rate mismatch")
+            # Checked before the output file is created, which would otherwise be left behind truncated
+            if src.channels != self.n_speakers:
+                raise ValueError(f"Input has {src.channels} channels but the convolver has {self.n_speakers} inputs")
+            self.reset()
+            remaining = src.frames + self.ir_length - 1
+            out = np.empty((2, b))
+            silence = np.zeros((self.n_speakers, b))
+            with sf.SoundFile(output_wav, "w", samplerate=self.fs, channels=2) as dst:
+                # The last input block is padded with zeros, blocks after the input flush the convolution tail
+                for block in src.blocks(blocksize=b, always_2d=True, fill_value=0.0):
+                    self.process_block(block.T, out=out)
+                    dst.write(out[:, : min(b, remaining)].T)
+                    remaining -= b
+                while remaining > 0:
+                    self.process_block(silence, out=out)
+                    dst.write(out[:, : min(b, remaining)].T)
+                    remaining -= b
+            return src.frames
+
+    def close(self) -> None:
+        """Release the background worker of the non-uniform engine, the worker pool, the statistics log and the
+        swap worker, failing swaps which were not applied yet."""
+        self.stop_stats_log()
+        self._close_swaps()
+        self._release_workers()
+
+    def _release_workers(self) -> None:
+        worker = getattr(self, "_tail_worker", None)
+        if worker is not None:
+            worker.close()
+            self._tail_worker = None
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def worker_stats(self) -> Optional[dict]:
+        """Return timing of the worker pool or ``None`` when running single threaded.
+
+        ``last``, ``busy`` and ``peak`` hold per worker seconds spent in the last, all and the slowest parallel
+        section, the first entry being the audio thread itself. ``late`` counts parallel sections which took longer
+        than one block period.
+        """
+        return self._pool.stats() if self._pool is not None else None
+
     def set_orientation(self, yaw: float, pitch: float = 0.0, roll: float = 0.0) -> None:
-        """Update current head orientation."""
-        self._yaw = float(yaw)
-        self._pitch = float(pitch)
-        self._roll = float(roll)
+        """Update current head orientation.
+
+        The orientation is rendered from the next block on, gradually when ``orientation_smoothing`` is set.
+        """
+        self._orientation_target = (float(yaw), float(pitch), float(roll))
+        if not self.orientation_smoothing:
+            self._orientation = self._orientation_target
+        self._telemetry.record_orientation()
+
+    def _sample_orientation(self) -> None:
+        """Take the orientation of the next block from the source and smooth it, called once per block."""
+        source = self.orientation_source
+        if source is not None:
+            target = tuple(float(a) for a in source.orientation())
+            if target != self._orientation_target:
+                self._orientation_target = target
+                self._telemetry.record_orientation()
+        target = self._orientation_target
+        current = self._orientation
+        if target == current:
+            return
+        if not self.orientation_smoothing:
+            self._orientation = target
+            return
+        # One-pole low-pass at block rate, yaw and roll taking the short way around the circle
+        alpha = 1.0 - math.exp(-self.block_size / self.fs / self.orientation_smoothing)
+        diffs = [(t - c + 180.0) % 360.0 - 180.0 for t, c in zip(target, current)]
+        diffs[1] = target[1] - current[1]
+        if max(abs(d) for d in diffs) < ORIENTATION_RESOLUTION:
+            self._orientation = target
+            return
+        yaw, pitch, roll = (c + alpha * d for c, d in zip(current, diffs))
+        self._orientation = ((yaw + 180.0) % 360.0 - 180.0, pitch, (roll + 180.0) % 360.0 - 180.0)
+
+    def stats(self) -> dict:
+        """Return a snapshot of the convolver's performance counters.
+
+        Processing times are measured around every ``process_block`` call, utilisation is the processing time
+        divided by the block duration and ``late_blocks`` counts blocks which took longer than that. The histogram
+        counts blocks per utilisation bin, bin ``i`` covering utilisations up to ``edges[i]`` and the last bin
+        everything above. ``reblock_underruns`` counts callbacks of ``process`` or a stream with ``host_block_size``
+        which ran out of output samples and played silence. ``status_errors`` and ``flags`` count audio callbacks
+        reporting a stream status. The snapshot is a plain dictionary which can be serialized to JSON and is cheap
+        enough to poll from a GUI timer.
+        """
+        stats = self._telemetry.stats()
+        stats["switches"] = self.switches
+        stats["swaps"] = self.swaps
+        stats["workers"] = self.worker_stats()
+        stats["stream"] = self.stream_stats()
+        stats["channels"] = self.channel_stats()
+        return stats
+
+    def reset_stats(self) -> None:
+        """Reset the counters reported by ``stats``."""
+        self._telemetry.reset()
+        self.switches = 0
+        self.swaps = 0
+        self._skipped_transforms = 0
+        self._skipped_macs = 0
+        self._channel_blocks = 0
+        if self.engine != "fft":
+            for seg in self._segments():
+                seg.channel_partitions = 0
+                seg.skipped_transforms = 0
+                seg.skipped_macs = 0
+
+    def _segments(self) -> list[_PartitionedSegment]:
+        """Return all uniformly partitioned segments of a partitioned engine, including those of multirate tails."""
+        return [self._head, *self._tail, *(tail.segment for tail in self._multirate)]
+
+    def channel_stats(self) -> Optional[dict]:
+        """Return speaker pruning and silent channel skipping counters, ``None`` for BRIR dictionaries.
+
+        ``transforms`` counts channel input transforms the engine would compute without skipping, one per speaker
+        and block for the FFT engine and one per speaker and partition of every segment for partitioned engines.
+        ``skipped_transforms`` and ``skipped_macs`` count those skipped because the input was silent.
+        ``multirate`` maps speakers to the decimation factors of their tails when ``multirate_time`` is used.
+        """
+        if self._channels is None:
+            return None
+        if self.engine == "fft":
+            transforms = self._channel_blocks
+            skipped_transforms = self._skipped_transforms
+            skipped_macs = self._skipped_macs
+        else:
+            segments = self._segments()
+            transforms = sum(seg.channel_partitions for seg in segments)
+            skipped_transforms = sum(seg.skipped_transforms for seg in segments)
+            skipped_macs = sum(seg.skipped_macs for seg in segments)
+        return {
+            "inputs": self.n_speakers,
+            "convolved": len(self._channels),
+            "pruned": list(self.pruned_speakers),
+            "transforms": transforms,
+            "skipped_transforms": skipped_transforms,
+            "skipped_macs": skipped_macs,
+            "multirate": dict(self.multirate_factors),
+        }
+
+    def start_stats_log(self, file_path: str, interval: float = 1.0) -> None:
+        """Append a JSON line with ``stats`` and a ``time`` stamp to ``file_path`` every ``interval`` seconds.
+
+        Logging runs on a background thread until ``stop_stats_log`` or ``close`` is called.
+        """
+        self.stop_stats_log()
+        self._stats_log_stop.clear()
+
+        def _loop() -> None:
+            while not self._stats_log_stop.wait(interval):
+                with open(file_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"time": time.time(), **self.stats()}) + "\n")
+
+        self._stats_log = threading.Thread(target=_loop, daemon=True)
+        self._stats_log.start()
+
+    def stop_stats_log(self) -> None:
+        """Stop the periodic JSON log."""
+        if self._stats_log is None:
+            return
+        self._stats_log_stop.set()
+        self._stats_log.join()
+        self._stats_log = None
 
     def start(
         self,
@@ -178,6 +2109,9 @@ class RealTimeConvolver:
         output_device: Optional[Union[int, str]] = None,
         latency: float | None = None,
         host_api: Optional[str] = None,
+        decoupled: bool = False,
+        safety_blocks: int = 2,
+        host_block_size: Optional[int] = None,
     ) -> None:
         """Start real-time convolution in a background thread.
 
@@ -187,6 +2121,9 @@ class RealTimeConvolver:
             output_device: Output device index or name.
             latency: Desired latency in seconds.
             host_api: Preferred host API name (e.g. ``"Core Audio"``).
+            decoupled: Convolve on a separate DSP thread, see ``run``.
+            safety_blocks: Blocks buffered ahead of the audio device in decoupled mode.
+            host_block_size: Frames per device callback, see ``run``.
         """
         if self._thread is not None:
             return
@@ -199,11 +2136,19 @@ class RealTimeConvolver:
                 "output_device": output_device,
                 "latency": latency,
                 "host_api": host_api,
+                "decoupled": decoupled,
+                "safety_blocks": safety_blocks,
+                "host_block_size": host_block_size,
             },
             daemon=True,
         )
         self._thread.start()
 
+    @property
+    def running(self) -> bool:
+        """Whether ``start`` is playing through the audio device."""
+        return self._thread is not None
+
     def stop(self) -> None:
         """Stop the background convolution thread."""
         if self._thread is None:
@@ -221,6 +2166,9 @@ class RealTimeConvolver:
         output_device: Optional[Union[int, str]] = None,
         latency: float | None = None,
         host_api: Optional[str] = None,
+        decoupled: bool = False,
+        safety_blocks: int = 2,
+        host_block_size: Optional[int] = None,
     ) -> None:
         """Run real-time convolution using ``sounddevice`` streams.
 
@@ -230,17 +2178,41 @@ class RealTimeConvolver:
             output_device: Output device index or name.
             latency: Desired latency in seconds.
             host_api: Preferred host API name (e.g. ``"Core Audio"``).
+            decoupled: Convolve on a separate DSP thread. The audio callback only copies samples into and out of
+                lock-free ring buffers, isolating the audio device from processing jitter at the cost of
+                ``safety_blocks`` blocks of extra latency. See ``stream_stats`` for underrun and queue counters.
+            safety_blocks: Blocks buffered ahead of the audio device in decoupled mode.
+            host_block_size: Frames per device callback. ``None`` uses the engine's block size, other sizes are
+                re-blocked through FIFOs which add ``reblock_latency`` samples of constant latency, and ``0`` lets
+                the host API deliver any number of frames per callback. Small host buffers keep the device latency
+                low while the engine runs with a block size it can sustain.
         """
 
         if sd is None:
             raise RuntimeError("sounddevice library not available")
 
-        def callback(indata, outdata, frames, time_info, status):
-            if status:
-                print(status)
-            block = np.transpose(indata)
-            out_block = self.process_block(block)
-            outdata[:] = np.transpose(out_block)
+        if decoupled:
+            self._stream = _DecoupledStream(self, safety_blocks, host_block_size or 0)
+
+            def callback(indata, outdata, frames, time_info, status):
+                if status:
+                    self._telemetry.record_status(status)
+                self._stream.callback(indata, outdata, status)
+
+        elif host_block_size is not None:
+            self._reblocker = _Reblocker(self, host_block_size)
+
+            def callback(indata, outdata, frames, time_info, status):
+                if status:
+                    self._telemetry.record_status(status)
+                self._reblocker.process(indata.T, outdata.T)
+
+        else:
+
+            def callback(indata, outdata, frames, time_info, status):
+                if status:
+                    self._telemetry.record_status(status)
+                self.process_block(indata.T, out=outdata.T)
 
         if host_api is not None:
             try:
@@ -252,20 +2224,34 @@ class RealTimeConvolver:
             except Exception:
                 pass
 
-        with sd.Stream(
-            samplerate=self.fs,
-            blocksize=self.block_size,
-            dtype="float32",
-            channels=(self.n_speakers, 2),
-            callback=callback,
-            device=(input_device, output_device),
-            latency=latency,
-        ):
-            if duration is None:
-                while not self._stop.is_set():
-                    sd.sleep(100)
-            else:
-                sd.sleep(int(duration * 1000))
+        try:
+            with sd.Stream(
+                samplerate=self.fs,
+                blocksize=self.block_size if host_block_size is None else host_block_size,
+                dtype="float32",
+                channels=(self.n_speakers, 2),
+                callback=callback,
+                device=(input_device, output_device),
+                latency=latency,
+            ):
+                if duration is None:
+                    while not self._stop.is_set():
+                        sd.sleep(100)
+                else:
+                    sd.sleep(int(duration * 1000))
+        finally:
+            if self._stream is not None:
+                self._stream.close()
+
+    def stream_stats(self) -> Optional[dict]:
+        """Return counters of the decoupled stream or ``None`` when it was never started.
+
+        ``underruns`` counts callbacks which found too few processed samples and played silence, ``overruns`` input
+        blocks dropped because the DSP thread fell behind and ``status_errors`` callbacks with a stream status.
+        ``queue_depth`` is the number of blocks currently buffered ahead of the device and ``min_queue_depth`` the
+        lowest number seen by a callback.
+        """
+        return self._stream.stats() if self._stream is not None else None
 
 
 def convolve_file(
@@ -273,32 +2259,116 @@ def convolve_file(
     output_wav: str,
     hrir,
     block_size: int = 1024,
+    engine: str = "fft",
+    max_partition: int = 8192,
 ) -> None:
-    """Offline convolution helper for multi-channel files."""
+    """Offline convolution helper for multi-channel files.
 
+    See ``RealTimeConvolver.render_file``, which keeps memory use independent of the file length.
+
+    Args:
+        input_wav: Multichannel input file with one channel per HRIR speaker.
+        output_wav: Stereo output file.
+        hrir: ``HRIR`` object with the sampling rate of the input file.
+        block_size: Number of samples read, convolved and written at a time.
+        engine: Convolution engine, one of ``ENGINES``.
+        max_partition: Largest partition size in samples used by the non-uniform engine.
+    """
+    convolver = RealTimeConvolver(hrir, block_size=block_size, engine=engine, max_partition=max_partition)
+    try:
+        convolver.render_file(input_wav, output_wav)
+    finally:
+        convolver.close()
+
+
+# Impulse response length, block size, transform size and impulse response spectra of an offline render worker
+_render_state: Optional[tuple] = None
+
+
+def _init_render_worker(irs: np.ndarray, block_size: int) -> None:
+    """Transform the impulse responses ``(ears, speakers, samples)`` once per worker process."""
+    global _render_state
+    n_fft = scipy.fft.next_fast_len(block_size + irs.shape[-1] - 1, real=True)
+    _render_state = (irs.shape[-1], block_size, n_fft, scipy.fft.rfft(irs, n=n_fft, axis=-1))
+
+
+def _render_segment(input_wav: str, start: int, stop: int) -> np.ndarray:
+    """Convolve input samples ``start:stop`` and return ``(2, stop - start + ir_length - 1)`` including the tail."""
     import soundfile as sf
 
-    fs = hrir.fs
-    data, fs_in = sf.read(input_wav, always_2d=True)
-    if fs_in != fs:
-        raise ValueError("Sampling rate mismatch")
-    engine = RealTimeConvolver(hrir, block_size)
-    out = []
-    idx = 0
-    data = np.transpose(data)
-    while idx < data.shape[1]:
-        block = data[:, idx : idx + block_size]
-        if block.shape[1] < block_size:
-            pad = np.zeros((data.shape[0], block_size - block.shape[1]))
-            block = np.concatenate([block, pad], axis=1)
-        out_block = engine.process_block(block)
-        out.append(out_block)
-        idx += block_size
-    out = np.concatenate(out, axis=1)
-    sf.write(output_wav, np.transpose(out), fs)
-
-
-def _hrir_from_wav(file_path: str) -> HRIR:
+    ir_length, block_size, n_fft, spectra = _render_state
+    data, _ = sf.read(input_wav, start=start, stop=stop, always_2d=True)
+    data = data.T
+    out = np.zeros((2, data.shape[1] + ir_length - 1))
+    for i in range(0, data.shape[1], block_size):
+        block = scipy.fft.rfft(data[:, i : i + block_size], n=n_fft, axis=-1)
+        y = scipy.fft.irfft(np.einsum("sk,esk->ek", block, spectra), n=n_fft, axis=-1)
+        n = min(n_fft, out.shape[1] - i)
+        out[:, i : i + n] += y[:, :n]
+    return out
+
+
+def convolve_file_parallel(
+    input_wav: str,
+    output_wav: str,
+    hrir,
+    processes: Optional[int] = None,
+    segment_seconds: float = 30.0,
+    block_size: int = 65536,
+) -> None:
+    """Offline convolution of a multichannel file split into time segments rendered by a process pool.
+
+    Every worker convolves whole segments with large FFT blocks, the tails reaching into the next segment are
+    added back in order, so the output matches ``convolve_file`` up to floating point rounding. At most two
+    segments per worker are in flight, which keeps memory use independent of the file length.
+
+    Args:
+        input_wav: Multichannel input file with one channel per HRIR speaker.
+        output_wav: Stereo output file.
+        hrir: ``HRIR`` object with the sampling rate of the input file.
+        processes: Number of worker processes, defaults to the number of CPUs.
+        segment_seconds: Length of the time segments handed to the workers.
+        block_size: Block size of the overlap-add convolution within a segment.
+    """
+
+    import soundfile as sf
+
+    irs = _hrir_tensor(hrir)
+    ir_length = irs.shape[-1]
+    with sf.SoundFile(input_wav) as src:
+        if src.samplerate != hrir.fs:
+            raise ValueError("Sampling rate mismatch")
+        if src.channels != irs.shape[1]:
+            raise ValueError(f"Input has {src.channels} channels but the HRIR has {irs.shape[1]} speakers")
+        frames = src.frames
+    segment = max(1, int(segment_seconds * hrir.fs))
+    segments = iter(range(0, frames, segment))
+    processes = processes or os.cpu_count() or 1
+
+    # Tail of the previous segments overlapping the next one
+    carry = np.zeros((2, ir_length - 1))
+    with ProcessPoolExecutor(processes, initializer=_init_render_worker, initargs=(irs, block_size)) as pool:
+        with sf.SoundFile(output_wav, "w", samplerate=hrir.fs, channels=2) as dst:
+            pending: deque = deque()
+
+            def submit() -> None:
+                start = next(segments, None)
+                if start is not None:
+                    pending.append(pool.submit(_render_segment, input_wav, start, min(start + segment, frames)))
+
+            for _ in range(2 * processes):
+                submit()
+            while pending:
+                y = pending.popleft().result()
+                submit()
+                n = y.shape[1] - (ir_length - 1)
+                y[:, : ir_length - 1] += carry
+                dst.write(y[:, :n].T)
+                carry = y[:, n:]
+            dst.write(carry.T)
+
+
+def hrir_from_wav(file_path: str) -> HRIR:
     """Helper for loading ``hrir.wav`` into an ``HRIR`` object."""
 
     fs, data = read_wav(file_path, expand=True)
@@ -312,18 +2382,58 @@ def _hrir_from_wav(file_path: str) -> HRIR:
     return h
 
 
-if __name__ == "__main__":
+def main() -> None:
     import argparse
 
     parser = argparse.ArgumentParser(description="Offline BRIR convolution")
     parser.add_argument("input", help="Input multichannel WAV file")
     parser.add_argument("output", help="Output stereo WAV file")
     parser.add_argument("hrir", help="hrir.wav generated by Earprint")
-    parser.add_argument("--block_size", type=int, default=1024)
+    parser.add_argument(
+        "--block_size",
+        type=int,
+        help="Block size, 1024 by default and 65536 for the FFT blocks of segments rendered in parallel",
+    )
+    parser.add_argument("--engine", choices=ENGINES, help="Convolution engine, fft by default")
+    parser.add_argument(
+        "--max_partition", type=int, help="Largest partition size of the non-uniform engine, 8192 by default"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Render time segments in parallel with this many processes, 0 uses all CPUs",
+    )
+    parser.add_argument(
+        "--segment_seconds", type=float, default=30.0, help="Length of the segments rendered in parallel"
+    )
     args = parser.parse_args()
+    if args.processes != 1 and (args.engine is not None or args.max_partition is not None):
+        parser.error("--engine and --max_partition need --processes 1, parallel segments are rendered with FFT blocks")
 
-    hrir_obj = _hrir_from_wav(args.hrir)
-    convolve_file(args.input, args.output, hrir_obj, block_size=args.block_size)
+    hrir_obj = hrir_from_wav(args.hrir)
+    if args.processes != 1:
+        convolve_file_parallel(
+            args.input,
+            args.output,
+            hrir_obj,
+            processes=args.processes or None,
+            segment_seconds=args.segment_seconds,
+            block_size=args.block_size or 65536,
+        )
+    else:
+        convolve_file(
+            args.input,
+            args.output,
+            hrir_obj,
+            block_size=args.block_size or 1024,
+            engine=args.engine or "fft",
+            max_partition=args.max_partition or 8192,
+        )
+
+
+if __name__ == "__main__":
+    main()
 
 
 # Backwards compatibility for earlier naming
@@ -7,10 +7,25 @@ import pytest
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from impulse_response_estimator import ImpulseResponseEstimator
+from impulse_response import ImpulseResponse
+from hrir import HRIR
 from constants import SPEAKER_LAYOUTS
 from utils import write_wav
 
 
+def random_hrir(speakers, ir_length, fs=48000, seed=0):
+    """Return an ``HRIR`` with white noise impulse responses of ``ir_length`` samples for every speaker."""
+    rng = np.random.default_rng(seed)
+    estimator = type("_e", (), {"fs": fs})()
+    hrir = HRIR(estimator)
+    for name in speakers:
+        hrir.irs[name] = {
+            "left": ImpulseResponse(rng.standard_normal(ir_length), fs),
+            "right": ImpulseResponse(rng.standard_normal(ir_length), fs),
+        }
+    return hrir
+
+
 def _write_dummy_recordings(out_dir, layout):
     fs = 8000
     ire = ImpulseResponseEstimator(min_duration=0.1, fs=fs)
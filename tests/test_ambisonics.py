@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from ambisonics import SoundFieldRotator, binaural_filters, channel_acn, head_rotation, spherical_harmonics
+from constants import SPEAKER_DIRECTIONS
+from realtime_convolution import RealTimeConvolver
+from conftest import random_hrir
+
+SPEAKERS = ["FL", "FR", "FC", "LFE", "SL", "SR", "BL", "BR", "TFL", "TFR", "TBL", "TBR"]
+
+
+def _encode(signal, azimuth, elevation, order=1):
+    """Plane wave of ``signal`` from a direction as ambisonic input channels."""
+    return spherical_harmonics(order, azimuth, elevation)[channel_acn(order)][:, None] * signal
+
+
+def test_spherical_harmonics_sn3d():
+    w, y, z, x = spherical_harmonics(1, 90.0, 0.0)
+    np.testing.assert_allclose([w, x, y, z], [1.0, 0.0, 1.0, 0.0], atol=1e-12)
+    np.testing.assert_allclose(spherical_harmonics(1, 0.0, 90.0), [1.0, 0.0, 1.0, 0.0], atol=1e-12)
+    # SN3D components of every degree have unit total power in any direction
+    rng = np.random.default_rng(0)
+    sh = spherical_harmonics(3, rng.uniform(-180, 180, 20), rng.uniform(-90, 90, 20))
+    for degree in range(4):
+        np.testing.assert_allclose(np.sum(sh[:, degree**2 : (degree + 1) ** 2] ** 2, axis=1), 1.0)
+
+
+def _relative(azimuth, elevation, yaw, pitch=0.0, roll=0.0):
+    """Direction of a source relative to a head with the given orientation."""
+    az, el = np.radians([azimuth, elevation])
+    vector = np.array([np.cos(el) * np.cos(az), np.cos(el) * np.sin(az), np.sin(el)]) @ head_rotation(yaw, pitch, roll)
+    return np.degrees(np.arctan2(vector[1], vector[0])), np.degrees(np.arcsin(vector[2]))
+
+
+@pytest.mark.parametrize("order", [1, 3])
+def test_rotation_matches_relative_directions(order):
+    rotator = SoundFieldRotator(order)
+    for yaw, pitch, roll in [(30.0, 0.0, 0.0), (-75.0, 20.0, 10.0), (170.0, -40.0, 60.0)]:
+        matrix = rotator.matrix(yaw, pitch, roll)
+        for azimuth, elevation in [(0.0, 0.0), (120.0, 35.0), (-60.0, -20.0)]:
+            source = _encode(1.0, azimuth, elevation, order)[:, 0]
+            relative = _relative(azimuth, elevation, yaw, pitch, roll)
+            np.testing.assert_allclose(matrix @ source, _encode(1.0, *relative, order)[:, 0], atol=1e-9)
+    # Turning the head left moves a frontal source to the right
+    np.testing.assert_allclose(
+        rotator.matrix(30.0) @ _encode(1.0, 0.0, 0.0, order)[:, 0], _encode(1.0, -30.0, 0.0, order)[:, 0], atol=1e-9
+    )
+
+
+def test_binaural_filters_decode_to_speakers():
+    irs = np.random.default_rng(1).standard_normal((2, len(SPEAKERS), 50))
+    filters = binaural_filters(irs, SPEAKERS, 1)
+    assert filters.shape == (2, 4, 50)
+    # Filters of the signals equal decoding to the speakers and convolving the speaker feeds
+    directions = np.array([SPEAKER_DIRECTIONS[s] for s in SPEAKERS if s != "LFE"])
+    sh = spherical_harmonics(1, directions[:, 0], directions[:, 1])[:, channel_acn(1)]
+    decoder = np.linalg.pinv(sh).T
+    rows = [i for i, s in enumerate(SPEAKERS) if s != "LFE"]
+    np.testing.assert_allclose(filters, np.einsum("est,sc->ect", irs[:, rows], decoder), atol=1e-12)
+    with pytest.raises(ValueError):
+        binaural_filters(irs[:, :3], SPEAKERS[:3], 1)
+
+
+@pytest.mark.parametrize("engine", ["fft", "partitioned"])
+def test_convolver_renders_ambisonics(engine):
+    hrir = random_hrir(SPEAKERS, 400, seed=5)
+    b = 64
+    ambisonic = RealTimeConvolver(hrir, block_size=b, engine=engine, ambisonics_order=1)
+    assert ambisonic.speakers == ["W", "X", "Y", "Z"]
+    signal = np.random.default_rng(2).standard_normal(10 * b)
+
+    # A rotated head hears the source where the unrotated head hears the counter-rotated source
+    ambisonic.set_orientation(40.0, 10.0)
+    reference = RealTimeConvolver(hrir, block_size=b, engine=engine, ambisonics_order=1)
+    x = _encode(signal, 20.0, 0.0)
+    x_relative = _encode(signal, *_relative(20.0, 0.0, 40.0, 10.0))
+    for i in range(10):
+        np.testing.assert_allclose(
+            ambisonic.process_block(x[:, i * b : (i + 1) * b]),
+            reference.process_block(x_relative[:, i * b : (i + 1) * b]),
+            atol=1e-9,
+        )
+
+    # Without rotation the signals render like their decoded speaker feeds
+    speakers = RealTimeConvolver(hrir, block_size=b, engine=engine)
+    directions = np.array([SPEAKER_DIRECTIONS.get(s, (0.0, 0.0)) for s in SPEAKERS])
+    sh = spherical_harmonics(1, directions[:, 0], directions[:, 1])[:, channel_acn(1)]
+    decoder = np.linalg.pinv(sh[[s != "LFE" for s in SPEAKERS]]).T
+    feeds = np.zeros((len(SPEAKERS), 10 * b))
+    feeds[[s != "LFE" for s in SPEAKERS]] = decoder @ x
+    reference.reset()
+    reference.set_orientation(0.0)
+    for i in range(10):
+        np.testing.assert_allclose(
+            reference.process_block(x[:, i * b : (i + 1) * b]),
+            speakers.process_block(feeds[:, i * b : (i + 1) * b]),
+            atol=1e-9,
+        )
+
+
+def test_convolver_crossfades_rotation():
+    b = 32
+    convolver = RealTimeConvolver(random_hrir(SPEAKERS, 1, seed=5), block_size=b, ambisonics_order=1)
+    x = _encode(np.ones(2 * b), 0.0, 0.0)
+    convolver.process_block(x[:, :b])
+    convolver.set_orientation(90.0)
+    rotated = convolver._ambisonics.rotate(x[:, b:], (90.0, 0.0, 0.0))
+    # The block after the change fades from the previous orientation to the new one
+    np.testing.assert_allclose(rotated[:, 0], x[:, 0], atol=0.01)
+    np.testing.assert_allclose(rotated[:, -1], _encode(1.0, -90.0, 0.0)[:, 0], atol=0.01)
+
+
+def test_convolver_rejects_ambisonics_without_hrir():
+    with pytest.raises(ValueError):
+        RealTimeConvolver({0.0: (np.ones(4), np.ones(4))}, samplerate=48000, ambisonics_order=1)
+    with pytest.raises(ValueError):
+        RealTimeConvolver(random_hrir(SPEAKERS, 400, seed=5), ambisonics_order=0)
+    with pytest.raises(ValueError):
+        RealTimeConvolver(random_hrir(["FL", "FR"], 400, seed=5), ambisonics_order=1)
@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from batch_render import brir_name, load_manifest, render_batch, main
+from realtime_convolution import convolve_file, hrir_from_wav
+
+
+def _write_hrir(path, seed):
+    # FL-left, FL-right, FR-left, FR-right
+    data = 0.05 * np.random.default_rng(seed).standard_normal((200, 4))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sf.write(path, data, 48000, subtype="FLOAT")
+    return str(path)
+
+
+def _write_programme(path, seed, frames=2000):
+    sf.write(path, 0.3 * np.random.default_rng(seed).standard_normal((frames, 2)), 48000, subtype="FLOAT")
+    return str(path)
+
+
+def test_brir_name_uses_directory_of_hrir_wav(tmp_path):
+    assert brir_name(str(tmp_path / "alice" / "hrir.wav")) == "alice"
+    assert brir_name(str(tmp_path / "bob_v2.wav")) == "bob_v2"
+
+
+def test_render_batch_renders_every_pair(tmp_path):
+    brirs = [{"path": _write_hrir(tmp_path / name / "hrir.wav", i)} for i, name in enumerate(["alice", "bob"])]
+    inputs = [_write_programme(tmp_path / f"prog{i}.wav", 10 + i) for i in range(3)]
+    out_dir = tmp_path / "renders"
+
+    report = render_batch(inputs, brirs, str(out_dir), processes=1, block_size=256)
+
+    assert report["succeeded"] == 6 and report["failed"] == 0
+    # One worker renders all inputs of a set with the same prepared spectra
+    assert report["ir_preparations"] == 2
+    assert report["audio_seconds"] == pytest.approx(6 * 2000 / 48000)
+    convolve_file(inputs[1], str(tmp_path / "ref.wav"), hrir_from_wav(brirs[1]["path"]), 256, "partitioned")
+    expected, _ = sf.read(tmp_path / "ref.wav")
+    rendered, _ = sf.read(out_dir / "prog1__bob.wav")
+    np.testing.assert_array_equal(rendered, expected)
+
+
+def test_render_batch_reports_failures(tmp_path):
+    brirs = [{"path": _write_hrir(tmp_path / "alice" / "hrir.wav", 0), "name": "a"}]
+    bad = tmp_path / "mono.wav"
+    sf.write(bad, np.zeros(100), 44100)
+    report = render_batch([str(bad)], brirs, str(tmp_path / "out"), processes=1)
+    assert report["failed"] == 1
+    assert "Sampling rate mismatch" in report["renders"][0]["error"]
+
+
+def test_render_batch_reports_unreadable_brirs(tmp_path):
+    brirs = [{"path": str(tmp_path / "missing" / "hrir.wav")}, {"path": _write_hrir(tmp_path / "bob" / "hrir.wav", 1)}]
+    inputs = [_write_programme(tmp_path / f"prog{i}.wav", i) for i in range(2)]
+    report = render_batch(inputs, brirs, str(tmp_path / "out"), processes=1, block_size=256)
+    assert report["succeeded"] == 2 and report["failed"] == 2
+    assert all(r["brir"] == brirs[0]["path"] for r in report["renders"] if r["status"] == "error")
+
+
+def test_render_batch_rejects_colliding_outputs(tmp_path):
+    brirs = [{"path": _write_hrir(tmp_path / "alice" / "hrir.wav", 0)}]
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    inputs = [_write_programme(tmp_path / d / "prog.wav", i) for i, d in enumerate("ab")]
+    with pytest.raises(ValueError, match="prog__alice.wav"):
+        render_batch(inputs, brirs, str(tmp_path / "out"), processes=1)
+    brirs.append({"path": _write_hrir(tmp_path / "other" / "hrir.wav", 1), "name": "alice"})
+    with pytest.raises(ValueError):
+        render_batch(inputs[:1], brirs, str(tmp_path / "out"), processes=1)
+    assert not (tmp_path / "out").exists()
+
+
+def test_batch_cli_writes_report(tmp_path, monkeypatch):
+    _write_hrir(tmp_path / "alice" / "hrir.wav", 0)
+    _write_programme(tmp_path / "prog.wav", 1)
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps({"inputs": ["prog.wav"], "brirs": ["alice/hrir.wav"], "output_dir": "out"}))
+    assert load_manifest(str(manifest))["output_dir"] == str(tmp_path / "out")
+
+    monkeypatch.setattr("sys.argv", ["batch_render.py", str(manifest), "--processes", "2"])
+    main()
+    report = json.loads((tmp_path / "out" / "batch_report.json").read_text())
+    assert report["succeeded"] == 1
+    assert (tmp_path / "out" / "prog__alice.wav").exists()
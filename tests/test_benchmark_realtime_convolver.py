@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from benchmark_realtime_convolver import benchmark_case, case_name, compare_results, main, run_suite, suite_cases
+
+
+def test_suite_case_names_are_unique():
+    names = [case_name(case) for case in suite_cases("full")]
+    assert len(names) == len(set(names))
+    assert any(name.startswith("hrir16-2000ms-b64-") for name in names)
+
+
+def test_benchmark_case_reports_block_statistics():
+    case = {"path": "brir", "angles": 4, "ir_ms": 5, "block_size": 64, "engine": "partitioned"}
+    case["interpolation"] = "switch"
+    result = benchmark_case(case, blocks=10, samplerate=8000)
+    assert result["name"] == "brir4-5ms-b64-partitioned-switch"
+    assert 0 < result["mean_ms"] <= result["max_ms"]
+    assert result["p99_ms"] <= result["max_ms"]
+    assert result["rtf"] == result["mean_ms"] / 8.0
+
+
+def test_compare_flags_regressions_only():
+    case = {"path": "hrir", "speakers": 2, "ir_ms": 5, "block_size": 64, "engine": "fft"}
+    current = json.loads(json.dumps(run_suite([case], blocks=5, samplerate=8000)))
+    name = current["results"][0]["name"]
+    faster = {"results": [dict(current["results"][0], mean_ms=1e9, p99_ms=1e9)]}
+    slower = {"results": [dict(current["results"][0], mean_ms=1e-9, p99_ms=1e-9)]}
+    assert compare_results(current, faster) == []
+    assert [line.split(":")[0] for line in compare_results(current, slower)] == [name, name]
+    with pytest.raises(ValueError, match="missing from the baseline"):
+        compare_results(current, {"results": []})
+    with pytest.raises(ValueError, match="missing from this run"):
+        compare_results(current, {"results": faster["results"] + [dict(faster["results"][0], name="other")]})
+    with pytest.raises(ValueError, match="No cases"):
+        compare_results({"results": []}, faster)
+
+
+def test_cli_rejects_json_and_compare_without_suite(monkeypatch, tmp_path):
+    for option in ("--json", "--compare"):
+        monkeypatch.setattr("sys.argv", ["benchmark_realtime_convolver.py", option, str(tmp_path / "results.json")])
+        with pytest.raises(SystemExit) as e:
+            main()
+        assert e.value.code == 2
+
+
+@pytest.mark.parametrize(
+    "options",
+    [["--suite", "quick", "--engine", "partitioned"], ["--suite", "quick", "--speakers", "2"], ["--engine", "fast"]],
+)
+def test_cli_rejects_options_it_would_ignore(monkeypatch, options):
+    monkeypatch.setattr("sys.argv", ["benchmark_realtime_convolver.py", *options])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 2
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from brir_bundle import FORMAT_VERSION, MAGIC, BRIRBundle, load_bundle, partition_spectra, write_bundle
+from realtime_convolution import RealTimeConvolver
+from conftest import random_hrir
+
+
+def _random_brirs(length=900):
+    rng = np.random.default_rng(4)
+    return {
+        angle: (rng.standard_normal(length), rng.standard_normal(length - 100))
+        for angle in [(0.0, 0.0, 0.0), (90.0, 0.0, 0.0), (180.0, 10.0, 0.0)]
+    }
+
+
+def test_partition_spectra_layout():
+    irs = np.random.default_rng(0).standard_normal((3, 2, 300))
+    spectra = partition_spectra(irs, 128)
+    assert spectra.shape == (3, 3, 2, 129)
+    padded = np.zeros(256)
+    padded[:44] = irs[1, 0, 256:]
+    np.testing.assert_allclose(spectra[1, 2, 0], np.fft.rfft(padded))
+
+
+def test_hrir_bundle_round_trip(tmp_path):
+    hrir = random_hrir(["FL", "FR", "FC"], 700, seed=3)
+    file_path = str(tmp_path / "hrir.brir")
+    write_bundle(file_path, hrir, partition_size=256)
+    bundle = load_bundle(file_path)
+    assert bundle.kind == "hrir"
+    assert bundle.speakers == ["FL", "FR", "FC"]
+    assert bundle.fs == 48000 and bundle.partition_size == 256
+    assert isinstance(bundle.irs, np.memmap) and bundle.irs.dtype == np.float32
+    assert bundle.spectra.dtype == np.complex64 and bundle.spectra.shape == (2, 3, 3, 257)
+    np.testing.assert_allclose(bundle.irs[2, 1], hrir.irs["FC"]["right"].data, atol=1e-6)
+
+
+def test_brir_bundle_round_trip(tmp_path):
+    brirs = _random_brirs()
+    file_path = str(tmp_path / "brirs.brir")
+    write_bundle(file_path, brirs, fs=44100, partition_size=512)
+    bundle = load_bundle(file_path, mmap=False)
+    assert bundle.kind == "brir"
+    assert bundle.angles == list(brirs.keys())
+    loaded = bundle.brirs()
+    np.testing.assert_allclose(loaded[(90.0, 0.0, 0.0)][0], brirs[(90.0, 0.0, 0.0)][0], atol=1e-6)
+    with pytest.raises(ValueError):
+        BRIRBundle(48000, bundle.irs, bundle.spectra, 512)
+
+
+def test_load_rejects_foreign_and_newer_files(tmp_path):
+    foreign = tmp_path / "foreign.brir"
+    foreign.write_bytes(b"RIFF" + bytes(100))
+    with pytest.raises(ValueError):
+        load_bundle(str(foreign))
+    newer = tmp_path / "newer.brir"
+    write_bundle(str(newer), _random_brirs(), fs=48000, partition_size=256)
+    data = bytearray(newer.read_bytes())
+    data[len(MAGIC) : len(MAGIC) + 4] = (FORMAT_VERSION + 1).to_bytes(4, "little")
+    newer.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="version"):
+        load_bundle(str(newer))
+
+
+@pytest.mark.parametrize("engine", ["partitioned", "nonuniform", "fft"])
+def test_convolver_from_hrir_bundle_matches_hrir(tmp_path, engine):
+    hrir = random_hrir(["FL", "FR", "FC"], 700, seed=3)
+    file_path = str(tmp_path / "hrir.brir")
+    write_bundle(file_path, hrir, partition_size=128)
+    reference = RealTimeConvolver(hrir, block_size=128, engine=engine, max_partition=256)
+    convolver = RealTimeConvolver(load_bundle(file_path), block_size=128, engine=engine, max_partition=256)
+    assert convolver.speakers == reference.speakers
+    rng = np.random.default_rng(5)
+    for _ in range(10):
+        block = rng.standard_normal((3, 128))
+        np.testing.assert_allclose(convolver.process_block(block), reference.process_block(block), atol=1e-4)
+    convolver.close()
+    reference.close()
+
+
+def test_convolver_uses_bundle_spectra(tmp_path):
+    file_path = str(tmp_path / "brirs.brir")
+    brirs = _random_brirs()
+    write_bundle(file_path, brirs, fs=48000, partition_size=128)
+    bundle = load_bundle(file_path)
+    convolver = RealTimeConvolver(bundle, block_size=128, engine="partitioned")
+    reference = RealTimeConvolver(brirs, samplerate=48000, block_size=128, engine="partitioned")
+    assert convolver.fs == 48000
+    assert convolver._bundle_spectra(128, 0, 2) is not None
+    assert convolver._bundle_spectra(256, 0, 2) is None
+    rng = np.random.default_rng(6)
+    for yaw in (0.0, 90.0, 180.0):
+        convolver.set_orientation(yaw, 0.0, 0.0)
+        reference.set_orientation(yaw, 0.0, 0.0)
+        block = rng.standard_normal((2, 128))
+        np.testing.assert_allclose(convolver.process_block(block), reference.process_block(block), atol=1e-4)
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from brir_bundle import load_bundle
+from brir_grid import dense_grid, fractional_shift, minimum_phase, onset_delay
+from realtime_convolution import RealTimeConvolver
+
+LENGTH = 1500
+
+
+def _brir(left_delay, right_delay, seed=0):
+    """Impulses at the given delays followed by a shared diffuse tail."""
+    rng = np.random.default_rng(seed)
+    tail = rng.standard_normal(LENGTH) * np.exp(-np.arange(LENGTH) / 300)
+    tail[:300] = 0.0
+    impulse = np.zeros(LENGTH)
+    impulse[0] = 1.0
+    return (
+        fractional_shift(impulse, left_delay, LENGTH) + tail,
+        0.5 * fractional_shift(impulse, right_delay, LENGTH) + tail,
+    )
+
+
+def _direct_spectrum(ir):
+    return np.abs(np.fft.rfft(ir[:200], 1024))
+
+
+def test_fractional_shift_and_minimum_phase():
+    x = np.random.default_rng(1).standard_normal(100)
+    np.testing.assert_allclose(fractional_shift(x, 12, 120)[12:112], x, atol=1e-9)
+    np.testing.assert_allclose(fractional_shift(x, -12, 88), x[12:], atol=1e-9)
+    # Fractional delays of a smooth signal
+    n = np.arange(200)
+    smooth = np.hanning(100) * np.sin(0.2 * n[:100])
+    expected = np.interp(n - 7.5, n[:100], smooth, left=0.0, right=0.0)
+    np.testing.assert_allclose(fractional_shift(smooth, 7.5, 200), expected, atol=0.01)
+    assert onset_delay(fractional_shift(np.eye(1, 100)[0], 12, 100)) == 12
+    ir = minimum_phase(np.log(_direct_spectrum(x[:50]) + 0.1), 1024)
+    np.testing.assert_allclose(np.abs(np.fft.rfft(ir)), _direct_spectrum(x[:50]) + 0.1, rtol=1e-6)
+    # Minimum phase packs the energy towards the start
+    assert np.sum(ir[:10] ** 2) > 0.5 * np.sum(ir**2)
+
+
+def test_dense_grid_interpolates_delays_without_comb_filtering():
+    brirs = {0.0: _brir(40, 40), 30.0: _brir(30, 52), 180.0: _brir(40, 40), 270.0: _brir(60, 20)}
+    grid = dense_grid(brirs, 48000, yaw_step=5.0)
+    assert list(grid)[:3] == [0.0, 5.0, 10.0] and len(grid) == 72
+    # Measured orientations are reproduced
+    for angle in (0.0, 30.0):
+        np.testing.assert_allclose(grid[angle][0], brirs[angle][0], atol=1e-9)
+        np.testing.assert_allclose(grid[angle][1], brirs[angle][1], atol=1e-9)
+    # Half way the delays are averaged and the direct sound stays flat, a spectral blend has a deep notch
+    left, right = grid[15.0]
+    assert (onset_delay(left), onset_delay(right)) == (35, 46)
+    spectrum = _direct_spectrum(left)
+    assert 20 * np.log10(spectrum.max() / spectrum.min()) < 0.1
+    blend = _direct_spectrum(0.5 * (brirs[0.0][0] + brirs[30.0][0]))
+    assert 20 * np.log10(blend.max() / blend.min()) > 20
+    # The diffuse tail is untouched
+    np.testing.assert_allclose(left[400:], brirs[0.0][0][400:], atol=1e-9)
+
+
+def test_dense_grid_with_pitch(tmp_path):
+    brirs = {(yaw, pitch, 0.0): _brir(40 + yaw / 10, 40 - yaw / 10) for yaw in (0.0, 90.0) for pitch in (0.0, 20.0)}
+    grid = dense_grid(brirs, 48000, yaw_step=45.0, pitch_step=10.0)
+    assert set(grid) == {
+        (yaw, pitch, 0.0) for yaw in (0.0, 45.0, 90.0, 135.0, 180.0, 225.0, 270.0, 315.0) for pitch in (0.0, 10.0, 20.0)
+    }
+    np.testing.assert_allclose(grid[(90.0, 20.0, 0.0)][0], brirs[(90.0, 20.0, 0.0)][0], atol=1e-9)
+    with pytest.raises(ValueError):
+        dense_grid(brirs, 48000, yaw_step=0.0)
+
+
+def test_grid_bundle_plays_with_switching(tmp_path, monkeypatch):
+    import sys
+
+    import brir_grid
+
+    source = tmp_path / "brirs"
+    source.mkdir()
+    for angle in (0.0, 90.0, 180.0, 270.0):
+        left, right = _brir(40, 40 + angle / 10)
+        np.savez(source / f"{angle}.npz", left=left, right=right)
+    output = tmp_path / "grid.brir"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["brir_grid", str(source), str(output), "--fs", "48000", "--yaw_step", "10", "--partition_size", "64"],
+    )
+    brir_grid.main()
+    bundle = load_bundle(str(output))
+    assert len(bundle.angles) == 36
+    convolver = RealTimeConvolver(bundle, block_size=64, engine="partitioned", interpolation="switch")
+    convolver.set_orientation(47.0)
+    assert convolver.process_block(np.random.default_rng(2).standard_normal((2, 64))).shape == (2, 64)
+    assert convolver._nearest_angle() == bundle.angles.index(50.0)
@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+import pytest
+from fft_backend import FFTTuner, RealFFT, available_backends, candidate_sizes
+from realtime_convolution import RealTimeConvolver
+from conftest import random_hrir
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_real_fft_backends_match_numpy(backend):
+    transform = RealFFT(3, 120, backend)
+    x = np.random.default_rng(0).standard_normal((3, 120))
+    transform.time[...] = x
+    transform.forward()
+    np.testing.assert_allclose(transform.freq, np.fft.rfft(x, axis=-1), atol=1e-9)
+    transform.inverse()
+    np.testing.assert_allclose(transform.time, x, atol=1e-12)
+
+
+def test_real_fft_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        RealFFT(1, 16, "cufft")
+
+
+def test_candidate_sizes_include_power_of_two_and_fast_length():
+    sizes = candidate_sizes(1025)
+    assert 2048 in sizes
+    assert min(sizes) < 2048
+    assert all(n >= 1025 for n in sizes)
+
+
+def test_tuner_reuses_cached_decision(tmp_path):
+    file_path = tmp_path / "tuning.json"
+    tuner = FFTTuner(str(file_path), repeats=2)
+    backend, n = tuner.select(2, 1025)
+    assert backend in available_backends() and n in candidate_sizes(1025)
+    assert tuner.measurements == len(available_backends()) * len(candidate_sizes(1025))
+    assert json.loads(file_path.read_text())["plans"]
+
+    cached = FFTTuner(str(file_path), repeats=2)
+    assert cached.select(2, 1025) == (backend, n)
+    assert cached.measurements == 0
+
+
+def test_tuner_ignores_corrupt_cache(tmp_path):
+    file_path = tmp_path / "tuning.json"
+    file_path.write_text("{not json")
+    tuner = FFTTuner(str(file_path), backends=["numpy"], repeats=1)
+    assert tuner.select(1, 64, [64]) == ("numpy", 64)
+
+
+def test_convolver_autotunes_fft_size(tmp_path):
+    hrir = random_hrir(["FL", "FR"], 900, seed=1)
+    rng = np.random.default_rng(2)
+    reference = RealTimeConvolver(hrir, block_size=128)
+    tuned = RealTimeConvolver(hrir, block_size=128, fft_backend="auto", tuning_file=str(tmp_path / "t.json"))
+    assert tuned.fft_size in candidate_sizes(128 + 900 - 1)
+    assert tuned.fft_backend in available_backends()
+    for _ in range(12):
+        block = rng.standard_normal((2, 128))
+        np.testing.assert_allclose(tuned.process_block(block), reference.process_block(block), atol=1e-9)
+
+
+def test_convolver_rejects_unknown_fft_backend():
+    with pytest.raises(ValueError):
+        RealTimeConvolver({0.0: (np.ones(4), np.ones(4))}, samplerate=48000, fft_backend="cufft")
@@ -1,7 +1,10 @@
 import time
+
+import numpy as np
 from pythonosc.udp_client import SimpleUDPClient
 
-from tracking import HeadTracker
+from ambisonics import head_rotation
+from tracking import MAX_PREDICTION, HeadTracker, load_calibration, quaternion_to_ypr
 
 
 def test_head_tracker_updates_orientation():
@@ -17,4 +20,73 @@ def test_head_tracker_updates_orientation():
     assert abs(tracker.yaw() - 42.0) < 1e-3
     assert abs(tracker.pitch() + 5.0) < 1e-3
     assert abs(tracker.roll() - 3.0) < 1e-3
-    tracker.stop()
\ No newline at end of file
+    tracker.stop()
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+
+
+def test_head_tracker_atomic_pose_updates(tmp_path):
+    calibration = tmp_path / "calibration.json"
+    calibration.write_text('{"yaw_offset": 10.0, "pitch_offset": -2.0, "roll_offset": 0.0}')
+    tracker = HeadTracker(port=10001, calibration_file=str(calibration))
+    tracker.start()
+    try:
+        client = SimpleUDPClient("127.0.0.1", 10001)
+        before = time.perf_counter()
+        client.send_message("/ypr", [40.0, 3.0, -1.0])
+        _wait_for(lambda: tracker.stats()["updates"] == 1)
+        pose = tracker.pose()
+        assert (pose.yaw, pose.pitch, pose.roll) == (30.0, 5.0, -1.0)
+        assert before <= pose.timestamp <= time.perf_counter()
+
+        # Head turned 90 degrees to the left
+        client.send_message("/quat", [np.cos(np.pi / 4), 0.0, 0.0, np.sin(np.pi / 4)])
+        _wait_for(lambda: tracker.stats()["updates"] == 2)
+        np.testing.assert_allclose(tracker.pose()[:3], (80.0, 2.0, 0.0), atol=1e-4)
+    finally:
+        tracker.stop()
+
+
+def test_quaternion_to_ypr_matches_head_rotation():
+    from scipy.spatial.transform import Rotation
+
+    for yaw, pitch, roll in [(30.0, 0.0, 0.0), (-120.0, 25.0, 10.0), (75.0, -40.0, -60.0)]:
+        x, y, z, w = Rotation.from_matrix(head_rotation(yaw, pitch, roll)).as_quat()
+        np.testing.assert_allclose(quaternion_to_ypr(w, x, y, z), (yaw, pitch, roll), atol=1e-9)
+
+
+def test_head_tracker_predicts_with_velocity():
+    tracker = HeadTracker(port=10002, calibration_file=None, prediction=0.02, smoothing=1.0)
+    try:
+        now = time.perf_counter()
+        tracker.update(170.0, 0.0, 0.0, timestamp=now - 0.02)
+        tracker.update(179.0, 1.0, 0.0, timestamp=now - 0.01)
+        # 900 degrees per second for the 10 ms since the update and the 20 ms of output latency, wrapped around
+        yaw, pitch, _ = tracker.orientation()
+        assert abs(yaw - (179.0 + 27.0 - 360.0)) < 1.0 and abs(pitch - 4.0) < 0.1
+        assert tracker.orientation(prediction=0.0)[0] < yaw
+        # Predictions stop MAX_PREDICTION after the last update
+        tracker.update(0.0, 0.0, 0.0, timestamp=now - 1.0 - 0.01)
+        tracker.update(1.0, 0.0, 0.0, timestamp=now - 1.0)
+        np.testing.assert_allclose(tracker.orientation(), (1.0 + 100.0 * MAX_PREDICTION, 0.0, 0.0), atol=1e-6)
+        # Single angle messages do not predict
+        tracker._on_axis("/yaw", [0], 20.0)
+        assert tracker.orientation()[0] == 20.0
+        stats = tracker.stats()
+        assert stats["updates"] == 5 and stats["prediction"] == 0.02
+        assert stats["pose_age"]["max"] >= 1.0 and stats["end_to_end"] > stats["pose_age"]["mean"]
+    finally:
+        tracker.stop()
+
+
+def test_head_tracker_calibrates_to_current_pose():
+    tracker = HeadTracker(port=10003, calibration_file=None)
+    tracker.update(25.0, 5.0, 0.0)
+    tracker.calibrate()
+    tracker.update(35.0, 5.0, 0.0)
+    assert tracker.pose()[:3] == (10.0, 0.0, 0.0)
+    assert load_calibration("/nonexistent.json") == (0.0, 0.0, 0.0)
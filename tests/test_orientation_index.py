@@ -0,0 +1,22 @@
+import numpy as np
+
+from orientation_index import OrientationIndex
+
+
+def test_orientation_index_finds_nearest_yaw_angles():
+    rng = np.random.default_rng(4)
+    angles = list(rng.uniform(0, 360, 200))
+    index = OrientationIndex(angles, k=3)
+    for yaw in (0.0, 1.5, 180.0, 359.9, -20.0):
+        indices, weights = index.query(yaw)
+        expected = np.argsort(index.distances(yaw))[:3]
+        assert set(indices) == set(expected)
+        assert abs(weights.sum() - 1.0) < 1e-12
+
+
+def test_orientation_index_wraps_yaw_of_orientation_tuples():
+    angles = [(350.0, 0.0, 0.0), (20.0, 0.0, 0.0), (180.0, 0.0, 0.0), (0.0, 60.0, 0.0)]
+    index = OrientationIndex(angles, k=2)
+    indices, weights = index.query(0.0)
+    assert list(indices) == [0, 1]
+    np.testing.assert_allclose(weights, [2 / 3, 1 / 3])
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from playback_daemon import NullAudioBackend, PlaybackDaemon, PlaybackService, read_irs
+from realtime_convolution import OutputMeter
+
+
+def _write_brirs(path, gain):
+    path.mkdir()
+    for yaw in (0.0, 90.0):
+        np.savez(path / f"{yaw}.npz", left=np.array([gain, 0.0]), right=np.array([gain / 2, 0.0]))
+    return str(path)
+
+
+class _Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.events = []
+        self._id = 0
+
+    async def request(self, command, **params):
+        self._id += 1
+        self.writer.write(json.dumps({"id": self._id, "command": command, **params}).encode() + b"\n")
+        await self.writer.drain()
+        while True:
+            message = json.loads(await asyncio.wait_for(self.reader.readline(), 5))
+            if "event" in message:
+                self.events.append(message)
+                continue
+            assert message["id"] == self._id
+            return message
+
+    async def event(self):
+        if self.events:
+            return self.events.pop(0)
+        return json.loads(await asyncio.wait_for(self.reader.readline(), 5))
+
+
+async def _wait_for(condition, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not await condition():
+        assert loop.time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_read_irs_picks_engine(tmp_path):
+    brirs, engine = read_irs(_write_brirs(tmp_path / "brirs", 1.0))
+    assert set(brirs) == {0.0, 90.0} and engine == "fft"
+    os.mkdir(tmp_path / "empty")
+    with pytest.raises(ValueError):
+        read_irs(str(tmp_path / "empty"))
+
+
+def test_daemon_plays_swaps_and_meters_over_tcp(tmp_path):
+    first = _write_brirs(tmp_path / "first", 0.5)
+    second = _write_brirs(tmp_path / "second", 0.25)
+    backend = NullAudioBackend(signal=np.ones(64))
+
+    async def scenario():
+        daemon = PlaybackDaemon(PlaybackService(backend), port=0)
+        await daemon.start()
+        serving = asyncio.create_task(daemon.serve())
+        client = _Client(*await asyncio.open_connection(daemon.host, daemon.port))
+
+        assert (await client.request("start"))["error"]
+        assert "Unknown command" in (await client.request("rewind"))["error"]
+        loaded = await client.request("load", path=first, block_size=32, samplerate=48000)
+        assert loaded["result"] == {"speakers": 2, "samplerate": 48000, "block_size": 32, "swapped": False}
+        assert (await client.request("orientation", yaw=45.0))["result"]["orientation"] == [45.0, 0.0, 0.0]
+        assert (await client.request("start"))["result"] == {"playing": True}
+
+        async def processed():
+            return (await client.request("stats"))["result"]["blocks"] > 5
+
+        await _wait_for(processed)
+        # Constant input through single tap BRIRs
+        assert (await client.request("subscribe", interval=0.01))["result"] == {"subscribed": True}
+        meters = await client.event()
+        assert meters["event"] == "meters"
+        assert meters["peak_db"] == pytest.approx(20 * np.log10([0.5, 0.25]), abs=0.01)
+
+        # Loading while playing crossfades into the new BRIRs without stopping the stream
+        swapped = await client.request("load", path=second, crossfade=0.001)
+        assert swapped["result"]["swapped"] is True
+        stats = (await client.request("stats"))["result"]
+        assert stats["playing"] and stats["swaps"] == 1 and stats["path"] == second
+        await client.request("unsubscribe")
+
+        assert (await client.request("stop"))["result"] == {"playing": False}
+        blocks = backend.blocks
+        await asyncio.sleep(0.02)
+        assert backend.blocks == blocks
+        assert (await client.request("shutdown"))["result"] == {"shutdown": True}
+        await asyncio.wait_for(serving, 5)
+        client.writer.close()
+        assert daemon.service.convolver is None
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix sockets are not available")
+def test_daemon_listens_on_unix_socket(tmp_path):
+    socket_path = str(tmp_path / "playback.sock")
+
+    async def scenario():
+        daemon = PlaybackDaemon(PlaybackService(NullAudioBackend()), socket_path=socket_path)
+        await daemon.start()
+        serving = asyncio.create_task(daemon.serve())
+        client = _Client(*await asyncio.open_unix_connection(socket_path))
+        assert (await client.request("ping"))["result"] == {"playing": False, "path": None}
+        client.writer.write(b"not json\n")
+        assert json.loads(await client.reader.readline())["error"]
+        assert (await client.request("meters"))["result"] is None
+        await client.request("shutdown")
+        await asyncio.wait_for(serving, 5)
+        client.writer.close()
+
+    asyncio.run(scenario())
+    assert not os.path.exists(socket_path)
+
+
+def test_output_meter_holds_peaks_and_averages_rms():
+    meter = OutputMeter(0.01)
+    assert meter.levels() == {"peak_db": [-120.0, -120.0], "rms_db": [-120.0, -120.0], "clips": 0}
+    block = np.zeros((2, 100))
+    block[0, 10] = -1.0
+    block[1] = 0.1
+    meter.record(block)
+    levels = meter.levels()
+    assert levels["peak_db"] == pytest.approx([0.0, -20.0])
+    assert levels["clips"] == 1
+    for _ in range(300):
+        meter.record(block * 0.0 + [[0.0], [0.1]])
+    levels = meter.levels()
+    # The held peak falls by 20 dB per second, the RMS settles on the signal's level
+    assert levels["peak_db"][0] == pytest.approx(-60.0)
+    assert levels["rms_db"][1] == pytest.approx(-20.0, abs=0.01)
@@ -1,7 +1,24 @@
+import gc
+import json
+import threading
+import time
+import tracemalloc
+
 import numpy as np
-from realtime_convolution import RealTimeConvolver
-from impulse_response import ImpulseResponse
-from hrir import HRIR
+import pytest
+import scipy.signal
+import realtime_convolution
+from fft_backend import INPLACE_FFT
+from orientation_index import circular_distance
+from realtime_convolution import (
+    RealTimeConvolver,
+    _DecoupledStream,
+    _Reblocker,
+    _RingBuffer,
+    multirate_factor,
+    nonuniform_layout,
+)
+from conftest import random_hrir
 
 
 def test_convolver_interpolates_between_angles():
@@ -55,10 +72,777 @@ def test_convolver_wraps_yaw_angles():
     block[1, 0] = 1.0
     out = engine.process_block(block)
 
-    d0 = engine._angular_distance(0.0, 350.0)
-    d1 = engine._angular_distance(90.0, 350.0)
+    d0 = circular_distance(0.0, 350.0)
+    d1 = circular_distance(90.0, 350.0)
     inv = np.array([1 / d0, 1 / d1])
     weights = inv / inv.sum()
 
     assert abs(out[0, 0] - weights[0]) < 1e-6
-    assert abs(out[1, 0] - weights[1]) < 1e-6
\ No newline at end of file
+    assert abs(out[1, 0] - weights[1]) < 1e-6
+
+
+def test_partitioned_engine_matches_fft_engine_hrir():
+    hrir = random_hrir(["FL", "FR", "FC"], ir_length=1000)
+    reference = RealTimeConvolver(hrir, block_size=128)
+    partitioned = RealTimeConvolver(hrir, block_size=128, engine="partitioned")
+    assert partitioned.n_partitions == 8
+    assert partitioned.fft_size == 256
+
+    rng = np.random.default_rng(1)
+    for _ in range(12):
+        block = rng.standard_normal((3, 128))
+        np.testing.assert_allclose(partitioned.process_block(block), reference.process_block(block), atol=1e-9)
+
+
+def test_partitioned_engine_matches_fft_engine_brirs():
+    rng = np.random.default_rng(2)
+    brirs = {a: (rng.standard_normal(300), rng.standard_normal(250)) for a in (0.0, 90.0, 180.0)}
+    reference = RealTimeConvolver(brirs, samplerate=48000, block_size=64)
+    partitioned = RealTimeConvolver(brirs, samplerate=48000, block_size=64, engine="partitioned")
+    for engine in (reference, partitioned):
+        engine.set_orientation(30.0)
+
+    for _ in range(10):
+        block = rng.standard_normal((2, 64))
+        np.testing.assert_allclose(partitioned.process_block(block), reference.process_block(block), atol=1e-9)
+
+
+def test_convolver_rejects_unknown_engine():
+    with pytest.raises(ValueError):
+        RealTimeConvolver({0.0: (np.ones(1), np.ones(1))}, samplerate=48000, engine="gpu")
+
+
+def test_nonuniform_layout_covers_impulse_response():
+    layout = nonuniform_layout(ir_length=10000, block_size=64, max_partition=512)
+    assert layout[0] == (64, 0, 4)
+    assert [size for size, _, _ in layout] == [64, 128, 256, 512]
+    for size, offset, _ in layout[1:]:
+        assert offset >= 2 * size
+    size, offset, count = layout[-1]
+    assert offset + size * count >= 10000
+
+
+def test_nonuniform_engine_matches_fft_engine():
+    hrir = random_hrir(["FL", "FR"], ir_length=3000)
+    reference = RealTimeConvolver(hrir, block_size=32)
+    nonuniform = RealTimeConvolver(hrir, block_size=32, engine="nonuniform", max_partition=256)
+    try:
+        rng = np.random.default_rng(3)
+        for _ in range(150):
+            block = rng.standard_normal((2, 32))
+            np.testing.assert_allclose(nonuniform.process_block(block), reference.process_block(block), atol=1e-9)
+    finally:
+        nonuniform.close()
+
+
+def _transform_temporaries(convolver):
+    """Return the bytes FFT backends without an ``out`` argument allocate at most at once while a block is processed.
+
+    Such a transform copies its input and allocates its result before the result is copied into the workspace. One
+    transform runs on the audio thread at a time, and one more on the background worker of the tail segments.
+    """
+
+    def largest(transforms):
+        return max((t.freq.nbytes + t.time.nbytes for t in transforms), default=0)
+
+    if convolver.engine == "fft":
+        return largest([convolver._in_fft, convolver._out_fft])
+    head = largest([convolver._head._in_fft, convolver._head._out_fft])
+    return head + largest([t for seg in convolver._tail for t in (seg._in_fft, seg._out_fft)])
+
+
+def _finish_tail_jobs(convolver):
+    for job in getattr(convolver, "_tail_pending", []):
+        job.wait()
+
+
+@pytest.mark.parametrize("engine", ["fft", "partitioned", "nonuniform"])
+@pytest.mark.parametrize("workers", [1, 3])
+@pytest.mark.parametrize("silent", [False, True])
+def test_process_block_reuses_workspace(engine, workers, silent):
+    hrir = random_hrir(["FL", "FR", "FC"], ir_length=2000)
+    convolver = RealTimeConvolver(hrir, block_size=256, engine=engine, workers=workers, max_partition=512)
+    block = np.ones((3, 256))
+    if silent:
+        block[1] = 0.0
+    out = np.empty((2, 256))
+    convolver.process_block(block, out=out)
+
+    # Only count allocations made on behalf of the convolver, not by other threads
+    own = [tracemalloc.Filter(True, realtime_convolution.__file__, all_frames=True)]
+    tracemalloc.start(25)
+    try:
+        gc.collect()
+        # Snapshots are taken while the background worker of the tail segments is idle
+        _finish_tail_jobs(convolver)
+        before = tracemalloc.take_snapshot().filter_traces(own)
+        convolver.process_block(block, out=out)
+        peak = 0
+        # Long enough for the tail jobs of the non-uniform engine to be reused
+        for _ in range(20):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            assert convolver.process_block(block, out=out) is out
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        # Drop interpreter free lists so that only arrays still alive are counted
+        gc.collect()
+        _finish_tail_jobs(convolver)
+        after = tracemalloc.take_snapshot().filter_traces(own)
+    finally:
+        tracemalloc.stop()
+
+    # Smaller than any array of a single block, waking worker threads allocates a few small lock objects
+    limit = 4096 + 2048 * (workers - 1)
+    if not INPLACE_FFT:
+        # Without pyFFTW or numpy >= 2.0 the transforms are not in place, everything else still must not allocate
+        limit += _transform_temporaries(convolver)
+    # Waiting for tail jobs allocates lock objects and each job keeps its output offset as an int object, which
+    # stays well below an output block
+    retained = 1024 if engine != "nonuniform" else out.nbytes
+    convolver.close()
+    assert sum(stat.size_diff for stat in after.compare_to(before, "filename")) < retained
+    assert peak < limit
+
+
+def test_fft_engine_stacks_speaker_spectra():
+    hrir = random_hrir(["FL", "FR", "FC", "LFE"], ir_length=100)
+    convolver = RealTimeConvolver(hrir, block_size=64)
+    assert convolver.ir_fft.shape == (2, 4, convolver.fft_size // 2 + 1)
+
+    block = np.zeros((4, 64))
+    block[2, 0] = 1.0
+    out = convolver.process_block(block)
+    np.testing.assert_allclose(out[0], hrir.irs["FC"]["left"].data[:64], atol=1e-12)
+    np.testing.assert_allclose(out[1], hrir.irs["FC"]["right"].data[:64], atol=1e-12)
+
+
+def test_convolver_interpolates_nearest_neighbours_only():
+    rng = np.random.default_rng(5)
+    brirs = {float(a): (rng.standard_normal(32), rng.standard_normal(32)) for a in range(0, 360, 10)}
+    nearest = {a: brirs[a] for a in (40.0, 50.0)}
+    for engine in ("fft", "partitioned"):
+        knn = RealTimeConvolver(brirs, samplerate=48000, block_size=16, engine=engine, neighbours=2)
+        reference = RealTimeConvolver(nearest, samplerate=48000, block_size=16, engine=engine)
+        for convolver in (knn, reference):
+            convolver.set_orientation(43.0)
+        for _ in range(4):
+            block = rng.standard_normal((2, 16))
+            np.testing.assert_allclose(knn.process_block(block), reference.process_block(block), atol=1e-12)
+
+
+def test_convolver_reuses_neighbours_while_orientation_is_unchanged():
+    brirs = {0.0: (np.ones(4), np.ones(4)), 90.0: (np.zeros(4), np.zeros(4)), 180.0: (np.ones(4), np.zeros(4))}
+    convolver = RealTimeConvolver(brirs, samplerate=48000, block_size=4, neighbours=2)
+    convolver.set_orientation(30.0)
+    first = convolver._neighbours()
+    assert convolver._neighbours() is first
+    convolver.set_orientation(60.0)
+    assert convolver._neighbours() is not first
+
+
+def test_convolver_reads_orientation_source_once_per_block():
+    class Source:
+        reads = 0
+
+        def orientation(self):
+            Source.reads += 1
+            return (30.0, 0.0, 0.0) if Source.reads < 3 else (60.0, 5.0, 0.0)
+
+    brirs = {0.0: (np.ones(4), np.ones(4)), 90.0: (np.zeros(4), np.zeros(4))}
+    convolver = RealTimeConvolver(brirs, samplerate=48000, block_size=4, orientation_source=Source())
+    for _ in range(4):
+        convolver.process_block(np.ones((2, 4)))
+    assert Source.reads == 4
+    assert convolver._orientation == (60.0, 5.0, 0.0)
+    # Only changed poses count as orientation updates
+    assert convolver.stats()["orientation_updates"] == 2
+
+
+def test_convolver_smooths_orientation_at_block_rate():
+    brirs = {0.0: (np.ones(4), np.ones(4)), 90.0: (np.zeros(4), np.zeros(4))}
+    fs, b, tau = 48000, 480, 0.05
+    convolver = RealTimeConvolver(brirs, samplerate=fs, block_size=b, orientation_smoothing=tau)
+    convolver.set_orientation(170.0)
+    convolver.process_block(np.ones((2, b)))
+    convolver.set_orientation(-170.0)
+    assert convolver._orientation[0] == pytest.approx(170.0 * (1 - np.exp(-b / fs / tau)))
+    yaws = []
+    for _ in range(100):
+        convolver.process_block(np.ones((2, b)))
+        yaws.append(convolver._orientation[0])
+    # The yaw takes the short way across +-180 degrees and settles exactly on the target
+    assert all(abs(yaw) >= 10.0 for yaw in yaws)
+    assert convolver._orientation == (-170.0, 0.0, 0.0)
+
+
+@pytest.mark.parametrize("engine", ["fft", "partitioned"])
+def test_switching_uses_nearest_orientation(engine):
+    rng = np.random.default_rng(6)
+    brirs = {float(a): (rng.standard_normal(40), rng.standard_normal(40)) for a in range(0, 360, 30)}
+    switching = RealTimeConvolver(brirs, samplerate=48000, block_size=16, engine=engine, interpolation="switch")
+    nearest = RealTimeConvolver({60.0: brirs[60.0]}, samplerate=48000, block_size=16, engine=engine)
+    switching.set_orientation(65.0)
+    for _ in range(5):
+        block = rng.standard_normal((2, 16))
+        np.testing.assert_allclose(switching.process_block(block), nearest.process_block(block), atol=1e-12)
+    assert switching.switches == 0
+
+
+def test_switching_crossfades_between_orientations():
+    rng = np.random.default_rng(7)
+    brirs = {a: (rng.standard_normal(50), rng.standard_normal(50)) for a in (0.0, 90.0)}
+    switching = RealTimeConvolver(brirs, samplerate=48000, block_size=16, engine="partitioned", interpolation="switch")
+    first = RealTimeConvolver({0.0: brirs[0.0]}, samplerate=48000, block_size=16, engine="partitioned")
+    second = RealTimeConvolver({90.0: brirs[90.0]}, samplerate=48000, block_size=16, engine="partitioned")
+    fade = np.sin(0.5 * np.pi * (np.arange(16) + 0.5) / 16) ** 2
+
+    for i in range(8):
+        if i == 4:
+            switching.set_orientation(80.0)
+        block = rng.standard_normal((2, 16))
+        out = switching.process_block(block)
+        a = first.process_block(block)
+        b = second.process_block(block)
+        if i < 4:
+            np.testing.assert_allclose(out, a, atol=1e-12)
+        elif i == 4:
+            np.testing.assert_allclose(out, (1 - fade) * a + fade * b, atol=1e-12)
+        else:
+            np.testing.assert_allclose(out, b, atol=1e-12)
+    assert switching.switches == 1
+
+
+def test_convolver_rejects_unknown_interpolation():
+    with pytest.raises(ValueError):
+        RealTimeConvolver({0.0: (np.ones(1), np.ones(1))}, samplerate=48000, interpolation="nearest")
+
+
+@pytest.mark.parametrize("engine", ["partitioned", "nonuniform"])
+def test_mixing_time_shares_late_tail(engine):
+    rng = np.random.default_rng(8)
+    tail = rng.standard_normal((2, 600))
+    brirs = {
+        float(a): tuple(np.concatenate([rng.standard_normal(100), tail[ear]]) for ear in range(2))
+        for a in range(0, 360, 45)
+    }
+    options = {"samplerate": 1000, "block_size": 16, "engine": engine, "max_partition": 64}
+    hybrid = RealTimeConvolver(brirs, mixing_time=0.1, **options)
+    reference = RealTimeConvolver(brirs, **options)
+    try:
+        assert 100 <= hybrid.mixing_samples <= 128
+        shared = [seg for seg in hybrid._tail if seg.shared]
+        assert shared and all(seg.ir_parts.shape[0] == 1 for seg in shared)
+        for i in range(60):
+            for convolver in (hybrid, reference):
+                convolver.set_orientation(3.0 * i)
+            block = rng.standard_normal((2, 16))
+            np.testing.assert_allclose(hybrid.process_block(block), reference.process_block(block), atol=1e-9)
+    finally:
+        hybrid.close()
+        reference.close()
+
+
+def test_mixing_time_requires_partitioned_brirs():
+    brirs = {0.0: (np.ones(8), np.ones(8))}
+    with pytest.raises(ValueError):
+        RealTimeConvolver(brirs, samplerate=48000, mixing_time=0.05)
+    with pytest.raises(ValueError):
+        RealTimeConvolver(random_hrir(["FL"], 8), engine="partitioned", mixing_time=0.05)
+
+
+@pytest.mark.parametrize("engine", ["fft", "partitioned", "nonuniform"])
+def test_worker_pool_matches_single_thread(engine):
+    hrir = random_hrir(["FL", "FR", "FC", "LFE", "BL"], ir_length=1500)
+    options = {"block_size": 64, "engine": engine, "max_partition": 256}
+    reference = RealTimeConvolver(hrir, **options)
+    threaded = RealTimeConvolver(hrir, workers=3, **options)
+    try:
+        rng = np.random.default_rng(9)
+        for _ in range(40):
+            block = rng.standard_normal((5, 64))
+            np.testing.assert_allclose(threaded.process_block(block), reference.process_block(block), atol=1e-9)
+        stats = threaded.worker_stats()
+        assert stats["workers"] == 3 and stats["calls"] == 40
+        assert len(stats["busy"]) == 3 and all(t > 0 for t in stats["busy"])
+        assert reference.worker_stats() is None
+    finally:
+        threaded.close()
+        reference.close()
+
+
+@pytest.mark.parametrize("engine", ["fft", "partitioned", "nonuniform"])
+def test_silent_channels_are_skipped_exactly(engine):
+    speakers = ["FL", "FR", "FC", "BL"]
+    hrir = random_hrir(speakers, ir_length=700, seed=11)
+    b = 64
+    n_blocks = 40
+    x = np.random.default_rng(12).standard_normal((4, n_blocks * b))
+    # Goes silent in the middle of a block while its tail keeps ringing, never plays, starts late
+    x[1, 10 * b + 17 :] = 0.0
+    x[2] = 0.0
+    x[3, : 20 * b] = 0.0
+    convolver = RealTimeConvolver(hrir, block_size=b, engine=engine, max_partition=256)
+    try:
+        out = np.concatenate([convolver.process_block(x[:, i * b : (i + 1) * b]) for i in range(n_blocks)], axis=1)
+        stats = convolver.channel_stats()
+    finally:
+        convolver.close()
+
+    expected = np.zeros((2, n_blocks * b))
+    for i, name in enumerate(speakers):
+        for ear, side in enumerate(("left", "right")):
+            expected[ear] += np.convolve(x[i], hrir.irs[name][side].data)[: n_blocks * b]
+    np.testing.assert_allclose(out, expected, atol=1e-9)
+    assert stats["skipped_transforms"] > 0 and stats["skipped_macs"] > 0
+    assert stats["skipped_transforms"] < stats["transforms"]
+
+
+@pytest.mark.parametrize("engine", ["fft", "partitioned"])
+def test_zero_speakers_are_pruned(engine):
+    hrir = random_hrir(["FL", "FC", "FR"], ir_length=300, seed=13)
+    for side in ("left", "right"):
+        hrir.irs["FC"][side].data[:] = 0.0
+    convolver = RealTimeConvolver(hrir, block_size=64, engine=engine)
+    del hrir.irs["FC"]
+    reference = RealTimeConvolver(hrir, block_size=64, engine=engine)
+    stats = convolver.stats()["channels"]
+    assert stats["inputs"] == 3 and stats["convolved"] == 2 and stats["pruned"] == ["FC"]
+    assert reference.channel_stats()["pruned"] == []
+
+    rng = np.random.default_rng(14)
+    for _ in range(10):
+        block = rng.standard_normal((3, 64))
+        np.testing.assert_allclose(convolver.process_block(block), reference.process_block(block[[0, 2]]), atol=1e-9)
+    brirs = {0.0: (np.ones(4), np.ones(4))}
+    assert RealTimeConvolver(brirs, samplerate=48000).channel_stats() is None
+
+
+def _band_limited_hrir(speakers, ir_length, cutoffs, fs=48000, seed=0):
+    """HRIR whose speakers are low-pass filtered noise with decaying envelopes, ``None`` cutoff keeps full band."""
+    hrir = random_hrir(speakers, ir_length, fs=fs, seed=seed)
+    envelope = np.exp(-np.arange(ir_length) / (0.02 * fs))
+    for name, cutoff in zip(speakers, cutoffs):
+        for side in ("left", "right"):
+            data = hrir.irs[name][side].data * envelope
+            if cutoff is not None:
+                data = scipy.signal.sosfilt(scipy.signal.butter(8, cutoff, fs=fs, output="sos"), data)
+            hrir.irs[name][side].data = data
+    return hrir
+
+
+def test_multirate_factor_follows_bandwidth():
+    rng = np.random.default_rng(15)
+    noise = rng.standard_normal(4000)
+    energy = float(np.sum(noise**2))
+    assert multirate_factor(noise, energy, -40.0) == 1
+    for cutoff, factor in ((8000, 2), (4000, 4), (100, 32)):
+        low = scipy.signal.sosfilt(scipy.signal.butter(12, cutoff, fs=48000, output="sos"), noise)
+        assert multirate_factor(low, float(np.sum(low**2)), -40.0) >= factor
+    # A quiet section passes any factor
+    assert multirate_factor(1e-4 * noise, energy, -60.0) == 32
+
+
+@pytest.mark.parametrize("engine", ["partitioned", "nonuniform"])
+def test_multirate_tail_matches_full_rate(engine):
+    speakers = ["FL", "FR", "LFE"]
+    hrir = _band_limited_hrir(speakers, 12000, [None, 6000, 120], seed=16)
+    b = 256
+    n_blocks = 80
+    x = np.random.default_rng(17).standard_normal((3, n_blocks * b))
+    x[:, 40 * b :] = 0.0
+    reference = _reference_output(hrir, x, b, engine)
+    convolver = RealTimeConvolver(hrir, block_size=b, engine=engine, multirate_time=0.02, max_partition=1024)
+    try:
+        factors = convolver.channel_stats()["multirate"]
+        out = np.concatenate([convolver.process_block(x[:, i * b : (i + 1) * b]) for i in range(n_blocks)], axis=1)
+        convolver.reset()
+        again = np.concatenate([convolver.process_block(x[:, i * b : (i + 1) * b]) for i in range(n_blocks)], axis=1)
+    finally:
+        convolver.close()
+    assert factors["FL"] == 1 and factors["FR"] >= 2 and factors["LFE"] >= 16
+    error = np.sum((out - reference) ** 2) / np.sum(reference**2)
+    assert 10 * np.log10(error) < -60
+    np.testing.assert_allclose(again, out, atol=1e-9)
+
+
+def test_multirate_requires_partitioned_hrir():
+    hrir = random_hrir(["FL"], 8)
+    with pytest.raises(ValueError):
+        RealTimeConvolver(hrir, multirate_time=0.1)
+    with pytest.raises(ValueError):
+        RealTimeConvolver(
+            {0.0: (np.ones(4), np.ones(4))}, samplerate=48000, engine="partitioned", multirate_time=0.1
+        )
+    # Impulse responses ending before the tail are left alone
+    convolver = RealTimeConvolver(hrir, block_size=16, engine="partitioned", multirate_time=0.1)
+    assert convolver.channel_stats()["multirate"] == {}
+
+
+def test_worker_pool_crossfades_switched_brirs():
+    rng = np.random.default_rng(10)
+    brirs = {a: (rng.standard_normal(200), rng.standard_normal(200)) for a in (0.0, 90.0, 180.0)}
+    options = {"samplerate": 48000, "block_size": 16, "engine": "partitioned", "interpolation": "switch"}
+    reference = RealTimeConvolver(brirs, **options)
+    threaded = RealTimeConvolver(brirs, workers=4, **options)
+    try:
+        for i in range(30):
+            for convolver in (reference, threaded):
+                convolver.set_orientation(12.0 * i)
+            block = rng.standard_normal((2, 16))
+            np.testing.assert_allclose(threaded.process_block(block), reference.process_block(block), atol=1e-9)
+        assert threaded.switches == reference.switches > 0
+    finally:
+        threaded.close()
+
+
+def test_convolver_rejects_invalid_workers():
+    with pytest.raises(ValueError):
+        RealTimeConvolver(random_hrir(["FL"], 8), workers=0)
+
+
+def test_ring_buffer_wraps_around():
+    ring = _RingBuffer(2, 10)
+    out = np.empty((2, 7))
+    for i in range(5):
+        data = np.arange(14, dtype=float).reshape(2, 7) + i
+        assert ring.write(data)
+        assert not ring.write(np.zeros((2, 4)))
+        assert ring.read(out)
+        np.testing.assert_array_equal(out, data)
+    assert not ring.read(out)
+    assert ring.available() == 0 and ring.space() == 10
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def _reference_output(hrir, x, block_size, engine):
+    """Convolve ``x`` ``(channels, samples)`` block by block with a fresh convolver."""
+    reference = RealTimeConvolver(hrir, block_size=block_size, engine=engine)
+    blocks = x.shape[1] // block_size
+    out = [reference.process_block(x[:, i * block_size : (i + 1) * block_size]) for i in range(blocks)]
+    return np.concatenate(out, axis=1)
+
+
+@pytest.mark.parametrize("engine", ["fft", "partitioned"])
+def test_process_reblocks_variable_callback_sizes(engine):
+    hrir = random_hrir(["FL", "FR", "FC"], ir_length=300, seed=15)
+    b = 64
+    rng = np.random.default_rng(16)
+    x = rng.standard_normal((3, 40 * b))
+    convolver = RealTimeConvolver(hrir, block_size=b, engine=engine)
+    assert convolver.reblock_latency == b - 1
+    sizes = list(rng.integers(1, 3 * b, size=200))
+    chunks = []
+    pos = 0
+    for n in sizes:
+        if pos + n > x.shape[1]:
+            break
+        chunks.append(convolver.process(x[:, pos : pos + n]))
+        pos += n
+    out = np.concatenate(chunks, axis=1)
+    expected = np.concatenate([np.zeros((2, b - 1)), _reference_output(hrir, x, b, engine)], axis=1)
+    np.testing.assert_allclose(out, expected[:, :pos], atol=1e-9)
+
+    with pytest.raises(ValueError):
+        convolver.process(np.zeros((2, 10)))
+    convolver.reset()
+    np.testing.assert_allclose(convolver.process(x[:, :b]), expected[:, :b], atol=1e-9)
+
+
+@pytest.mark.parametrize("frames, latency", [(48, 48), (64, 0), (256, 0), (16, 48), (100, 60)])
+def test_reblocker_latency_for_fixed_callback_size(frames, latency):
+    hrir = random_hrir(["FL", "FR"], ir_length=100, seed=17)
+    b = 64
+    convolver = RealTimeConvolver(hrir, block_size=b)
+    reblocker = _Reblocker(convolver, frames)
+    assert reblocker.latency == latency
+    x = np.random.default_rng(18).standard_normal((2, 20 * frames))
+    out = np.zeros((2, x.shape[1]))
+    for i in range(20):
+        reblocker.process(x[:, i * frames : (i + 1) * frames], out[:, i * frames : (i + 1) * frames])
+    expected = np.concatenate([np.zeros((2, latency)), _reference_output(hrir, x, b, "fft")], axis=1)
+    n = min(out.shape[1], expected.shape[1])
+    np.testing.assert_allclose(out[:, :n], expected[:, :n], atol=1e-9)
+    with pytest.raises(ValueError):
+        _Reblocker(convolver, -1)
+
+
+def test_reblocker_falls_back_to_varying_latency_after_underrun():
+    hrir = random_hrir(["FL", "FR"], ir_length=100, seed=19)
+    b = 64
+    convolver = RealTimeConvolver(hrir, block_size=b)
+    reblocker = _Reblocker(convolver, 32)
+    x = np.random.default_rng(20).standard_normal((2, 20 * b))
+    out = np.full((2, x.shape[1]), np.nan)
+    # The host announced 32 frames per callback but delivers 48 after the first one
+    sizes = [32] + [48] * 26
+    pos = 0
+    for n in sizes:
+        reblocker.process(x[:, pos : pos + n], out[:, pos : pos + n])
+        pos += n
+    assert not np.isnan(out[:, :pos]).any()
+    assert convolver.stats()["reblock_underruns"] == 1
+    assert reblocker.latency == b - 1
+    expected = np.concatenate([np.zeros((2, b - 1)), _reference_output(hrir, x, b, "fft")], axis=1)
+    np.testing.assert_allclose(out[:, 3 * b : pos], expected[:, 3 * b : pos], atol=1e-9)
+
+
+def test_process_reuses_workspace():
+    convolver = RealTimeConvolver(random_hrir(["FL", "FR"], ir_length=500), block_size=128)
+    block = np.ones((2, 100))
+    out = np.empty((2, 100))
+    convolver.process(block, out=out)
+    tracemalloc.start()
+    try:
+        for _ in range(20):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            assert convolver.process(block, out=out) is out
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    limit = 4096 if INPLACE_FFT else 4096 + 3 * 2 * (convolver.fft_size // 2 + 1) * 16
+    assert peak < limit
+
+
+def test_decoupled_stream_delays_output_by_safety_blocks():
+    hrir = random_hrir(["FL", "FR"], ir_length=200)
+    reference = RealTimeConvolver(hrir, block_size=32)
+    stream = _DecoupledStream(RealTimeConvolver(hrir, block_size=32), safety_blocks=2)
+    try:
+        rng = np.random.default_rng(11)
+        expected = [np.zeros((2, 32)), np.zeros((2, 32))]
+        for _ in range(10):
+            block = rng.standard_normal((2, 32))
+            expected.append(reference.process_block(block))
+            outdata = np.empty((32, 2), dtype=np.float32)
+            stream.callback(block.T.astype(np.float32), outdata)
+            np.testing.assert_allclose(outdata.T, expected.pop(0), atol=1e-5)
+            _wait_for(lambda: stream.queue_depth() == 2)
+        stats = stream.stats()
+        assert stats["underruns"] == 0 and stats["overruns"] == 0
+        assert stats["min_queue_depth"] == 2
+    finally:
+        stream.close()
+
+
+def test_decoupled_stream_counts_underruns_and_overruns():
+    hrir = random_hrir(["FL"], ir_length=16)
+    convolver = RealTimeConvolver(hrir, block_size=16)
+    stream = _DecoupledStream(convolver, safety_blocks=0)
+    stream.close()
+    outdata = np.ones((16, 2), dtype=np.float32)
+    for _ in range(6):
+        stream.callback(np.ones((16, 1), dtype=np.float32), outdata, status="input overflow")
+    assert not outdata.any()
+    assert stream.underruns == 6
+    assert stream.overruns == 2
+    assert stream.status_errors == 6
+
+
+def test_stats_report_processing_and_orientation():
+    rng = np.random.default_rng(12)
+    brirs = {a: (rng.standard_normal(40), rng.standard_normal(40)) for a in (0.0, 90.0)}
+    convolver = RealTimeConvolver(brirs, samplerate=48000, block_size=16, interpolation="switch")
+    for i in range(20):
+        convolver.set_orientation(10.0 * i)
+        convolver.process_block(rng.standard_normal((2, 16)))
+    convolver._telemetry.record_status(type("_Flags", (), {"output_underflow": True})())
+
+    stats = json.loads(json.dumps(convolver.stats()))
+    assert stats["blocks"] == 20
+    assert sum(stats["histogram"]["counts"]) == 20
+    assert len(stats["histogram"]["counts"]) == len(stats["histogram"]["edges"]) + 1
+    assert 0 < stats["processing_ms"]["mean"] <= stats["processing_ms"]["max"]
+    assert stats["utilisation"]["max"] == pytest.approx(stats["processing_ms"]["max"] / stats["block_ms"])
+    assert stats["orientation_updates"] == 20 and stats["orientation_rate"] > 0
+    assert stats["switches"] == convolver.switches == 1
+    assert stats["status_errors"] == 1 and stats["flags"]["output_underflow"] == 1
+    assert stats["workers"] is None and stats["stream"] is None
+
+    convolver.reset_stats()
+    assert convolver.stats()["blocks"] == 0
+
+
+@pytest.mark.parametrize("engine", ["fft", "partitioned", "nonuniform"])
+def test_swap_irs_crossfades_to_new_brirs(engine):
+    rng = np.random.default_rng(30)
+    b = 32
+    old = {a: (rng.standard_normal(200), rng.standard_normal(200)) for a in (0.0, 90.0)}
+    new = {a: (rng.standard_normal(300), rng.standard_normal(300)) for a in (0.0, 90.0)}
+    x = rng.standard_normal((2, 12 * b))
+
+    def reference(brirs, x):
+        fresh = RealTimeConvolver(brirs, samplerate=48000, block_size=b, engine=engine, max_partition=64)
+        out = np.concatenate([fresh.process_block(x[:, i : i + b]) for i in range(0, x.shape[1], b)], axis=1)
+        fresh.close()
+        return out
+
+    convolver = RealTimeConvolver(old, samplerate=48000, block_size=b, engine=engine, max_partition=64)
+    expected_old = reference(old, x)
+    out = np.concatenate([convolver.process_block(x[:, i * b : (i + 1) * b]) for i in range(4)], axis=1)
+    np.testing.assert_allclose(out, expected_old[:, : 4 * b], atol=1e-9)
+
+    future = convolver.swap_irs(new, crossfade=2 * b / 48000)
+    _wait_for(lambda: convolver._incoming is not None)
+    assert not future.done()
+    out = np.concatenate([convolver.process_block(x[:, i * b : (i + 1) * b]) for i in range(4, 12)], axis=1)
+    future.result(timeout=5)
+    # The new BRIRs start from the swap, the old output fades out over two blocks
+    expected_new = reference(new, x[:, 4 * b :])
+    fade = np.sin(0.5 * np.pi * (np.arange(2 * b) + 0.5) / (2 * b)) ** 2
+    mixed = expected_old[:, 4 * b : 6 * b] + fade * (expected_new[:, : 2 * b] - expected_old[:, 4 * b : 6 * b])
+    np.testing.assert_allclose(out[:, : 2 * b], mixed, atol=1e-9)
+    np.testing.assert_allclose(out[:, 2 * b :], expected_new[:, 2 * b :], atol=1e-9)
+    assert convolver.brirs is not None and convolver.ir_length == 300
+    assert convolver.stats()["swaps"] == 1 and convolver.stats()["blocks"] == 12
+    convolver.close()
+
+
+def test_swap_irs_rejects_other_input_channels():
+    convolver = RealTimeConvolver(random_hrir(["FL", "FR"], 16), block_size=16)
+    future = convolver.swap_irs(random_hrir(["FL", "FR", "FC"], 16))
+    assert isinstance(future.exception(timeout=5), ValueError)
+    assert convolver._incoming is None
+    with pytest.raises(ValueError):
+        convolver.swap_irs(random_hrir(["FL", "FR"], 16), block_size=32)
+
+
+def test_swap_irs_applies_swaps_in_order_without_audio():
+    convolver = RealTimeConvolver({0.0: ([1.0], [1.0])}, samplerate=48000, block_size=16)
+    futures = [convolver.swap_irs({0.0: ([gain], [gain])}) for gain in (0.5, 0.25)]
+    for future in futures:
+        assert future.result(timeout=5) is None
+    assert convolver.swaps == 2
+    np.testing.assert_allclose(convolver.process_block(np.ones((2, 16))), 0.25)
+    worker = convolver._swap_worker
+    convolver.close()
+    assert not worker.is_alive()
+    with pytest.raises(RuntimeError):
+        convolver.swap_irs({0.0: ([1.0], [1.0])})
+
+
+def test_close_fails_pending_swaps_and_reset_applies_them():
+    convolver = RealTimeConvolver({0.0: ([1.0], [1.0])}, samplerate=48000, block_size=16)
+    future = convolver.swap_irs({0.0: ([0.5], [0.5])})
+    _wait_for(lambda: convolver._incoming is not None)
+    convolver.reset()
+    future.result(timeout=5)
+    np.testing.assert_allclose(convolver.process_block(np.ones((2, 16))), 0.5)
+
+    # Keep the convolver busy so that the swap stays pending until it is closed
+    convolver._thread = threading.current_thread()
+    future = convolver.swap_irs({0.0: ([0.25], [0.25])})
+    _wait_for(lambda: convolver._incoming is not None)
+    convolver._thread = None
+    convolver.close()
+    assert isinstance(future.exception(timeout=5), RuntimeError)
+    assert convolver._incoming is None
+
+
+def test_stats_log_appends_json_lines(tmp_path):
+    convolver = RealTimeConvolver(random_hrir(["FL"], 16), block_size=16)
+    log = tmp_path / "stats.jsonl"
+    convolver.start_stats_log(str(log), interval=0.01)
+    try:
+        _wait_for(lambda: log.exists() and len(log.read_text().splitlines()) >= 2)
+    finally:
+        convolver.close()
+    lines = log.read_text().splitlines()
+    assert all("time" in json.loads(line) and "utilisation" in json.loads(line) for line in lines)
+
+
+@pytest.mark.parametrize("engine", ["fft", "nonuniform"])
+def test_convolve_file_streams_full_convolution(tmp_path, engine):
+    import soundfile as sf
+
+    hrir = random_hrir(["FL", "FR", "FC"], ir_length=300)
+    for speaker in hrir.irs.values():
+        for ir in speaker.values():
+            ir.data *= 0.02
+    rng = np.random.default_rng(13)
+    data = 0.3 * rng.standard_normal((1000, 3))
+    sf.write(tmp_path / "in.wav", data, 48000, subtype="FLOAT")
+
+    realtime_convolution.convolve_file(
+        str(tmp_path / "in.wav"), str(tmp_path / "out.wav"), hrir, block_size=128, engine=engine, max_partition=256
+    )
+    out, fs = sf.read(tmp_path / "out.wav", always_2d=True)
+    expected = np.zeros((1000 + 300 - 1, 2))
+    for i, name in enumerate(["FL", "FR", "FC"]):
+        for ear, side in enumerate(["left", "right"]):
+            expected[:, ear] += np.convolve(data[:, i], hrir.irs[name][side].data)
+    assert fs == 48000
+    assert out.shape == expected.shape
+    np.testing.assert_allclose(out, expected, atol=1e-4)
+
+
+def test_render_file_rejects_channel_mismatch_before_writing(tmp_path):
+    import soundfile as sf
+
+    sf.write(tmp_path / "in.wav", np.zeros((500, 2)), 48000, subtype="FLOAT")
+    convolver = RealTimeConvolver(random_hrir(["FL", "FR", "FC"], ir_length=100), block_size=64)
+    with pytest.raises(ValueError, match="2 channels"):
+        convolver.render_file(str(tmp_path / "in.wav"), str(tmp_path / "out.wav"))
+    assert not (tmp_path / "out.wav").exists()
+
+
+def test_convolve_file_memory_does_not_grow_with_length(tmp_path):
+    import soundfile as sf
+
+    hrir = random_hrir(["FL", "FR", "FC", "LFE"], ir_length=100)
+    sf.write(tmp_path / "in.wav", np.zeros((200000, 4)), 48000, subtype="FLOAT")
+    tracemalloc.start()
+    try:
+        realtime_convolution.convolve_file(str(tmp_path / "in.wav"), str(tmp_path / "out.wav"), hrir, block_size=512)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # The input alone is 6.4 MB as float64
+    assert peak < 1_000_000
+
+
+@pytest.mark.parametrize("segment_seconds", [0.005, 0.02])
+def test_parallel_render_matches_sequential(tmp_path, segment_seconds):
+    import soundfile as sf
+
+    hrir = random_hrir(["FL", "FR", "FC"], ir_length=300)
+    for speaker in hrir.irs.values():
+        for ir in speaker.values():
+            ir.data *= 0.02
+    data = 0.3 * np.random.default_rng(14).standard_normal((3000, 3))
+    sf.write(tmp_path / "in.wav", data, 48000, subtype="FLOAT")
+
+    realtime_convolution.convolve_file(str(tmp_path / "in.wav"), str(tmp_path / "seq.wav"), hrir, block_size=128)
+    realtime_convolution.convolve_file_parallel(
+        str(tmp_path / "in.wav"),
+        str(tmp_path / "par.wav"),
+        hrir,
+        processes=2,
+        segment_seconds=segment_seconds,
+        block_size=100,
+    )
+    sequential, _ = sf.read(tmp_path / "seq.wav")
+    parallel, _ = sf.read(tmp_path / "par.wav")
+    assert parallel.shape == sequential.shape == (3000 + 299, 2)
+    np.testing.assert_allclose(parallel, sequential, atol=1.5 / 32768)
+
+
+def test_cli_passes_block_size_to_parallel_render(monkeypatch):
+    calls = []
+    monkeypatch.setattr(realtime_convolution, "hrir_from_wav", lambda path: None)
+    monkeypatch.setattr(realtime_convolution, "convolve_file_parallel", lambda *args, **kwargs: calls.append(kwargs))
+    argv = ["realtime_convolution.py", "in.wav", "out.wav", "hrir.wav", "--processes", "2"]
+    monkeypatch.setattr("sys.argv", argv + ["--block_size", "4096"])
+    realtime_convolution.main()
+    assert calls[0]["block_size"] == 4096 and calls[0]["processes"] == 2
+    for option in (["--engine", "nonuniform"], ["--max_partition", "4096"]):
+        monkeypatch.setattr("sys.argv", argv + option)
+        with pytest.raises(SystemExit):
+            realtime_convolution.main()
+    assert len(calls) == 1
@@ -1,8 +1,9 @@
 import subprocess
 import json
+import time
 import pytest
 
-from viewmodel import ProcessingViewModel, RecordingViewModel, LayoutViewModel
+from viewmodel import ProcessingViewModel, RecordingViewModel, LayoutViewModel, PlaybackViewModel
 from models import ProcessingSettings, RecorderSettings
 
 
@@ -139,4 +140,61 @@ def test_processing_vm_saved_delays(monkeypatch, tmp_path):
     vm.run(settings)
 
     assert "--delay-file" in captured["args"]
-    assert captured["pos"] == str(pos_file)
\ No newline at end of file
+    assert captured["pos"] == str(pos_file)
+
+
+def test_playback_vm_polls_convolver_stats():
+    from realtime_convolution import RealTimeConvolver
+
+    vm = PlaybackViewModel()
+    assert vm.stats() is None
+    vm.convolver = RealTimeConvolver({0.0: ([1.0], [1.0])}, samplerate=48000, block_size=16)
+    assert vm.stats()["blocks"] == 0
+    assert vm.stats()["tracking"] is None
+
+
+def test_playback_vm_swaps_brirs_while_playing(tmp_path, monkeypatch):
+    import numpy as np
+    from realtime_convolution import RealTimeConvolver
+
+    vm = PlaybackViewModel()
+    with pytest.raises(RuntimeError):
+        vm.swap_brirs(str(tmp_path))
+    np.savez(tmp_path / "0.npz", left=np.array([0.5]), right=np.array([0.25]))
+    vm.convolver = RealTimeConvolver({0.0: ([1.0], [1.0])}, samplerate=48000, block_size=16)
+    # A convolver which is not playing cannot swap
+    with pytest.raises(RuntimeError):
+        vm.swap_brirs(str(tmp_path))
+    monkeypatch.setattr(RealTimeConvolver, "running", property(lambda self: True))
+    future = vm.swap_brirs(str(tmp_path))
+    deadline = time.monotonic() + 5
+    while not future.done() and time.monotonic() < deadline:
+        vm.convolver.process_block(np.ones((2, 16)))
+    future.result(timeout=5)
+    out = vm.convolver.process_block(np.ones((2, 16)))
+    np.testing.assert_allclose(out, [[0.5] * 16, [0.25] * 16])
+    vm.stop()
+    assert vm.convolver is None and vm.stats() is None
+
+
+def test_playback_vm_swaps_in_bundle_on_partitioned_engine(tmp_path, monkeypatch):
+    import numpy as np
+    from brir_bundle import write_bundle
+    from realtime_convolution import RealTimeConvolver
+
+    bundle = str(tmp_path / "brirs.brir")
+    write_bundle(bundle, {0.0: (np.array([0.5, 0.0]), np.array([0.25, 0.0]))}, fs=48000, partition_size=16)
+    vm = PlaybackViewModel()
+    vm.convolver = RealTimeConvolver({0.0: ([1.0], [1.0])}, samplerate=48000, block_size=16)
+    assert vm.convolver.engine == "fft"
+    monkeypatch.setattr(RealTimeConvolver, "running", property(lambda self: True))
+    future = vm.swap_brirs(bundle)
+    deadline = time.monotonic() + 5
+    while not future.done() and time.monotonic() < deadline:
+        vm.convolver.process_block(np.ones((2, 16)))
+    future.result(timeout=5)
+    assert vm.convolver.engine == "partitioned"
+    assert vm.convolver._bundle is not None
+    out = vm.convolver.process_block(np.ones((2, 16)))
+    np.testing.assert_allclose(out, [[0.5] * 16, [0.25] * 16], atol=1e-6)
+    vm.stop()
@@ -2,49 +2,204 @@ from __future__ import annotations
 
 """Simple OSC-based head tracking utilities."""
 
+import json
+import math
+import os
 import threading
-from typing import Callable, Optional
+import time
+from typing import NamedTuple, Optional
 
 from pythonosc.dispatcher import Dispatcher
-from pythonosc.osc_server import ThreadingOSCUDPServer
+from pythonosc.osc_server import BlockingOSCUDPServer
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tracking_calibration.json")
+# Longest time in seconds a pose is extrapolated ahead of its last update
+MAX_PREDICTION = 0.1
+
+
+class Pose(NamedTuple):
+    """Head orientation in degrees, the angular velocity in degrees per second and the arrival time."""
+
+    yaw: float
+    pitch: float
+    roll: float
+    velocity: tuple[float, float, float] = (0.0, 0.0, 0.0)
+    timestamp: float = 0.0
+
+
+def load_calibration(file_path: str = CALIBRATION_FILE) -> tuple[float, float, float]:
+    """Return ``(yaw, pitch, roll)`` offsets from a calibration file, zeros when it is missing or invalid."""
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return tuple(float(data.get(f"{axis}_offset", 0.0)) for axis in ("yaw", "pitch", "roll"))
+    except (OSError, ValueError, TypeError, AttributeError):
+        return 0.0, 0.0, 0.0
+
+
+def quaternion_to_ypr(w: float, x: float, y: float, z: float) -> tuple[float, float, float]:
+    """Return ``(yaw, pitch, roll)`` in degrees of a head rotation quaternion.
+
+    The quaternion rotates head coordinates (x front, y left, z up) into world coordinates. Yaw turns the head to
+    the left, pitch raises the nose and roll lowers the right ear, applied in that order.
+    """
+    norm = math.sqrt(w * w + x * x + y * y + z * z) or 1.0
+    w, x, y, z = w / norm, x / norm, y / norm, z / norm
+    yaw = math.atan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+    pitch = math.asin(max(-1.0, min(1.0, 2 * (x * z - w * y))))
+    roll = math.atan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+    return math.degrees(yaw), math.degrees(pitch), math.degrees(roll)
+
+
+def _angle_diff(a: float, b: float) -> float:
+    """Return ``a - b`` wrapped to [-180, 180)."""
+    return (a - b + 180.0) % 360.0 - 180.0
 
 
 class HeadTracker:
-    """Receive orientation updates via OSC."""
+    """Receive orientation updates via OSC.
+
+    ``/ypr yaw pitch roll`` and ``/quat w x y z`` update the whole pose at once, ``/yaw``, ``/pitch`` and ``/roll``
+    one angle without prediction. Every update replaces an immutable ``Pose`` stamped with its arrival time, so
+    readers never see a pose torn between two updates. Calibration offsets are subtracted from the received angles.
+    ``orientation`` extrapolates the pose with its angular velocity to compensate the audio output latency.
 
-    def __init__(self, host: str = "0.0.0.0", port: int = 9000) -> None:
+    Args:
+        host: Address to listen on.
+        port: UDP port to listen on.
+        calibration_file: JSON file with ``yaw_offset``, ``pitch_offset`` and ``roll_offset`` in degrees, ``None``
+            disables calibration.
+        prediction: Default time in seconds ``orientation`` looks ahead, normally the audio output latency.
+        smoothing: Weight of the newest velocity estimate in the running average, between 0 and 1.
+    """
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 9000,
+        calibration_file: Optional[str] = CALIBRATION_FILE,
+        prediction: float = 0.0,
+        smoothing: float = 0.5,
+    ) -> None:
         self.host = host
         self.port = port
-        self._yaw = 0.0
-        self._pitch = 0.0
-        self._roll = 0.0
+        self.prediction = prediction
+        self.smoothing = smoothing
+        self.offsets = load_calibration(calibration_file) if calibration_file else (0.0, 0.0, 0.0)
+        self._pose = Pose(0.0, 0.0, 0.0, timestamp=time.perf_counter())
+        # Updates received, sum of their intervals and pose ages at consumption
+        self._updates = 0
+        self._interval_sum = 0.0
+        self._reads = 0
+        self._age_sum = 0.0
+        self._age_max = 0.0
+        self._last_age = 0.0
         self._dispatcher = Dispatcher()
-        self._dispatcher.map("/yaw", self._on_yaw)
-        self._dispatcher.map("/pitch", self._on_pitch)
-        self._dispatcher.map("/roll", self._on_roll)
-        self._server = ThreadingOSCUDPServer((host, port), self._dispatcher)
+        self._dispatcher.map("/ypr", self._on_ypr)
+        self._dispatcher.map("/quat", self._on_quat)
+        self._dispatcher.map("/yaw", self._on_axis, 0)
+        self._dispatcher.map("/pitch", self._on_axis, 1)
+        self._dispatcher.map("/roll", self._on_axis, 2)
+        # One thread handles the packets in arrival order, which the velocity estimate relies on
+        self._server = BlockingOSCUDPServer((host, port), self._dispatcher)
         self._thread: Optional[threading.Thread] = None
 
-    def _on_yaw(self, address: str, *args: float) -> None:
-        if args:
-            try:
-                self._yaw = float(args[0])
-            except (ValueError, TypeError):
-                pass
-
-    def _on_pitch(self, address: str, *args: float) -> None:
-        if args:
-            try:
-                self._pitch = float(args[0])
-            except (ValueError, TypeError):
-                pass
-
-    def _on_roll(self, address: str, *args: float) -> None:
-        if args:
-            try:
-                self._roll = float(args[0])
-            except (ValueError, TypeError):
-                pass
+    def _on_ypr(self, address: str, *args: float) -> None:
+        try:
+            yaw, pitch, roll = (float(a) for a in args[:3])
+        except (ValueError, TypeError):
+            return
+        self.update(yaw, pitch, roll)
+
+    def _on_quat(self, address: str, *args: float) -> None:
+        try:
+            w, x, y, z = (float(a) for a in args[:4])
+        except (ValueError, TypeError):
+            return
+        self.update(*quaternion_to_ypr(w, x, y, z))
+
+    def _on_axis(self, address: str, axis: list, *args: float) -> None:
+        if not args:
+            return
+        try:
+            value = float(args[0])
+        except (ValueError, TypeError):
+            return
+        raw = [a + o for a, o in zip(self._pose[:3], self.offsets)]
+        raw[axis[0]] = value
+        # Angles of one pose arrive microseconds apart, their timing says nothing about the head's motion
+        self.update(*raw, predict=False)
+
+    def update(
+        self, yaw: float, pitch: float, roll: float, timestamp: Optional[float] = None, predict: bool = True
+    ) -> None:
+        """Replace the pose with received angles in degrees, calibration offsets are subtracted here.
+
+        Args:
+            yaw: Received yaw.
+            pitch: Received pitch.
+            roll: Received roll.
+            timestamp: Arrival time on the ``time.perf_counter`` clock, defaults to now.
+            predict: Update the velocity estimate, ``False`` stops extrapolating the pose.
+        """
+        now = time.perf_counter() if timestamp is None else timestamp
+        angles = (yaw - self.offsets[0], pitch - self.offsets[1], roll - self.offsets[2])
+        previous = self._pose
+        dt = now - previous.timestamp
+        velocity = (0.0, 0.0, 0.0)
+        # After a long gap the head may have moved any way
+        if predict and self._updates and 0.0 < dt <= MAX_PREDICTION:
+            measured = [_angle_diff(a, b) / dt for a, b in zip(angles, previous[:3])]
+            velocity = tuple(v + self.smoothing * (m - v) for v, m in zip(previous.velocity, measured))
+        if self._updates:
+            self._interval_sum += dt
+        self._updates += 1
+        self._pose = Pose(*angles, velocity, now)
+
+    def calibrate(self) -> None:
+        """Take the current pose as the straight ahead orientation."""
+        pose = self._pose
+        self.offsets = tuple(o + a for o, a in zip(self.offsets, pose[:3]))
+        self._pose = pose._replace(yaw=0.0, pitch=0.0, roll=0.0)
+
+    def pose(self) -> Pose:
+        """Return the latest calibrated pose."""
+        return self._pose
+
+    def orientation(self, prediction: Optional[float] = None) -> tuple[float, float, float]:
+        """Return ``(yaw, pitch, roll)`` extrapolated to ``prediction`` seconds from now.
+
+        The extrapolation spans at most ``MAX_PREDICTION`` seconds past the last update, so a tracker which stops
+        sending holds its pose. The pose's age is recorded for ``stats``.
+        """
+        pose = self._pose
+        now = time.perf_counter()
+        age = now - pose.timestamp
+        self._reads += 1
+        self._age_sum += age
+        self._age_max = max(self._age_max, age)
+        self._last_age = age
+        ahead = max(0.0, min(age + (self.prediction if prediction is None else prediction), MAX_PREDICTION))
+        yaw = (pose.yaw + pose.velocity[0] * ahead + 180.0) % 360.0 - 180.0
+        pitch = max(-90.0, min(90.0, pose.pitch + pose.velocity[1] * ahead))
+        roll = (pose.roll + pose.velocity[2] * ahead + 180.0) % 360.0 - 180.0
+        return yaw, pitch, roll
+
+    def stats(self) -> dict:
+        """Return update and latency counters.
+
+        ``update_rate`` is the mean rate of received poses in Hz. ``pose_age`` is the time from a pose's arrival to
+        its use by ``orientation`` in seconds. ``end_to_end`` is the mean motion to sound latency before prediction,
+        the mean age plus the audio output latency given as ``prediction``.
+        """
+        mean_age = self._age_sum / self._reads if self._reads else 0.0
+        return {
+            "updates": self._updates,
+            "update_rate": (self._updates - 1) / self._interval_sum if self._interval_sum > 0 else 0.0,
+            "pose_age": {"last": self._last_age, "mean": mean_age, "max": self._age_max},
+            "prediction": self.prediction,
+            "end_to_end": mean_age + self.prediction,
+        }
 
     def start(self) -> None:
         if self._thread is None:
@@ -58,10 +213,10 @@ class HeadTracker:
             self._thread = None
 
     def yaw(self) -> float:
-        return self._yaw
+        return self._pose.yaw
 
     def pitch(self) -> float:
-        return self._pitch
+        return self._pose.pitch
 
     def roll(self) -> float:
-        return self._roll
\ No newline at end of file
+        return self._pose.roll
@@ -1,15 +1,15 @@
 from __future__ import annotations
 
 import os
-import time
-from threading import Thread
-from typing import Optional
+from concurrent.futures import Future
+from typing import Optional, Union
 
 import numpy as np
 
+from brir_bundle import BRIRBundle, load_bundle
 from models import PlaybackSettings
 from realtime_convolution import RealTimeConvolver
-from tracking import HeadTracker
+from tracking import CALIBRATION_FILE, HeadTracker
 
 
 class PlaybackViewModel:
@@ -18,12 +18,6 @@ class PlaybackViewModel:
     def __init__(self) -> None:
         self.tracker: Optional[HeadTracker] = None
         self.convolver: Optional[RealTimeConvolver] = None
-        self._thread: Optional[Thread] = None
-        self._running = False
-        self._yaw = 0.0
-        self._pitch = 0.0
-        self._roll = 0.0
-        self._alpha = 1.0
 
     def _load_brirs(self, path: str) -> dict[float, tuple[list[float], list[float]]]:
         brirs: dict[float, tuple[list[float], list[float]]] = {}
@@ -35,51 +29,59 @@ class PlaybackViewModel:
             brirs[angle] = (data["left"], data["right"])
         return brirs
 
-
-    def _smooth_angle(self, current: float, target: float) -> float:
-        diff = (target - current + 180.0) % 360.0 - 180.0
-        return current + self._alpha * diff
+    def _read_brirs(self, path: str) -> tuple[Union[BRIRBundle, dict], str]:
+        """Return the BRIRs of a bundle file or a directory of ``<angle>.npz`` files and the engine suiting them."""
+        if os.path.isfile(path):
+            # Compiled bundle, memory-mapped with precomputed spectra for the partitioned engine
+            return load_bundle(path), "partitioned"
+        return self._load_brirs(path), "fft"
 
     def play(self, settings: PlaybackSettings) -> None:
-        brirs = self._load_brirs(settings.brir_dir)
-        self.tracker = HeadTracker(port=settings.osc_port)
+        brirs, engine = self._read_brirs(settings.brir_dir)
+        # Poses are predicted ahead by the output latency, the device buffer plus one block
+        self.tracker = HeadTracker(
+            port=settings.osc_port,
+            calibration_file=settings.tracking_calibration or CALIBRATION_FILE,
+            prediction=settings.latency + settings.blocksize / settings.samplerate,
+        )
+        # The convolver reads the tracker's latest pose once per block and smooths it at block rate
         self.convolver = RealTimeConvolver(
             brirs,
             samplerate=settings.samplerate,
             block_size=settings.blocksize,
+            engine=engine,
+            orientation_source=self.tracker,
+            orientation_smoothing=max(settings.smoothing_ms, 0.0) / 1000.0,
         )
         self.tracker.start()
         self.convolver.start(latency=settings.latency)
-        self._running = True
-        if settings.smoothing_ms > 0:
-            dt = 0.01
-            tau = settings.smoothing_ms / 1000.0
-            self._alpha = dt / (tau + dt)
-        else:
-            self._alpha = 1.0
 
-        def _loop() -> None:
-            while self._running:
-                if self.tracker:
-                    self._yaw = self._smooth_angle(self._yaw, self.tracker.yaw())
-                    self._pitch = self._smooth_angle(self._pitch, self.tracker.pitch())
-                    self._roll = self._smooth_angle(self._roll, self.tracker.roll())
-                    self.convolver.set_orientation(
-                        self._yaw,
-                        self._pitch,
-                        self._roll,
-                    )
-                time.sleep(0.01)
+    def swap_brirs(self, path: str) -> Future:
+        """Switch playback to the BRIRs of a bundle file or directory without restarting the stream.
+
+        The BRIRs are prepared in the background and crossfaded in, see ``RealTimeConvolver.swap_irs``. They run on
+        the engine suiting them, so a bundle keeps its precomputed spectra even when playback started from a
+        directory. The returned future completes once they are playing.
+        """
+        if not self.convolver or not self.convolver.running:
+            raise RuntimeError("Playback is not running")
+        brirs, engine = self._read_brirs(path)
+        return self.convolver.swap_irs(brirs, engine=engine)
 
-        self._thread = Thread(target=_loop, daemon=True)
-        self._thread.start()
+    def stats(self) -> Optional[dict]:
+        """Return the convolver's performance counters and the head tracker's update and latency counters under
+        ``"tracking"``, ``None`` while not playing."""
+        if not self.convolver:
+            return None
+        stats = self.convolver.stats()
+        stats["tracking"] = self.tracker.stats() if self.tracker else None
+        return stats
 
     def stop(self) -> None:
-        self._running = False
         if self.convolver:
             self.convolver.stop()
+            self.convolver.close()
+            self.convolver = None
         if self.tracker:
             self.tracker.stop()
-        if self._thread:
-            self._thread.join()
-            self._thread = None
\ No newline at end of file
+            self.tracker = None